@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+#  documents.py - synthetic documents for the benchmarks
+#
+#  Documents are generated from a seed, so the same arguments always give
+#  the same text and timings can be compared between runs.
+
+import random
+
+WORDS = [
+	'buffer', 'iter', 'line', 'offset', 'view', 'window', 'entry', 'command',
+	'module', 'result', 'prompt', 'suspend', 'match', 'regex', 'replace',
+	'align', 'column', 'format', 'shell', 'process', 'value', 'index', 'count',
+	'start', 'end', 'text', 'mark', 'tag', 'needle', 'haystack', 'token',
+	'parse', 'render', 'update', 'signal', 'handler', 'timeout', 'idle'
+]
+
+TYPES = ['int', 'char *', 'gboolean', 'gdouble', 'GtkTextIter', 'GList *']
+
+def _identifier(rnd):
+	ret = rnd.choice(WORDS)
+
+	if rnd.random() < 0.4:
+		ret += '_' + rnd.choice(WORDS)
+
+	return ret
+
+def _code_line(rnd):
+	indent = "\t" * rnd.randint(0, 3)
+	kind = rnd.random()
+
+	if kind < 0.1:
+		line = ''
+	elif kind < 0.4:
+		line = '%s%s %s = %s (%s, %d);' % (indent, rnd.choice(TYPES), _identifier(rnd), _identifier(rnd), _identifier(rnd), rnd.randint(0, 1000))
+	elif kind < 0.6:
+		line = '%sif (%s > %d && %s)' % (indent, _identifier(rnd), rnd.randint(0, 100), _identifier(rnd))
+	elif kind < 0.75:
+		line = '%s/* %s */' % (indent, ' '.join([rnd.choice(WORDS) for i in xrange(rnd.randint(3, 10))]))
+	else:
+		line = '%sreturn %s (%s);' % (indent, _identifier(rnd), _identifier(rnd))
+
+	# Some lines have trailing white space to remove
+	if rnd.random() < 0.1:
+		line += rnd.choice([' ', '  ', "\t", " \t "])
+
+	return line
+
+def _prose_line(rnd):
+	words = [rnd.choice(WORDS) for i in xrange(rnd.randint(4, 14))]
+	words[0] = words[0].capitalize()
+
+	return ' '.join(words) + '.'
+
+def _table_line(rnd):
+	cols = []
+
+	for i in xrange(rnd.randint(3, 6)):
+		if rnd.random() < 0.3:
+			cols.append(str(rnd.randint(0, 100000)))
+		else:
+			cols.append(_identifier(rnd))
+
+	return (' ' * rnd.randint(1, 3)).join(cols)
+
+def _csv_line(rnd):
+	fields = []
+
+	for i in xrange(rnd.randint(3, 6)):
+		kind = rnd.random()
+
+		if kind < 0.3:
+			fields.append(str(rnd.randint(0, 100000)))
+		elif kind < 0.4:
+			# Quoted fields may contain the delimiter
+			fields.append('"%s, %s"' % (_identifier(rnd), _identifier(rnd)))
+		else:
+			fields.append(_identifier(rnd))
+
+	return ','.join(fields)
+
+KINDS = {
+	'code': _code_line,
+	'prose': _prose_line,
+	'table': _table_line,
+	'csv': _csv_line
+}
+
+def lines(num, kind='code', seed=0):
+	rnd = random.Random(seed)
+	func = KINDS[kind]
+
+	return [func(rnd) for i in xrange(num)]
+
+def generate(num, kind='code', seed=0):
+	# A document of num lines, without a trailing newline
+	return "\n".join(lines(num, kind, seed))
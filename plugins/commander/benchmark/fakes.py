@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+#
+#  fakes.py - stand-ins for the gtk, glib, gio and pluma modules
+#
+#  The commander modules only need a small part of these libraries. The
+#  stand-ins below implement just enough of them in pure python to run the
+#  modules without a display, see textbuffer.py for the text widgets.
+
+import os
+import sys
+import types
+import select
+import time
+import heapq
+
+class MainLoop:
+	# Minimal glib main loop: io watches, timeouts and idle handlers
+	def __init__(self):
+		self._sources = {}
+		self._next_id = 1
+
+	def _add(self, source):
+		sid = self._next_id
+		self._next_id += 1
+
+		self._sources[sid] = source
+		return sid
+
+	def io_add_watch(self, fd, condition, callback, *args):
+		return self._add(['io', fd, condition, callback, args])
+
+	def timeout_add(self, interval, callback, *args, **kwargs):
+		return self._add(['timeout', time.time() + interval / 1000.0, interval, callback, args])
+
+	def idle_add(self, callback, *args, **kwargs):
+		priority = kwargs.get('priority', 200)
+		return self._add(['idle', priority, self._next_id, callback, args])
+
+	def source_remove(self, sid):
+		if sid in self._sources:
+			del self._sources[sid]
+			return True
+
+		return False
+
+	def pending(self):
+		return len(self._sources) > 0
+
+	def _dispatch(self, sid, ret):
+		if not ret and sid in self._sources:
+			del self._sources[sid]
+
+	def iteration(self, block=True):
+		now = time.time()
+		ios = []
+		timeouts = []
+		idles = []
+
+		for sid, source in self._sources.items():
+			if source[0] == 'io':
+				ios.append((sid, source))
+			elif source[0] == 'timeout':
+				timeouts.append((source[1], sid))
+			else:
+				idles.append((source[1], source[2], sid))
+
+		# Timeouts which expired run first
+		for due, sid in sorted(timeouts):
+			if due <= now and sid in self._sources:
+				source = self._sources[sid]
+
+				if source[3](*source[4]):
+					source[1] = time.time() + source[2] / 1000.0
+				else:
+					self._dispatch(sid, False)
+
+				return True
+
+		wait = None
+
+		if idles or not block:
+			wait = 0
+		elif timeouts:
+			wait = max(0, min(timeouts)[0] - now)
+
+		if ios:
+			fds = []
+
+			for sid, source in ios:
+				fd = source[1]
+
+				if not isinstance(fd, int):
+					fd = fd.fileno()
+
+				fds.append((fd, sid))
+
+			try:
+				ready = select.select([x[0] for x in fds], [], [], wait)[0]
+			except select.error:
+				ready = []
+
+			if ready:
+				for fd, sid in fds:
+					if fd in ready and sid in self._sources:
+						source = self._sources[sid]
+						self._dispatch(sid, source[3](source[1], IO_IN, *source[4]))
+
+				return True
+		elif wait:
+			time.sleep(wait)
+
+		if idles:
+			priority, order, sid = heapq.nsmallest(1, idles)[0]
+			source = self._sources[sid]
+
+			self._dispatch(sid, source[3](*source[4]))
+			return True
+
+		return False
+
+	def run_until(self, predicate, timeout=None):
+		start = time.time()
+
+		while not predicate():
+			if not self.pending():
+				raise RuntimeError('Main loop ran out of sources')
+
+			if timeout != None and time.time() - start > timeout:
+				raise RuntimeError('Main loop timed out')
+
+			self.iteration()
+
+	def run_pending(self):
+		# Run until all idle handlers and timeouts are done
+		while self.iteration(False):
+			pass
+
+loop = MainLoop()
+
+IO_IN = 1
+IO_OUT = 4
+IO_PRI = 2
+IO_ERR = 8
+IO_HUP = 16
+
+SEARCH_DONT_SET_FLAGS = 1 << 0
+SEARCH_ENTIRE_WORD = 1 << 1
+SEARCH_CASE_SENSITIVE = 1 << 2
+
+def _make_glib():
+	glib = types.ModuleType('glib')
+
+	glib.IO_IN = IO_IN
+	glib.IO_OUT = IO_OUT
+	glib.IO_PRI = IO_PRI
+	glib.IO_ERR = IO_ERR
+	glib.IO_HUP = IO_HUP
+
+	glib.PRIORITY_HIGH = -100
+	glib.PRIORITY_DEFAULT = 0
+	glib.PRIORITY_HIGH_IDLE = 100
+	glib.PRIORITY_DEFAULT_IDLE = 200
+	glib.PRIORITY_LOW = 300
+
+	glib.io_add_watch = loop.io_add_watch
+	glib.timeout_add = loop.timeout_add
+	glib.idle_add = loop.idle_add
+	glib.source_remove = loop.source_remove
+
+	return glib
+
+class GioError(Exception):
+	pass
+
+class File:
+	def __init__(self, path=None, uri=None):
+		if uri != None and uri.startswith('file://'):
+			path = uri[7:]
+
+		self._path = os.path.abspath(path)
+
+	def get_path(self):
+		return self._path
+
+	def get_uri(self):
+		return 'file://' + self._path
+
+	def get_basename(self):
+		return os.path.basename(self._path)
+
+	def get_parent(self):
+		return File(os.path.dirname(self._path))
+
+	def resolve_relative_path(self, path):
+		return File(os.path.join(self._path, path))
+
+	def query_exists(self):
+		return os.path.exists(self._path)
+
+	def equal(self, other):
+		return self._path == other.get_path()
+
+	def monitor_directory(self, flags, cancellable):
+		raise GioError('File monitoring is not supported')
+
+	def monitor_file(self, flags, cancellable):
+		raise GioError('File monitoring is not supported')
+
+def _make_gio():
+	gio = types.ModuleType('gio')
+
+	gio.Error = GioError
+	gio.File = File
+
+	gio.FILE_MONITOR_NONE = 0
+	gio.FILE_MONITOR_EVENT_CHANGED = 0
+	gio.FILE_MONITOR_EVENT_CHANGES_DONE_HINT = 1
+	gio.FILE_MONITOR_EVENT_DELETED = 2
+	gio.FILE_MONITOR_EVENT_CREATED = 3
+	gio.FILE_MONITOR_EVENT_ATTRIBUTE_CHANGED = 4
+	gio.FILE_COPY_OVERWRITE = 1
+
+	return gio
+
+def _make_gtk():
+	gtk = types.ModuleType('gtk')
+	gdk = types.ModuleType('gtk.gdk')
+
+	gdk.SHIFT_MASK = 1
+	gdk.CONTROL_MASK = 4
+	gdk.MOD1_MASK = 8
+
+	gtk.gdk = gdk
+
+	gtk.MOVEMENT_VISUAL_POSITIONS = 1
+	gtk.MOVEMENT_WORDS = 2
+	gtk.MOVEMENT_DISPLAY_LINES = 3
+	gtk.MOVEMENT_PARAGRAPHS = 5
+
+	gtk.TEXT_WINDOW_TEXT = 2
+	gtk.TEXT_WINDOW_BOTTOM = 6
+
+	gtk.STOCK_STOP = 'gtk-stop'
+
+	gtk.accelerator_get_default_mod_mask = lambda: gdk.SHIFT_MASK | gdk.CONTROL_MASK | gdk.MOD1_MASK
+
+	return gtk
+
+class _Plugin(object):
+	def get_data_dir(self):
+		return os.path.dirname(os.path.abspath(__file__))
+
+def _make_pluma():
+	pluma = types.ModuleType('pluma')
+	pcommands = types.ModuleType('pluma.commands')
+
+	pluma.SEARCH_DONT_SET_FLAGS = SEARCH_DONT_SET_FLAGS
+	pluma.SEARCH_ENTIRE_WORD = SEARCH_ENTIRE_WORD
+	pluma.SEARCH_CASE_SENSITIVE = SEARCH_CASE_SENSITIVE
+	pluma.Plugin = _Plugin
+
+	for name in ['load_uri', 'load_uris', 'save_document', 'save_all_documents']:
+		setattr(pcommands, name, lambda *args: None)
+
+	pluma.commands = pcommands
+
+	return pluma
+
+def _make_gtksourceview2():
+	gsv = types.ModuleType('gtksourceview2')
+
+	class LanguageManager:
+		def get_language_ids(self):
+			return []
+
+		def get_language(self, name):
+			return None
+
+	gsv.language_manager_get_default = lambda: LanguageManager()
+
+	return gsv
+
+def install():
+	# Register the stand-ins, must be called before importing any commander
+	# code. Real modules which are already loaded are left alone
+	makers = {
+		'glib': _make_glib,
+		'gio': _make_gio,
+		'gtk': _make_gtk,
+		'pluma': _make_pluma,
+		'gtksourceview2': _make_gtksourceview2
+	}
+
+	for name in makers:
+		if not name in sys.modules:
+			mod = makers[name]()
+			sys.modules[name] = mod
+
+			if name == 'gtk':
+				sys.modules['gtk.gdk'] = mod.gdk
+			elif name == 'pluma':
+				sys.modules['pluma.commands'] = mod.commands
+
+def install_commander(path):
+	# Make the commander package importable without running its __init__,
+	# which sets up the plugin and its widgets
+	if 'commander' in sys.modules:
+		return
+
+	pkgdir = os.path.join(path, 'commander')
+
+	if not pkgdir in sys.path:
+		sys.path.insert(0, pkgdir)
+
+	pkg = types.ModuleType('commander')
+	pkg.__path__ = [pkgdir]
+	pkg.__file__ = os.path.join(pkgdir, '__init__.py')
+
+	sys.modules['commander'] = pkg
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  run.py - run the commander module benchmarks
+#
+#  Runs commands of the commander modules on synthetic documents without a
+#  display, using the stand-ins from fakes.py and textbuffer.py. Timings can
+#  be saved as a baseline and later runs compared against it:
+#
+#    python run.py --lines 100000 --save baseline.json
+#    python run.py --lines 100000 --compare baseline.json
+
+import os
+import sys
+import re
+import time
+import json
+import shutil
+import tempfile
+import optparse
+
+import fakes
+import textbuffer
+import documents
+
+fakes.install()
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+fakes.install_commander(PLUGIN_DIR)
+
+import commander.commands as commands
+import commander.commands.result
+import commander.history as history
+import commander.trigramindex as trigramindex
+
+# Differences in timings shorter than this are noise, never regressions
+MIN_TIME = 0.005
+
+# Number of files the lines of a project are spread over
+PROJECT_FILES = 50
+
+class Benchmark:
+	# The command and setup are command lines, or functions called with the
+	# buffer and entry. A project of 'read' puts the document in a directory
+	# of generated files shared by the runs, 'write' creates the directory
+	# again for every run. With idle, the time to run the idle callbacks the
+	# command leaves behind is included
+	def __init__(self, name, command, kind='code', answers=[], select=False, setup=None, check=None, project=None, idle=False):
+		self.name = name
+		self.command = command
+		self.kind = kind
+		self.answers = answers
+		self.select = select
+		self.setup = setup
+		self.check = check
+		self.project = project
+		self.idle = idle
+
+def _contains(text):
+	def check(buf, entry):
+		return text in buf.get_text(*buf.get_bounds())
+
+	return check
+
+def _tagged(name):
+	def check(buf, entry):
+		tag = buf.get_tag_table().lookup(name)
+		return tag != None and len(tag.ranges()) > 0
+
+	return check
+
+def _grepped(regex):
+	# Lines are hidden exactly when grepping them one by one finds no match
+	reg = re.compile(regex)
+
+	def check(buf, entry):
+		tag = buf.get_tag_table().lookup('CommanderModuleGrepHideTag')
+		hidden = tag and tag.ranges() or []
+		offset = 0
+		i = 0
+
+		for line in buf.get_text(*buf.get_bounds()).splitlines(True):
+			while i < len(hidden) and hidden[i][1] <= offset:
+				i += 1
+
+			ishidden = i < len(hidden) and hidden[i][0] <= offset
+
+			if ishidden != (reg.search(line) == None):
+				return False
+
+			offset += len(line)
+
+		return True
+
+	return check
+
+def _untagged(buf, entry):
+	for tag in buf.get_tag_table().tags():
+		if tag.ranges():
+			return False
+
+	return True
+
+def _no_trailing_spaces(buf, entry):
+	return re.search('[ \t]+$', buf.get_text(*buf.get_bounds()), re.MULTILINE) == None
+
+def _upper(buf, entry):
+	text = buf.get_text(*buf.get_bounds())
+	return text == text.upper()
+
+def _moved(buf, entry):
+	return buf.get_iter_at_mark(buf.get_insert()).get_offset() > 0
+
+def _info(buf, entry):
+	return len(entry.info) > 0
+
+def _unchanged_by(command):
+	def check(buf, entry):
+		text = buf.get_text(*buf.get_bounds())
+		execute(entry, command)
+		_idle()
+
+		return buf.get_text(*buf.get_bounds()) == text
+
+	return check
+
+def _columns(line):
+	return [m.start(1) for m in re.finditer('(?:^|\\s)(\\S)', line)]
+
+def _aligned(buf, entry):
+	# Every column starts at the same offset in all lines having it
+	starts = {}
+
+	for line in buf.get_text(*buf.get_bounds()).splitlines():
+		for i, start in enumerate(_columns(line)):
+			if starts.setdefault(i, start) != start:
+				return False
+
+	return True
+
+def _project_dir(buf):
+	return os.path.dirname(buf.get_location().get_path())
+
+def _replaced_in_files(buf, entry):
+	if 'needle' in buf.get_text(*buf.get_bounds()):
+		return False
+
+	for name in os.listdir(_project_dir(buf)):
+		f = file(os.path.join(_project_dir(buf), name), 'r')
+		text = f.read()
+		f.close()
+
+		if 'needle' in text:
+			return False
+
+	return True
+
+def _edit_rows(buf, entry):
+	# Types into the first column of rows spread over the table, letting
+	# the aligning catch up after every key like it would while typing
+	for line in xrange(0, buf.get_line_count(), max(1, buf.get_line_count() / 100)):
+		buf.insert(buf.get_iter_at_line(line), 'x')
+		_idle()
+
+def _history_filename(buf):
+	return os.path.join(_project_dir(buf), 'history')
+
+def _write_history(buf, entry):
+	# A journal of lines repeating each other, as commands are used again.
+	# It is long enough for loading it to schedule compacting it
+	lines = documents.lines(max(buf.get_line_count(), history.HistoryStore.max_lines * 3), 'prose')
+	lines = [lines[i % (len(lines) / 4 + 1)] for i in xrange(len(lines))]
+
+	f = file(_history_filename(buf), 'w')
+	f.write("\n".join(lines) + "\n")
+	f.close()
+
+def _compact_history(buf, entry):
+	history.HistoryStore(_history_filename(buf)).flush()
+
+def _history_compacted(buf, entry):
+	f = file(_history_filename(buf), 'r')
+	lines = f.readlines()
+	f.close()
+
+	return len(lines) <= history.HistoryStore.max_lines and len(set(lines)) == len(lines)
+
+BENCHMARKS = [
+	Benchmark('grep', 'grep needle', check=_tagged('CommanderModuleGrepHideTag')),
+	Benchmark('grep.lines', 'grep \\s+if', check=_grepped('\\s+if')),
+	Benchmark('grep.lines.greedy', 'grep \\d[^x]*', check=_grepped('\\d[^x]*')),
+	Benchmark('grep.live', 'grep.live', answers=['needle'], check=_tagged('CommanderModuleGrepHideTag')),
+	Benchmark('grep.hide', 'grep.hide needle', check=_tagged('CommanderModuleGrepHideTag')),
+	Benchmark('grep.zoomin', 'grep.zoomin needle', check=_tagged('CommanderModuleGrepZoomOutTag')),
+	Benchmark('grep.clear', 'grep.clear', setup='grep needle', check=_untagged),
+	Benchmark('find.replace-all', 'find.replace-all needle pin', check=lambda buf, entry: not _contains('needle')(buf, entry)),
+	Benchmark('find.regex.replace-all', 'find.regex.replace-all "needle_(\\w+)" "pin_$1"', check=_contains('pin_')),
+	Benchmark('align', 'align', kind='table', select=True),
+	Benchmark('align.table', 'align.table', kind='table', select=True, idle=True, check=_aligned),
+	Benchmark('align.table.edit', _edit_rows, kind='table', select=True, setup='align.table', check=_aligned),
+	Benchmark('align.csv', 'align.csv', kind='csv', check=_unchanged_by('align.csv')),
+	Benchmark('grep.files', 'grep.files needle', project='read', check=_info),
+	Benchmark('grep.count', 'grep.count needle', check=_info),
+	Benchmark('find.replace-files', 'find.replace-files needle pin', answers=['y'], project='write', check=_replaced_in_files),
+	Benchmark('find.rename-map', 'find.rename-map needle=pin', check=lambda buf, entry: not _contains('needle')(buf, entry)),
+	Benchmark('history.compact', _compact_history, setup=_write_history, project='write', check=_history_compacted),
+	Benchmark('format.remove-trailing-spaces', 'format.remove-trailing-spaces', check=_no_trailing_spaces),
+	Benchmark('format.upper', 'format.upper', select=True, check=_upper),
+	Benchmark('move.regex', 'move.regex needle 1000', check=_moved),
+	Benchmark('shell', '! cat <!', check=_info)
+]
+
+_re_words = re.compile('("((?:\\\\"|[^"])*)"?|\'((?:\\\\\'|[^\'])*)\'?|[^\s]+)')
+
+def _split(text):
+	# Split the command line like the commander entry does
+	words = list(_re_words.finditer(text))
+	wordsstr = []
+
+	for word in words:
+		for i in (3, 2, 0):
+			if word.group(i) != None:
+				wordsstr.append(word.group(i))
+				break
+
+	return words, wordsstr
+
+def _idle():
+	while fakes.loop.iteration(False):
+		pass
+
+def execute(entry, text, answers=[]):
+	# Execute a command line, answering prompts with answers and running the
+	# main loop while the command is suspended
+	cmds = commands.Commands()
+	state = commands.Commands.State()
+	answers = list(answers)
+
+	while True:
+		words, wordsstr = _split(text)
+		ret = cmds.execute(state, text, words, wordsstr, entry, 0)
+
+		if ret == commands.result.Result.SUSPEND:
+			resumed = []
+			ret.register(lambda: resumed.append(True))
+
+			fakes.loop.run_until(lambda: resumed)
+			text = ''
+		elif ret == commands.result.Result.PROMPT:
+			if not answers:
+				state.clear()
+				raise RuntimeError('Unexpected prompt: ' + ret.prompt)
+
+			text = answers.pop(0)
+		else:
+			return ret
+
+class Runner:
+	def __init__(self, lines, repeat):
+		self.lines = lines
+		self.repeat = repeat
+		self._texts = {}
+		self._project = None
+
+	def text(self, kind):
+		if not kind in self._texts:
+			self._texts[kind] = documents.generate(self.lines, kind)
+
+		return self._texts[kind]
+
+	def project(self, fresh):
+		# A directory of generated files, holding as many lines as the
+		# documents together
+		if self._project and not fresh:
+			return self._project
+
+		self.cleanup()
+		self._project = tempfile.mkdtemp(prefix='commander-benchmark-')
+
+		for i in xrange(PROJECT_FILES):
+			f = file(os.path.join(self._project, 'file%d.c' % (i,)), 'w')
+			f.write(documents.generate(max(1, self.lines / PROJECT_FILES), 'code', i + 1))
+			f.close()
+
+		return self._project
+
+	def cleanup(self):
+		if not self._project:
+			return
+
+		# Also remove the index grepping the project left behind
+		cache = trigramindex.cache_filename(self._project)
+
+		if os.path.exists(cache):
+			os.unlink(cache)
+
+		shutil.rmtree(self._project)
+		self._project = None
+
+	def document(self, bench):
+		location = None
+
+		if bench.project:
+			location = os.path.join(self.project(bench.project == 'write'), 'document.c')
+
+		buf = textbuffer.Document(self.text(bench.kind), location)
+		view = textbuffer.View(buf)
+		entry = textbuffer.Entry(view)
+
+		if bench.select:
+			buf.select_range(buf.get_start_iter(), buf.get_end_iter())
+		else:
+			buf.place_cursor(buf.get_start_iter())
+
+		if callable(bench.setup):
+			bench.setup(buf, entry)
+		elif bench.setup:
+			execute(entry, bench.setup)
+			_idle()
+
+		return buf, entry
+
+	def run(self, bench):
+		times = []
+
+		for i in xrange(self.repeat):
+			buf, entry = self.document(bench)
+
+			start = time.time()
+
+			if callable(bench.command):
+				bench.command(buf, entry)
+			else:
+				execute(entry, bench.command, bench.answers)
+
+			if bench.idle:
+				_idle()
+
+			times.append(time.time() - start)
+
+			if bench.check and not bench.check(buf, entry):
+				raise RuntimeError('Benchmark %s did not have the expected result' % (bench.name,))
+
+		size = len(self.text(bench.kind))
+
+		return {
+			'min': min(times),
+			'mean': sum(times) / len(times),
+			'lines': self.lines,
+			'bytes': size
+		}
+
+def _rate(amount, seconds):
+	if seconds <= 0:
+		return float('inf')
+
+	return amount / seconds
+
+def report(name, result, baseline=None, tolerance=0):
+	line = '%-32s %10.2f %10.2f %12.0f %8.2f' % (name,
+	                                             result['min'] * 1000,
+	                                             result['mean'] * 1000,
+	                                             _rate(result['lines'], result['min']),
+	                                             _rate(result['bytes'] / 1000000.0, result['min']))
+
+	regressed = False
+
+	if baseline and name in baseline['results']:
+		base = baseline['results'][name]['min']
+		change = (result['min'] - base) / base
+
+		line += ' %+7.1f%%' % (change * 100,)
+
+		if change > tolerance and result['min'] - base > MIN_TIME:
+			line += ' REGRESSION'
+			regressed = True
+
+	print line
+	sys.stdout.flush()
+
+	return regressed
+
+def main():
+	parser = optparse.OptionParser(usage='%prog [options] [benchmark...]')
+
+	parser.add_option('-n', '--lines', type='int', default=10000, help='number of lines in the documents [%default]')
+	parser.add_option('-r', '--repeat', type='int', default=3, help='number of times each benchmark is run [%default]')
+	parser.add_option('-f', '--filter', default=None, help='only run benchmarks matching this regular expression')
+	parser.add_option('-s', '--save', metavar='FILE', default=None, help='save the results as a baseline')
+	parser.add_option('-c', '--compare', metavar='FILE', default=None, help='compare the results with a baseline')
+	parser.add_option('-t', '--tolerance', type='float', default=0.25, help='allowed slowdown before reporting a regression [%default]')
+	parser.add_option('-l', '--list', action='store_true', default=False, help='list the benchmarks')
+
+	options, args = parser.parse_args()
+
+	if options.list:
+		for bench in BENCHMARKS:
+			if callable(bench.command):
+				print '%-32s %s' % (bench.name, bench.command.__name__)
+			else:
+				print '%-32s %s' % (bench.name, bench.command)
+
+		return 0
+
+	benchmarks = BENCHMARKS
+
+	if args:
+		benchmarks = filter(lambda x: x.name in args, benchmarks)
+
+	if options.filter:
+		reg = re.compile(options.filter)
+		benchmarks = filter(lambda x: reg.search(x.name), benchmarks)
+
+	baseline = None
+
+	if options.compare:
+		f = file(options.compare, 'r')
+		baseline = json.load(f)
+		f.close()
+
+		if baseline['lines'] != options.lines:
+			sys.stderr.write('Baseline was recorded with %d lines, comparing anyway\n' % (baseline['lines'],))
+
+	commands.Commands().set_dirs([os.path.join(PLUGIN_DIR, 'modules')])
+	runner = Runner(options.lines, options.repeat)
+
+	print '%-32s %10s %10s %12s %8s' % ('benchmark', 'min (ms)', 'mean (ms)', 'lines/s', 'MB/s')
+
+	results = {}
+	regressed = False
+
+	try:
+		for bench in benchmarks:
+			results[bench.name] = runner.run(bench)
+
+			if report(bench.name, results[bench.name], baseline, options.tolerance):
+				regressed = True
+	finally:
+		runner.cleanup()
+
+	if options.save:
+		f = file(options.save, 'w')
+		json.dump({'lines': options.lines, 'repeat': options.repeat, 'results': results}, f, indent=4, sort_keys=True)
+		f.close()
+
+	if regressed:
+		return 1
+
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,1052 @@
+# -*- coding: utf-8 -*-
+#
+#  textbuffer.py - pure python stand-in for the gtk/pluma text widgets
+#
+#  Implements the parts of gtk.TextBuffer, gtk.TextIter, gtk.TextView and
+#  pluma.Document used by the commander modules. Text is kept as a list of
+#  lines, so walking lines and editing within a line is cheap, and a Fenwick
+#  tree of the line lengths maps between character offsets and lines.
+#  Characters are bytes, the generated documents are plain ascii.
+
+import bisect
+
+import fakes
+
+class _LineIndex:
+	# Fenwick tree over the line lengths (including the newline)
+	def __init__(self, lines):
+		n = len(lines)
+		tree = [len(x) + 1 for x in lines]
+
+		for i in xrange(n):
+			j = i | (i + 1)
+
+			if j < n:
+				tree[j] += tree[i]
+
+		self._tree = tree
+		self._n = n
+
+		self._step = 1
+
+		while self._step * 2 <= n:
+			self._step *= 2
+
+	def add(self, i, delta):
+		tree = self._tree
+
+		while i < self._n:
+			tree[i] += delta
+			i |= i + 1
+
+	def prefix(self, i):
+		# Sum of the lengths of the lines before line i
+		tree = self._tree
+		ret = 0
+		i -= 1
+
+		while i >= 0:
+			ret += tree[i]
+			i = (i & (i + 1)) - 1
+
+		return ret
+
+	def find(self, offset):
+		# Line containing offset and the offset within that line
+		tree = self._tree
+		pos = 0
+		step = self._step
+
+		while step:
+			nxt = pos + step
+
+			if nxt <= self._n and tree[nxt - 1] <= offset:
+				pos = nxt
+				offset -= tree[nxt - 1]
+
+			step >>= 1
+
+		return pos, offset
+
+class Rectangle:
+	def __init__(self, x=0, y=0, width=0, height=0):
+		self.x = x
+		self.y = y
+		self.width = width
+		self.height = height
+
+class TextIter(object):
+	__slots__ = ['_buffer', '_line', '_col']
+
+	def __init__(self, buf, line, col):
+		self._buffer = buf
+		self._line = line
+		self._col = col
+
+	def _len(self):
+		return len(self._buffer._lines[self._line])
+
+	def _last(self):
+		return self._line == len(self._buffer._lines) - 1
+
+	def _set(self, other):
+		self._line = other._line
+		self._col = other._col
+
+	def _key(self):
+		return (self._line, self._col)
+
+	def get_buffer(self):
+		return self._buffer
+
+	def copy(self):
+		return TextIter(self._buffer, self._line, self._col)
+
+	def get_offset(self):
+		return self._buffer._line_start(self._line) + self._col
+
+	def set_offset(self, offset):
+		self._line, self._col = self._buffer._locate(offset)
+
+	def get_line(self):
+		return self._line
+
+	def set_line(self, line):
+		self._line = max(0, min(line, len(self._buffer._lines) - 1))
+		self._col = 0
+
+	def get_line_offset(self):
+		return self._col
+
+	def set_line_offset(self, col):
+		self._col = col
+
+	def get_chars_in_line(self):
+		if self._last():
+			return self._len()
+		else:
+			return self._len() + 1
+
+	def get_char(self):
+		line = self._buffer._lines[self._line]
+
+		if self._col < len(line):
+			return line[self._col]
+		elif not self._last():
+			return "\n"
+		else:
+			return ''
+
+	def get_text(self, other):
+		return self._buffer.get_text(self, other)
+
+	get_slice = get_text
+
+	def is_start(self):
+		return self._line == 0 and self._col == 0
+
+	def is_end(self):
+		return self._last() and self._col == self._len()
+
+	def starts_line(self):
+		return self._col == 0
+
+	def ends_line(self):
+		return self._col == self._len()
+
+	def forward_chars(self, num):
+		if num < 0:
+			return self.backward_chars(-num)
+
+		col = self._col + num
+
+		if col <= self._len():
+			self._col = col
+		else:
+			self.set_offset(min(self.get_offset() + num, self._buffer.get_char_count()))
+
+		return num != 0 and not self.is_end()
+
+	def backward_chars(self, num):
+		if num < 0:
+			return self.forward_chars(-num)
+
+		if self._col >= num:
+			self._col -= num
+		else:
+			self.set_offset(max(0, self.get_offset() - num))
+
+		return num != 0
+
+	def forward_char(self):
+		return self.forward_chars(1)
+
+	def backward_char(self):
+		if self.is_start():
+			return False
+
+		return self.backward_chars(1)
+
+	def forward_line(self):
+		if self._last():
+			self._col = self._len()
+			return False
+
+		self._line += 1
+		self._col = 0
+
+		return True
+
+	def backward_line(self):
+		if self._line == 0:
+			moved = self._col != 0
+			self._col = 0
+
+			return moved
+
+		self._line -= 1
+		self._col = 0
+
+		return True
+
+	def forward_lines(self, num):
+		ret = True
+
+		for i in xrange(0, abs(num)):
+			if num > 0:
+				ret = self.forward_line()
+			else:
+				ret = self.backward_line()
+
+			if not ret:
+				break
+
+		return ret
+
+	def forward_to_line_end(self):
+		if self._col < self._len():
+			self._col = self._len()
+		elif not self._last():
+			self._line += 1
+			self._col = self._len()
+		else:
+			return False
+
+		return not self.is_end()
+
+	def forward_to_end(self):
+		self._set(self._buffer.get_end_iter())
+
+	def has_tag(self, tag):
+		if not tag._toggles:
+			return False
+
+		return bisect.bisect_right(tag._toggles, self.get_offset()) % 2 == 1
+
+	def compare(self, other):
+		return cmp(self._key(), other._key())
+
+	def equal(self, other):
+		return self._line == other._line and self._col == other._col
+
+	def in_range(self, start, end):
+		return start.compare(self) <= 0 and self.compare(end) < 0
+
+	def order(self, other):
+		if self.compare(other) > 0:
+			line, col = self._line, self._col
+			self._set(other)
+
+			other._line = line
+			other._col = col
+
+class TextMark(object):
+	def __init__(self, buf, name, line, col, left_gravity):
+		self._buffer = buf
+		self._name = name
+		self._line = line
+		self._col = col
+		self._left_gravity = left_gravity
+		self._deleted = False
+
+	def get_buffer(self):
+		return self._buffer
+
+	def get_name(self):
+		return self._name
+
+	def get_left_gravity(self):
+		return self._left_gravity
+
+	def get_deleted(self):
+		return self._deleted
+
+class _Props:
+	def __init__(self, props):
+		self.__dict__.update(props)
+
+class TextTag(object):
+	def __init__(self, name, props):
+		self._name = name
+		self.props = _Props(props)
+
+		# Sorted list of offsets where the tag is toggled on and off
+		self._toggles = []
+
+	def get_property(self, name):
+		return getattr(self.props, name.replace('-', '_'))
+
+	def set_property(self, name, value):
+		setattr(self.props, name.replace('-', '_'), value)
+
+	def _apply(self, start, end):
+		if start >= end:
+			return
+
+		t = self._toggles
+		i = bisect.bisect_left(t, start)
+		j = bisect.bisect_right(t, end)
+		rep = []
+
+		if i % 2 == 0:
+			rep.append(start)
+
+		if j % 2 == 0:
+			rep.append(end)
+
+		t[i:j] = rep
+
+	def _remove(self, start, end):
+		if start >= end:
+			return
+
+		t = self._toggles
+		i = bisect.bisect_left(t, start)
+		j = bisect.bisect_right(t, end)
+		rep = []
+
+		if i % 2 == 1:
+			rep.append(start)
+
+		if j % 2 == 1:
+			rep.append(end)
+
+		t[i:j] = rep
+
+	def _inserted(self, offset, length):
+		t = self._toggles
+		i = bisect.bisect_left(t, offset)
+
+		# Text inserted where a range starts ends up before it
+		for k in xrange(i, len(t)):
+			if t[k] > offset or k % 2 == 0:
+				t[k] += length
+
+	def _deleted(self, start, end):
+		t = self._toggles
+		i = bisect.bisect_left(t, start)
+		length = end - start
+
+		for k in xrange(i, len(t)):
+			if t[k] <= end:
+				t[k] = start
+			else:
+				t[k] -= length
+
+		# Toggles which ended up at the same offset cancel each other out in
+		# pairs, dropping collapsed ranges and joining touching ones
+		j = bisect.bisect_right(t, start, i)
+		t[i:j] = [start] * ((j - i) % 2)
+
+	def ranges(self):
+		t = self._toggles
+		return [(t[i], t[i + 1]) for i in xrange(0, len(t), 2)]
+
+class TextTagTable(object):
+	def __init__(self):
+		self._tags = {}
+		self._anonymous = []
+
+	def lookup(self, name):
+		return self._tags.get(name)
+
+	def add(self, tag):
+		if tag._name == None:
+			self._anonymous.append(tag)
+		else:
+			self._tags[tag._name] = tag
+
+	def remove(self, tag):
+		if tag._name in self._tags:
+			del self._tags[tag._name]
+		elif tag in self._anonymous:
+			self._anonymous.remove(tag)
+
+	def tags(self):
+		return self._tags.values() + self._anonymous
+
+	def get_size(self):
+		return len(self._tags) + len(self._anonymous)
+
+class _Signals:
+	def __init__(self):
+		self._handlers = {}
+		self._next_id = 1
+
+	def connect(self, name, callback, args, after):
+		hid = self._next_id
+		self._next_id += 1
+
+		self._handlers.setdefault(name, []).append((hid, callback, args, after))
+		return hid
+
+	def disconnect(self, hid):
+		for name in self._handlers:
+			self._handlers[name] = filter(lambda x: x[0] != hid, self._handlers[name])
+
+	def has(self, name):
+		return bool(self._handlers.get(name))
+
+	def emit(self, obj, name, after, *args):
+		for hid, callback, extra, isafter in list(self._handlers.get(name, [])):
+			if isafter == after:
+				callback(obj, *(args + extra))
+
+class TextBuffer(object):
+	def __init__(self, text=''):
+		self._lines = [u'']
+		self._index = None
+		self._marks = []
+		self._named = {}
+		self._table = TextTagTable()
+		self._signals = _Signals()
+		self._user_action = 0
+		self._modified = False
+		self._data = {}
+
+		self._insert = self.create_mark('insert', self.get_start_iter(), False)
+		self._selection_bound = self.create_mark('selection_bound', self.get_start_iter(), False)
+
+		if text:
+			self.set_text(text)
+
+	# Offsets
+	def _ensure_index(self):
+		if self._index == None:
+			self._index = _LineIndex(self._lines)
+
+		return self._index
+
+	def _line_start(self, line):
+		return self._ensure_index().prefix(line)
+
+	def _locate(self, offset):
+		line, col = self._ensure_index().find(offset)
+
+		if line >= len(self._lines):
+			line = len(self._lines) - 1
+			col = len(self._lines[line])
+
+		return line, col
+
+	# Signals
+	def connect(self, name, callback, *args):
+		return self._signals.connect(name, callback, args, False)
+
+	def connect_after(self, name, callback, *args):
+		return self._signals.connect(name, callback, args, True)
+
+	def disconnect(self, hid):
+		self._signals.disconnect(hid)
+
+	def _emit(self, name, *args):
+		self._signals.emit(self, name, False, *args)
+		self._signals.emit(self, name, True, *args)
+
+	def set_data(self, key, data):
+		self._data[key] = data
+
+	def get_data(self, key):
+		return self._data.get(key)
+
+	# Iterators
+	def get_start_iter(self):
+		return TextIter(self, 0, 0)
+
+	def get_end_iter(self):
+		line = len(self._lines) - 1
+		return TextIter(self, line, len(self._lines[line]))
+
+	def get_bounds(self):
+		return (self.get_start_iter(), self.get_end_iter())
+
+	def get_iter_at_offset(self, offset):
+		ret = self.get_start_iter()
+		ret.set_offset(max(0, offset))
+
+		return ret
+
+	def get_iter_at_line(self, line):
+		ret = self.get_start_iter()
+		ret.set_line(line)
+
+		return ret
+
+	def get_iter_at_line_offset(self, line, col):
+		ret = self.get_iter_at_line(line)
+		ret.set_line_offset(min(col, ret._len()))
+
+		return ret
+
+	def get_iter_at_mark(self, mark):
+		return TextIter(self, mark._line, mark._col)
+
+	def get_line_count(self):
+		return len(self._lines)
+
+	def get_char_count(self):
+		return self._line_start(len(self._lines)) - 1
+
+	def get_text(self, start, end, include_hidden_chars=True):
+		if start.compare(end) > 0:
+			start, end = end, start
+
+		lines = self._lines
+
+		# Text is kept as unicode, but returned as UTF-8 like the real thing
+		if start._line == end._line:
+			return lines[start._line][start._col:end._col].encode('utf-8')
+
+		parts = [lines[start._line][start._col:]]
+		parts.extend(lines[start._line + 1:end._line])
+		parts.append(lines[end._line][:end._col])
+
+		return u"\n".join(parts).encode('utf-8')
+
+	get_slice = get_text
+
+	# Marks
+	def create_mark(self, name, where, left_gravity=False):
+		mark = TextMark(self, name, where._line, where._col, left_gravity)
+		self._marks.append(mark)
+
+		if name != None:
+			if name in self._named:
+				self.delete_mark(self._named[name])
+
+			self._named[name] = mark
+
+		return mark
+
+	def get_mark(self, name):
+		return self._named.get(name)
+
+	def move_mark(self, mark, where):
+		if isinstance(mark, basestring):
+			mark = self._named[mark]
+
+		mark._line = where._line
+		mark._col = where._col
+
+	move_mark_by_name = move_mark
+
+	def delete_mark(self, mark):
+		if isinstance(mark, basestring):
+			mark = self._named[mark]
+
+		if mark._deleted:
+			return
+
+		mark._deleted = True
+		self._marks.remove(mark)
+
+		if mark._name != None and self._named.get(mark._name) is mark:
+			del self._named[mark._name]
+
+	delete_mark_by_name = delete_mark
+
+	def get_insert(self):
+		return self._insert
+
+	def get_selection_bound(self):
+		return self._selection_bound
+
+	def place_cursor(self, where):
+		self.select_range(where, where)
+
+	def select_range(self, ins, bound):
+		self.move_mark(self._insert, ins)
+		self.move_mark(self._selection_bound, bound)
+
+	def get_selection_bounds(self):
+		start = self.get_iter_at_mark(self._insert)
+		end = self.get_iter_at_mark(self._selection_bound)
+
+		if start.equal(end):
+			return ()
+
+		start.order(end)
+		return (start, end)
+
+	def get_has_selection(self):
+		return len(self.get_selection_bounds()) != 0
+
+	# Tags
+	def get_tag_table(self):
+		return self._table
+
+	def create_tag(self, name=None, **props):
+		tag = TextTag(name, props)
+		self._table.add(tag)
+
+		return tag
+
+	def _tag(self, tag):
+		if isinstance(tag, basestring):
+			return self._table.lookup(tag)
+
+		return tag
+
+	def apply_tag(self, tag, start, end):
+		start, end = self._ordered(start, end)
+		self._tag(tag)._apply(start.get_offset(), end.get_offset())
+
+	def remove_tag(self, tag, start, end):
+		tag = self._tag(tag)
+
+		if tag._toggles:
+			start, end = self._ordered(start, end)
+			tag._remove(start.get_offset(), end.get_offset())
+
+	apply_tag_by_name = apply_tag
+	remove_tag_by_name = remove_tag
+
+	def remove_all_tags(self, start, end):
+		for tag in self._table.tags():
+			self.remove_tag(tag, start, end)
+
+	def _tagged(self):
+		return filter(lambda x: x._toggles, self._table.tags())
+
+	# Editing
+	def _ordered(self, start, end):
+		if start.compare(end) > 0:
+			return end, start
+
+		return start, end
+
+	def set_text(self, text):
+		self.delete(self.get_start_iter(), self.get_end_iter())
+		self.insert(self.get_start_iter(), text)
+
+	def insert(self, where, text, length=-1):
+		if isinstance(text, unicode):
+			text = text.encode('utf-8')
+
+		if length >= 0:
+			text = text[:length]
+
+		if not text:
+			return
+
+		if self._signals.has('insert-text'):
+			self._signals.emit(self, 'insert-text', False, where, text, len(text))
+
+		self._do_insert(where, text.decode('utf-8'))
+
+		self._signals.emit(self, 'insert-text', True, where, text, len(text))
+		self._changed()
+
+	def insert_at_cursor(self, text, length=-1):
+		self.insert(self.get_iter_at_mark(self._insert), text, length)
+
+	def _do_insert(self, where, text):
+		line = where._line
+		col = where._col
+		tagged = self._tagged()
+
+		if tagged:
+			offset = where.get_offset()
+
+		s = self._lines[line]
+		parts = text.split("\n")
+
+		if len(parts) == 1:
+			self._lines[line] = s[:col] + text + s[col:]
+
+			if self._index != None:
+				self._index.add(line, len(text))
+
+			endline = line
+			endcol = col + len(text)
+		else:
+			parts[0] = s[:col] + parts[0]
+			endcol = len(parts[-1])
+			parts[-1] += s[col:]
+
+			self._lines[line:line + 1] = parts
+			self._index = None
+
+			endline = line + len(parts) - 1
+
+		for mark in self._marks:
+			if mark._line < line or (mark._line == line and (mark._col < col or (mark._col == col and mark._left_gravity))):
+				continue
+
+			if mark._line == line:
+				mark._col = endcol + mark._col - col
+
+			mark._line += endline - line
+
+		for tag in tagged:
+			tag._inserted(offset, len(text))
+
+		where._line = endline
+		where._col = endcol
+
+	def delete(self, start, end):
+		start, end = self._ordered(start, end)
+
+		if start.equal(end):
+			return
+
+		if self._signals.has('delete-range'):
+			self._signals.emit(self, 'delete-range', False, start, end)
+
+		self._do_delete(start, end)
+
+		self._signals.emit(self, 'delete-range', True, start, end)
+		self._changed()
+
+	def _do_delete(self, start, end):
+		l1, c1 = start._line, start._col
+		l2, c2 = end._line, end._col
+		tagged = self._tagged()
+
+		if tagged:
+			offsets = (start.get_offset(), end.get_offset())
+
+		lines = self._lines
+
+		if l1 == l2:
+			s = lines[l1]
+			lines[l1] = s[:c1] + s[c2:]
+
+			if self._index != None:
+				self._index.add(l1, c1 - c2)
+		else:
+			lines[l1:l2 + 1] = [lines[l1][:c1] + lines[l2][c2:]]
+			self._index = None
+
+		for mark in self._marks:
+			key = (mark._line, mark._col)
+
+			if key <= (l1, c1):
+				continue
+			elif key <= (l2, c2):
+				mark._line = l1
+				mark._col = c1
+			elif mark._line == l2:
+				mark._line = l1
+				mark._col = c1 + mark._col - c2
+			else:
+				mark._line -= l2 - l1
+
+		for tag in tagged:
+			tag._deleted(*offsets)
+
+		end._line = l1
+		end._col = c1
+
+	def _changed(self):
+		self._modified = True
+		self._emit('changed')
+
+	def get_modified(self):
+		return self._modified
+
+	def set_modified(self, modified):
+		self._modified = modified
+
+	def begin_user_action(self):
+		self._user_action += 1
+
+		if self._user_action == 1:
+			self._emit('begin-user-action')
+
+	def end_user_action(self):
+		self._user_action -= 1
+
+		if self._user_action == 0:
+			self._emit('end-user-action')
+
+	def begin_not_undoable_action(self):
+		pass
+
+	def end_not_undoable_action(self):
+		pass
+
+class _StyleScheme:
+	def get_style(self, name):
+		return None
+
+class Document(TextBuffer):
+	# pluma.Document
+	def __init__(self, text='', location=None):
+		TextBuffer.__init__(self, text)
+
+		self._location = location
+		self._search_text = ''
+		self._search_flags = 0
+		self._language = None
+
+		self.set_modified(False)
+
+	def is_untitled(self):
+		return self._location == None
+
+	def is_local(self):
+		return True
+
+	def get_location(self):
+		if self._location == None:
+			return None
+
+		return fakes.File(self._location)
+
+	def get_uri(self):
+		if self._location == None:
+			return None
+
+		return self.get_location().get_uri()
+
+	def get_short_name_for_display(self):
+		if self._location == None:
+			return 'Unsaved Document'
+
+		return self.get_location().get_basename()
+
+	def get_language(self):
+		return self._language
+
+	def set_language(self, language):
+		self._language = language
+
+	def get_style_scheme(self):
+		return _StyleScheme()
+
+	def set_search_text(self, text, flags):
+		self._search_text = text
+		self._search_flags = flags
+
+	def get_search_text(self):
+		return (self._search_text, self._search_flags)
+
+	def search_forward(self, start, end, match_start, match_end):
+		# Scans in growing chunks of lines, like the real thing it does not
+		# look beyond the first match
+		needle = self._search_text.decode('utf-8')
+
+		if not needle:
+			return False
+
+		sensitive = self._search_flags & fakes.SEARCH_CASE_SENSITIVE
+
+		if not sensitive:
+			needle = needle.lower()
+
+		pos = start.copy()
+		chunk = 64
+
+		while pos.compare(end) < 0:
+			stop = pos.copy()
+
+			if not stop.forward_lines(chunk) or stop.compare(end) > 0:
+				stop = end.copy()
+
+			text = pos.get_text(stop).decode('utf-8')
+
+			if not sensitive:
+				text = text.lower()
+
+			idx = text.find(needle)
+
+			if idx != -1:
+				match_start._set(pos)
+				match_start.forward_chars(idx)
+
+				match_end._set(match_start)
+				match_end.forward_chars(len(needle))
+
+				return True
+
+			if stop.equal(end):
+				break
+
+			# Allow for matches spanning the chunk boundary
+			pos = stop
+			pos.backward_chars(len(needle) - 1)
+			chunk *= 2
+
+		return False
+
+class Window:
+	def __init__(self):
+		self._views = []
+		self._active = None
+
+	def add_view(self, view):
+		self._views.append(view)
+
+		if self._active == None:
+			self._active = view
+
+	def get_views(self):
+		return list(self._views)
+
+	def get_documents(self):
+		return [x.get_buffer() for x in self._views]
+
+	def get_active_view(self):
+		return self._active
+
+	def get_active_document(self):
+		if self._active:
+			return self._active.get_buffer()
+
+		return None
+
+	def set_active_view(self, view):
+		self._active = view
+
+class View(object):
+	# Lines are a fixed number of pixels high, the visible area shows a fixed
+	# number of lines
+	LINE_HEIGHT = 16
+	VISIBLE_LINES = 50
+
+	def __init__(self, buf, window=None):
+		self._buffer = buf
+		self._tab_width = 8
+		self._insert_spaces = False
+		self._editable = True
+		self._top = 0
+		self._signals = _Signals()
+		self._data = {}
+
+		if window == None:
+			window = Window()
+
+		self._window = window
+		window.add_view(self)
+
+	def get_buffer(self):
+		return self._buffer
+
+	def get_toplevel(self):
+		return self._window
+
+	def get_tab_width(self):
+		return self._tab_width
+
+	def set_tab_width(self, width):
+		self._tab_width = width
+
+	def get_insert_spaces_instead_of_tabs(self):
+		return self._insert_spaces
+
+	def set_insert_spaces_instead_of_tabs(self, spaces):
+		self._insert_spaces = spaces
+
+	def get_editable(self):
+		return self._editable
+
+	def set_editable(self, editable):
+		self._editable = editable
+
+	def get_visible_rect(self):
+		return Rectangle(0, self._top * View.LINE_HEIGHT, 800, View.VISIBLE_LINES * View.LINE_HEIGHT)
+
+	def get_iter_location(self, piter):
+		return Rectangle(0, piter.get_line() * View.LINE_HEIGHT, 8, View.LINE_HEIGHT)
+
+	def get_line_yrange(self, piter):
+		return (piter.get_line() * View.LINE_HEIGHT, View.LINE_HEIGHT)
+
+	def get_line_at_y(self, y):
+		piter = self._buffer.get_iter_at_line(y / View.LINE_HEIGHT)
+		return (piter, piter.get_line() * View.LINE_HEIGHT)
+
+	def get_iter_at_location(self, x, y):
+		return self.get_line_at_y(y)[0]
+
+	def window_to_buffer_coords(self, win, x, y):
+		return (x, y)
+
+	def buffer_to_window_coords(self, win, x, y):
+		return (x, y)
+
+	def scroll_to_line(self, line):
+		if line < self._top or line >= self._top + View.VISIBLE_LINES:
+			self._top = max(0, line - View.VISIBLE_LINES / 2)
+
+	def scroll_to_iter(self, piter, margin, use_align=False, xalign=0.5, yalign=0.5):
+		self.scroll_to_line(piter.get_line())
+		return True
+
+	def scroll_to_mark(self, mark, margin, use_align=False, xalign=0.5, yalign=0.5):
+		self.scroll_to_line(mark._line)
+
+	def connect(self, name, callback, *args):
+		return self._signals.connect(name, callback, args, False)
+
+	def connect_after(self, name, callback, *args):
+		return self._signals.connect(name, callback, args, True)
+
+	def disconnect(self, hid):
+		self._signals.disconnect(hid)
+
+	def emit(self, name, *args):
+		self._signals.emit(self, name, False, *args)
+		self._signals.emit(self, name, True, *args)
+
+	def set_data(self, key, data):
+		self._data[key] = data
+
+	def get_data(self, key):
+		return self._data.get(key)
+
+	def grab_focus(self):
+		pass
+
+	def queue_draw(self):
+		pass
+
+class Entry:
+	# Stands in for the commander entry, keeps what would be shown in the
+	# info window
+	def __init__(self, view):
+		self._view = view
+		self.info = []
+		self.status = None
+
+	def view(self):
+		return self._view
+
+	def info_show(self, text='', use_markup=False):
+		self.info.append(text)
+
+	def info_status(self, text):
+		self.status = text
+
+	def info_add_action(self, stock, callback, data=None):
+		return None
+
+	def info_add_link(self, text, callback, data=None, use_markup=False):
+		self.info.append(text)
+
+	def prompt(self, pr=''):
+		pass
+
+	def clear_info(self):
+		self.info = []
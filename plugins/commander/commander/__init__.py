@@ -25,6 +25,8 @@ class Commander(pluma.Plugin):
 			os.path.join(self.get_data_dir(), 'modules')
 		])
 
+		commands.Commands().set_manifest(os.path.expanduser('~/.cache/pluma/commander/manifest'))
+
 	def activate(self, window):
 		self._instances[window] = WindowHelper(self, window)
 
@@ -1,4 +1,5 @@
 import os
+import time
 import gio
 import sys
 import bisect
@@ -12,6 +13,10 @@ import module
 import method
 import result
 import exceptions
+import trie
+import manifest
+import fuzzy
+import timing
 
 from accel_group import AccelGroup
 from accel_group import Accelerator
@@ -61,10 +66,14 @@ class Singleton(object):
 
 class Commands(Singleton):
 	class Continuated:
-		def __init__(self, generator):
+		def __init__(self, generator, timing=None):
 			self.generator = generator
 			self.retval = None
 
+			self.timing = timing
+			self.started = False
+			self.prompted = None
+
 		def autocomplete_func(self):
 			if self.retval == result.Result.PROMPT:
 				return self.retval.autocomplete
@@ -76,10 +85,11 @@ class Commands(Singleton):
 
 	class State:
 		def __init__(self):
-			self.clear()
+			self.stack = []
 
 		def clear(self):
-			self.stack = []
+			while self.stack:
+				self.pop()
 
 		def top(self):
 			return self.stack[0]
@@ -87,15 +97,36 @@ class Commands(Singleton):
 		def run(self, ret):
 			ct = self.top()
 
-			if ret:
-				ct.retval = ct.generator.send(ret)
-			else:
-				ct.retval = ct.generator.next()
+			if ct.timing:
+				if ct.prompted != None:
+					ct.timing.wait += time.time() - ct.prompted
+					ct.prompted = None
+
+				if ct.started:
+					ct.timing.resumes += 1
+
+			ct.started = True
+			timer = timing.Timer(ct.timing)
+
+			try:
+				if ret:
+					ct.retval = ct.generator.send(ret)
+				else:
+					ct.retval = ct.generator.next()
+			finally:
+				timer.stop()
+
+			if isinstance(ct.retval, result.Prompt):
+				ct.prompted = time.time()
 
 			return ct.retval
 
-		def push(self, gen):
-			self.stack.insert(0, Commands.Continuated(gen))
+		def push(self, gen, timing=None):
+			# Generators yielded by a command account to the command
+			if timing == None and self.stack:
+				timing = self.stack[0].timing
+
+			self.stack.insert(0, Commands.Continuated(gen, timing))
 
 		def pop(self):
 			if not self.stack:
@@ -116,8 +147,11 @@ class Commands(Singleton):
 
 	def __init_once__(self):
 		self._modules = None
+		self._trie = None
+		self._fuzzy = None
 		self._dirs = []
-		self._monitors = []
+		self._manifest = None
+		self._monitors = {}
 		self._accel_group = None
 
 		self._timeouts = {}
@@ -127,12 +161,17 @@ class Commands(Singleton):
 	def set_dirs(self, dirs):
 		self._dirs = dirs
 
+	def set_manifest(self, filename):
+		self._manifest = manifest.Manifest(filename)
+
 	def stop(self):
-		for mon in self._monitors:
+		for mon in self._monitors.values():
 			mon.cancel()
 
-		self._monitors = []
+		self._monitors = {}
 		self._modules = None
+		self._trie = None
+		self._fuzzy = None
 
 		for k in self._timeouts:
 			glib.source_remove(self._timeouts[k])
@@ -140,7 +179,7 @@ class Commands(Singleton):
 		self._timeouts = {}
 
 	def accelerator_activated(self, accel, mod, state, entry):
-		self.run(state, mod.execute('', [], entry, 0, accel.arguments))
+		self.run(state, mod.execute('', [], entry, 0, accel.arguments), mod.timing())
 
 	def scan_accelerators(self, modules=None):
 		if modules == None:
@@ -171,7 +210,42 @@ class Commands(Singleton):
 		self.ensure()
 		return list(self._modules)
 
+	def command_trie(self):
+		self.ensure()
+		return self._trie
+
+	def _add_fuzzy(self, path, cmd):
+		self._fuzzy.add(path, cmd)
+
+		for c in cmd.commands():
+			self._add_fuzzy(path + '.' + c.name, c)
+
+	def fuzzy_index(self):
+		# Fuzzy index over the full (dotted) paths of all the commands
+		self.ensure()
+
+		if self._fuzzy == None:
+			self._fuzzy = fuzzy.Index()
+
+			for cmd in self._trie.values():
+				self._add_fuzzy(cmd.name, cmd)
+
+		return self._fuzzy
+
+	def _insert_command(self, cmd):
+		bisect.insort(self._modules, cmd)
+		self._trie.add(cmd.name, cmd)
+		self._fuzzy = None
+
+	def _remove_command(self, cmd):
+		self._modules.remove(cmd)
+		self._trie.remove(cmd.name, cmd)
+		self._fuzzy = None
+
 	def add_monitor(self, d):
+		if d in self._monitors:
+			return
+
 		gfile = gio.File(d)
 		monitor = None
 
@@ -184,7 +258,20 @@ class Commands(Singleton):
 
 		if monitor:
 			monitor.connect('changed', self.on_monitor_changed)
-			self._monitors.append(monitor)
+			self._monitors[d] = monitor
+
+	def add_monitors(self, d):
+		# Package style modules can have subpackages
+		for root, dirs, files in os.walk(d):
+			self.add_monitor(root)
+
+	def remove_monitors(self, d):
+		prefix = os.path.join(d, '')
+
+		for k in self._monitors.keys():
+			if k == d or k.startswith(prefix):
+				self._monitors[k].cancel()
+				del self._monitors[k]
 
 	def scan(self, d):
 		files = []
@@ -200,13 +287,41 @@ class Commands(Singleton):
 			# Test for python files or modules
 			if is_commander_module(full):
 				if self.add_module(full) and os.path.isdir(full):
-					# Add monitor on the module directory if module was
-					# successfully added. TODO: recursively add monitors
-					self.add_monitor(full)
+					# Add monitors on the module directory if module was
+					# successfully added
+					self.add_monitors(full)
 
 		# Add a monitor on the scanned directory itself
 		self.add_monitor(d)
 
+	def module_path(self, path):
+		# The file or directory of the top level module path belongs to
+		for d in self._dirs:
+			d = os.path.join(d, '')
+
+			if path.startswith(d):
+				return os.path.join(d, path[len(d):].split(os.sep)[0])
+
+		return None
+
+	def find_module(self, path):
+		if not self._modules:
+			return None
+
+		name = self.module_name(path)
+		idx = bisect.bisect_left(self._modules, name)
+
+		# Roots can have the same name as a module
+		while idx < len(self._modules) and self._modules[idx].name == name:
+			mod = self._modules[idx]
+
+			if isinstance(mod, module.Module) and mod.is_source(path):
+				return mod
+
+			idx += 1
+
+		return None
+
 	def module_name(self, filename):
 		# Module name is the basename without the .py
 		return os.path.basename(os.path.splitext(filename)[0])
@@ -220,22 +335,48 @@ class Commands(Singleton):
 
 		# Create new 'empty' module
 		mod = module.Module(base, os.path.dirname(filename))
-		bisect.insort_right(self._modules, mod)
+		self._insert_command(mod)
+
+		spec = None
+
+		if self._manifest:
+			spec = self._manifest.lookup(mod.filename())
+
+		if spec:
+			# Postpone importing until one of the commands is actually used
+			mod.set_manifest(spec, lambda: self.load_module(mod))
+
+			for r in mod.roots():
+				self._insert_command(r)
+
+			if self._accel_group:
+				self.scan_accelerators([mod])
+		else:
+			# Reload the module
+			self.reload_module(mod)
 
-		# Reload the module
-		self.reload_module(mod)
 		return True
 
+	def load_module(self, mod):
+		if not mod.mod:
+			self.reload_module(mod)
+
+		return mod.mod
+
 	def ensure(self):
 		# Ensure that modules have been scanned
 		if self._modules != None:
 			return
 
 		self._modules = []
+		self._trie = trie.Trie()
 
 		for d in self._dirs:
 			self.scan(d)
 
+		if self._manifest:
+			self._manifest.save()
+
 	def _run_generator(self, state, ret=None):
 		try:
 			# Determine first use
@@ -266,11 +407,11 @@ class Commands(Singleton):
 
 		return None
 
-	def run(self, state, ret=None):
+	def run(self, state, ret=None, timing=None):
 		if type(ret) == types.GeneratorType:
 			# Ok, this is cool stuff, generators can ask and susped execution
 			# of commands, for instance to prompt for some more information
-			state.push(ret)
+			state.push(ret, timing)
 
 			return self._run_generator(state)
 		elif not isinstance(ret, result.Result) and len(state) > 1:
@@ -298,7 +439,7 @@ class Commands(Singleton):
 			argstr = ''
 
 		# Execute command
-		return self.run(state, cmd.execute(argstr, wordsstr[1:], entry, modifier))
+		return self.run(state, cmd.execute(argstr, wordsstr[1:], entry, modifier), cmd.timing())
 
 	def invoke(self, entry, modifier, command, args, argstr=None):
 		self.ensure()
@@ -358,15 +499,42 @@ class Commands(Singleton):
 		for mod in recurse_mods:
 			self.remove_module_accelerators(mod.commands())
 
+	def _accelerators(self, cmds):
+		ret = {}
+
+		for cmd in cmds:
+			accel = cmd.accelerator()
+
+			if accel != None:
+				ret[id(cmd)] = (cmd, accel)
+
+		return ret
+
+	def _same_accelerator(self, first, second):
+		return list(first.accelerators) == list(second.accelerators) and first.arguments == second.arguments
+
+	def update_accelerators(self, old, new):
+		# Only touch the accelerators which actually changed
+		for k in old:
+			if not k in new or not self._same_accelerator(old[k][1], new[k][1]):
+				self._accel_group.remove(old[k][1])
+
+		for k in new:
+			if not k in old or not self._same_accelerator(old[k][1], new[k][1]):
+				cmd, accel = new[k]
+				self._accel_group.add(accel, self.accelerator_activated, cmd)
+
 	def remove_module(self, mod):
+		roots = mod.roots()
+
 		# Remove roots
-		for r in mod.roots():
+		for r in roots:
 			if r in self._modules:
-				self._modules.remove(r)
+				self._remove_command(r)
 
 		# Remove accelerators
 		if self._accel_group:
-			self.remove_module_accelerators([mod])
+			self.update_accelerators(self._accelerators([mod] + roots), {})
 
 		if mod.name in commander.modules.__dict__:
 			del commander.modules.__dict__[mod.name]
@@ -378,8 +546,10 @@ class Commands(Singleton):
 		if not mod or not self._modules:
 			return
 
-		# Remove roots
-		self.remove_module(mod)
+		roots = list(mod.roots())
+
+		if self._accel_group:
+			accels = self._accelerators([mod] + roots)
 
 		# Now, try to reload the module
 		try:
@@ -388,53 +558,106 @@ class Commands(Singleton):
 			# Reload failed, we remove the module
 			print 'Failed to reload module (%s):' % (mod.name,), e
 
-			self._modules.remove(mod)
+			for r in roots:
+				if r in self._modules:
+					self._remove_command(r)
+
+			if self._accel_group:
+				self.update_accelerators(accels, {})
+
+			if mod.name in commander.modules.__dict__:
+				del commander.modules.__dict__[mod.name]
+
+			self._remove_command(mod)
 			return
 
-		# Insert roots
-		for r in mod.roots():
-			bisect.insort(self._modules, r)
+		# Roots which are still there are the same objects as before, only
+		# roots which were added or removed need to be updated
+		newroots = mod.roots()
+
+		for r in roots:
+			if not r in newroots:
+				self._remove_command(r)
+
+		for r in newroots:
+			if not r in roots:
+				self._insert_command(r)
+
+		# Commands of the module itself may have changed as well
+		self._fuzzy = None
 
 		commander.modules.__dict__[mod.name] = mod.mod
 
 		if self._accel_group:
-			self.scan_accelerators([mod])
+			self.update_accelerators(accels, self._accelerators([mod] + newroots))
+
+		if self._manifest:
+			self._manifest.update(mod.filename(), mod.mod)
 
-	def on_timeout_delete(self, path, mod):
+	def on_timeout_reload(self, path):
 		if not path in self._timeouts:
 			return False
 
+		del self._timeouts[path]
+
+		if self._modules == None:
+			return False
+
+		mod = self.find_module(path)
+
+		if os.path.exists(path):
+			if mod:
+				self.reload_module(mod)
+			elif self.add_module(path) and os.path.isdir(path):
+				self.add_monitors(path)
+
+			if self._manifest:
+				self._manifest.save()
+
+			return False
+
+		if not mod:
+			return False
+
 		# Remove the module
-		mod.unload()
+		if self._manifest:
+			self._manifest.remove(path)
+			self._manifest.save()
+
 		self.remove_module(mod)
-		self._modules.remove(mod)
+		mod.unload()
+		self._remove_command(mod)
+
+		self.remove_monitors(path)
 
 		return False
 
-	def on_monitor_changed(self, monitor, gfile1, gfile2, evnt):
-		if evnt == gio.FILE_MONITOR_EVENT_CHANGED:
-			# Reload the module
-			self.reload_module(gfile1.get_path())
-		elif evnt == gio.FILE_MONITOR_EVENT_DELETED:
-			path = gfile1.get_path()
-			mod = self.resolve_module(path, False)
+	def schedule_reload(self, path):
+		if path in self._timeouts:
+			glib.source_remove(self._timeouts[path])
 
-			if not mod:
-				return
+		# A single save usually causes a number of events (and a common save
+		# strategy causes a DELETE/CREATE event chain), the module is only
+		# reloaded once things have settled down
+		self._timeouts[path] = glib.timeout_add(500, self.on_timeout_reload, path)
 
-			if path in self._timeouts:
-				glib.source_remove(self._timeouts[path])
+	def on_monitor_changed(self, monitor, gfile1, gfile2, evnt):
+		if not evnt in (gio.FILE_MONITOR_EVENT_CHANGED, gio.FILE_MONITOR_EVENT_DELETED, gio.FILE_MONITOR_EVENT_CREATED):
+			return
 
-			# We add a timeout because a common save strategy causes a
-			# DELETE/CREATE event chain
-			self._timeouts[path] = glib.timeout_add(500, self.on_timeout_delete, path, mod)
-		elif evnt == gio.FILE_MONITOR_EVENT_CREATED:
-			path = gfile1.get_path()
+		path = gfile1.get_path()
+		modpath = self.module_path(path)
 
-			# Check if this CREATE followed a previous DELETE
-			if path in self._timeouts:
-				glib.source_remove(self._timeouts[path])
-				del self._timeouts[path]
+		if not modpath:
+			return
 
-			# Reload the module
-			self.reload_module(path)
+		if path != modpath:
+			# A file in a package style module
+			if evnt == gio.FILE_MONITOR_EVENT_CREATED and os.path.isdir(path):
+				self.add_monitors(path)
+			elif not path.endswith('.py'):
+				return
+		elif not is_commander_module(path) and not self.find_module(path):
+			return
+
+		self.schedule_reload(modpath)
@@ -1,13 +1,16 @@
 import commander.commands as commands
+import commander.history as history
 import bisect
 import sys
 import os
-import re
 import gio
 
+import fuzzy
+import dircache
+
 from xml.sax import saxutils
 
-__all__ = ['command', 'filename']
+__all__ = ['command', 'fuzzy_command', 'filename']
 
 def _common_prefix_part(first, second):
 	length = min(len(first), len(second))
@@ -28,128 +31,118 @@ def common_prefix(args, sep=None):
 	if not args:
 		return ''
 
-	if len(args) == 1:
-		return str(args[0])
-
-	first = str(args[0])
-	second = str(args[1])
-
-	if not sep:
-		ret = _common_prefix_part(first, second)
-	else:
-		first = first.split(sep)
-		second = second.split(sep)
-		ret = []
-
-		for i in range(0, min(len(first), len(second))):
-			ret.append(_common_prefix_part(first[i], second[i]))
-
-		ret = sep.join(ret)
-
-	del args[0]
-	args[0] = ret
+	ret = str(args[0])
 
-	return common_prefix(args, sep)
+	for arg in args[1:]:
+		second = str(arg)
 
-def _expand_commands(cmds):
-	if not cmds:
-		cmds.extend(commands.Commands().modules())
-		return
-
-	old = list(cmds)
-	del cmds[:]
+		if not sep:
+			ret = _common_prefix_part(ret, second)
+		else:
+			first = ret.split(sep)
+			second = second.split(sep)
+			parts = []
 
-	# Expand 'commands' to all the respective subcommands
+			for i in range(0, min(len(first), len(second))):
+				parts.append(_common_prefix_part(first[i], second[i]))
 
-	for cmd in old:
-		for c in cmd.commands():
-			bisect.insort(cmds, c)
+			ret = sep.join(parts)
 
-def _filter_command(cmd, subs):
-	parts = cmd.name.split('-')
+	return ret
 
-	if len(subs) > len(parts):
-		return False
+def _match_commands(parts):
+	tries = [commands.Commands().command_trie()]
+	cmds = []
 
-	for i in xrange(0, len(subs)):
-		if not parts[i].startswith(subs[i]):
-			return False
+	for i in xrange(0, len(parts)):
+		if i > 0:
+			# Descend into the child commands of all the matched parents
+			tries = filter(lambda x: x, [cmd.command_trie() for cmd in cmds])
 
-	return True
+			if not tries:
+				return None
 
-def _filter_commands(cmds, subs):
-	# See what parts of cmds still match the parts in subs
-	idx = bisect.bisect_left(cmds, subs[0])
-	ret = []
+		subs = parts[i].split('-')
+		cmds = []
 
-	while idx < len(cmds):
-		if not cmds[idx].name.startswith(subs[0]):
-			break
+		for t in tries:
+			cmds.extend(t.match(subs))
 
-		if _filter_command(cmds[idx], subs):
-			ret.append(cmds[idx])
+		if not cmds:
+			return None
 
-		idx += 1
+		if len(tries) > 1:
+			cmds.sort()
 
-	return ret
+	return cmds
 
 def single_command(words, idx):
-	ret = command(words, idx)
+	cmds = _match_commands(words[idx].strip().split('.'))
 
-	if not ret:
+	if not cmds:
 		return None
 
-	ret[0] = filter(lambda x: x.method, ret[0])
+	for cmd in cmds:
+		if cmd.method:
+			return cmd
 
-	if not ret[0]:
-		return None
-
-	return ret[0][0]
+	return None
 
 def command(words, idx):
 	s = words[idx].strip()
 
 	parts = s.split('.')
-	cmds = []
-
-	for i in parts:
-		# Expand all the parents to their child commands
-		_expand_commands(cmds)
-
-		if not cmds:
-			return None
-
-		subs = i.split('-')
-		cmds = _filter_commands(cmds, subs)
-
-		if not cmds:
-			return None
+	cmds = _match_commands(parts)
 
 	if not cmds:
 		return None
 
 	if len(parts) == 1:
-		completed = common_prefix(cmds)
+		if not '-' in s:
+			completed = commands.Commands().command_trie().complete(s)
+		else:
+			completed = common_prefix(cmds)
 	else:
 		completed = '.'.join(parts[0:-1]) + '.' + common_prefix(cmds, '-')
 
 	return [cmds, completed]
 
-def _file_color(path):
-	if os.path.isdir(path):
+def _fuzzy_markup(res):
+	return map(lambda x: fuzzy.markup(x[1], x[3]), res)
+
+def fuzzy_command(words, idx):
+	# Like command, but when no command matches strictly, commands are
+	# matched fuzzily on their full path. Commands used recently rank higher
+	ret = command(words, idx)
+	s = words[idx].strip()
+
+	if ret or not s:
+		return ret
+
+	index = commands.Commands().fuzzy_index()
+	res = index.match(s, 20, lambda item: 5 * history.recency(item.text))
+
+	if not res:
+		return None
+
+	if len(res) == 1:
+		return [[res[0][2]], res[0][1]]
+
+	doc = map(lambda x: x[2].oneline_doc(), res)
+	return [map(lambda x, d: '%s (<i>%s</i>)' % (x, d), _fuzzy_markup(res), doc), s]
+
+def _file_color(entry):
+	if entry.isdir:
 		format = '<span color="#799ec6">%s</span>'
 	else:
 		format = '%s'
 
-	return format % (saxutils.escape(os.path.basename(path)),)
+	return format % (saxutils.escape(entry.name),)
 
-def _sort_nicely(l):
-	convert = lambda text: int(text) if text.isdigit() else text
-	alphanum_key = lambda key: [convert(c) for c in re.split('([0-9]+)', key)]
+def _listing_markup(ret):
+	return ret + ['<i>Listing directory...</i>']
 
-	l.sort(key=alphanum_key)
-
-def filename(words, idx, view):
+def filename(words, idx, view, entry=None):
 	prefix = os.path.dirname(words[idx])
 	partial = os.path.expanduser(words[idx])
 
@@ -165,35 +158,71 @@ def filename(words, idx, view):
 
 	dirname = os.path.dirname(partial)
 
-	try:
-		files = os.listdir(dirname)
-	except OSError:
+	# Directories are listed in the background and cached, while the listing
+	# is not complete the files found so far are shown
+	listing = dircache.listing(dirname)
+
+	if listing.complete and listing.error:
 		return None
 
+	if not listing.complete and entry:
+		listing.when_complete(entry.refresh_completion_callback())
+
 	base = os.path.basename(partial)
-	ret = []
-	real = []
+	found = filter(lambda x: base or not x.name.startswith('.'), listing.matches(base))
 
-	for f in files:
-		if f.startswith(base) and (base or not f.startswith('.')):
-			real.append(os.path.join(dirname, f))
-			ret.append(os.path.join(prefix, f))
+	# The listing note is never the only item, which would complete it
+	if not listing.complete:
+		if not found:
+			return None
+
+		return _listing_markup(map(_file_color, found)), words[idx]
+
+	ret = map(lambda x: os.path.join(prefix, x.name), found)
+
+	# Nothing starts with base, rank files containing its characters instead
+	matched_fuzzy = not found and base
+
+	if matched_fuzzy:
+		files = listing.names()
+
+		if not base.startswith('.'):
+			files = filter(lambda x: not x.startswith('.'), files)
 
-	_sort_nicely(real)
+		for f in fuzzy.match(base, files):
+			found.append(listing.entries[f])
+			ret.append(os.path.join(prefix, f))
 
 	if len(ret) == 1:
-		if os.path.isdir(real[0]):
+		if found[0].isdir:
 			after = '/'
 		else:
 			after = ' '
 
 		return ret, ret[0], after
+	elif matched_fuzzy:
+		return map(_file_color, found), words[idx]
 	else:
-		return map(lambda x: _file_color(x), real), common_prefix(ret)
+		return map(_file_color, found), common_prefix(ret)
 
 def words(ret):
+	index = []
+
 	def decorator(words, idx):
 		rr = filter(lambda x: x.startswith(words[idx]), ret)
-		return rr, common_prefix(rr)
+
+		if rr or not words[idx]:
+			return rr, common_prefix(rr)
+
+		# Fall back to fuzzy matching, the index is built on first use
+		if not index:
+			index.append(fuzzy.Index([(x, x) for x in ret]))
+
+		res = index[0].match(words[idx])
+
+		if len(res) == 1:
+			return [res[0][1]], res[0][1]
+		else:
+			return _fuzzy_markup(res), words[idx]
 
 	return decorator
@@ -0,0 +1,189 @@
+import re
+import time
+import bisect
+import gio
+import glib
+
+__all__ = ['sort_key', 'listing', 'invalidate', 'clear']
+
+# Number of directory listings kept
+MAX_DIRECTORIES = 32
+
+# Listings of directories which cannot be monitored expire after some seconds
+MAX_AGE = 5
+
+# Number of files requested at once while listing
+BATCH_SIZE = 500
+
+_re_digits = re.compile('([0-9]+)')
+
+def sort_key(name):
+	# Natural sort order, numbers sort by value
+	return [int(x) if x.isdigit() else x for x in _re_digits.split(name)]
+
+class Entry:
+	def __init__(self, name, isdir):
+		self.name = name
+		self.isdir = isdir
+		self.key = sort_key(name)
+
+class Listing:
+	def __init__(self, path):
+		self.path = path
+		self.entries = {}
+		self.complete = False
+		self.error = None
+
+		self._names = None
+		self._created = time.time()
+		self._callbacks = []
+		self._monitor = None
+		self._cancellable = gio.Cancellable()
+
+	def start(self):
+		gfile = gio.File(self.path)
+
+		try:
+			self._monitor = gfile.monitor_directory(gio.FILE_MONITOR_NONE, None)
+		except gio.Error:
+			pass
+
+		if self._monitor:
+			self._monitor.connect('changed', self.on_changed)
+
+		gfile.enumerate_children_async('standard::name,standard::type',
+		                               self.on_enumerate,
+		                               io_priority=glib.PRIORITY_LOW,
+		                               cancellable=self._cancellable)
+
+	def on_enumerate(self, gfile, result):
+		try:
+			enumerator = gfile.enumerate_children_finish(result)
+		except gio.Error, e:
+			self._finish(e)
+			return
+
+		self._next_files(enumerator)
+
+	def _next_files(self, enumerator):
+		enumerator.next_files_async(BATCH_SIZE,
+		                            self.on_next_files,
+		                            io_priority=glib.PRIORITY_LOW,
+		                            cancellable=self._cancellable)
+
+	def on_next_files(self, enumerator, result):
+		try:
+			infos = enumerator.next_files_finish(result)
+		except gio.Error, e:
+			self._finish(e)
+			return
+
+		if not infos:
+			enumerator.close_async(self.on_closed)
+			self._finish(None)
+			return
+
+		for info in infos:
+			name = info.get_name()
+			self.entries[name] = Entry(name, info.get_file_type() == gio.FILE_TYPE_DIRECTORY)
+
+		self._names = None
+		self._next_files(enumerator)
+
+	def on_closed(self, enumerator, result):
+		try:
+			enumerator.close_finish(result)
+		except gio.Error:
+			pass
+
+	def _finish(self, error):
+		self.complete = True
+		self.error = error
+
+		callbacks = self._callbacks
+		self._callbacks = []
+
+		for cb in callbacks:
+			cb()
+
+	def when_complete(self, callback):
+		if self.complete:
+			callback()
+		else:
+			self._callbacks.append(callback)
+
+	def on_changed(self, monitor, gfile1, gfile2, evnt):
+		invalidate(self.path)
+
+	def valid(self):
+		if self._cancellable.is_cancelled():
+			return False
+
+		if not self._monitor and self.complete:
+			return time.time() - self._created < MAX_AGE
+
+		return True
+
+	def cancel(self):
+		self._cancellable.cancel()
+		self._callbacks = []
+
+		if self._monitor:
+			self._monitor.cancel()
+			self._monitor = None
+
+	def names(self):
+		if self._names == None:
+			self._names = self.entries.keys()
+			self._names.sort()
+
+		return self._names
+
+	def matches(self, prefix):
+		# Entries starting with prefix, in natural sort order
+		names = self.names()
+		idx = bisect.bisect_left(names, prefix)
+		ret = []
+
+		while idx < len(names) and names[idx].startswith(prefix):
+			ret.append(self.entries[names[idx]])
+			idx += 1
+
+		ret.sort(key=lambda x: x.key)
+		return ret
+
+_listings = {}
+_recent = []
+
+def listing(path):
+	# Listing of the directory path, which is listed in the background when
+	# not cached yet
+	if path in _listings:
+		ret = _listings[path]
+		_recent.remove(path)
+
+		if ret.valid():
+			_recent.append(path)
+			return ret
+
+		ret.cancel()
+
+	ret = Listing(path)
+	_listings[path] = ret
+	_recent.append(path)
+
+	ret.start()
+
+	while len(_recent) > MAX_DIRECTORIES:
+		_listings.pop(_recent.pop(0)).cancel()
+
+	return ret
+
+def invalidate(path):
+	if path in _listings:
+		_listings.pop(path).cancel()
+		_recent.remove(path)
+
+def clear():
+	for path in list(_recent):
+		invalidate(path)
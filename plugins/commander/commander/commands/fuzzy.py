@@ -0,0 +1,185 @@
+import heapq
+
+from xml.sax import saxutils
+
+__all__ = ['score', 'Index', 'match', 'markup']
+
+_boundaries = '-._/ '
+
+def _boundary(text, i):
+	if i == 0:
+		return True
+
+	prev = text[i - 1]
+
+	if prev in _boundaries:
+		return True
+
+	# camelCase transition
+	return prev.islower() and text[i].isupper()
+
+def _positions(pattern, lower, text, boundaries):
+	# Greedily find the pattern as a subsequence of the text. When boundaries
+	# is set, occurrences at word boundaries are preferred as long as the rest
+	# of the pattern still fits
+	ret = []
+	pos = 0
+
+	for i in xrange(0, len(pattern)):
+		c = pattern[i]
+		idx = lower.find(c, pos)
+
+		if idx == -1:
+			return None
+
+		if boundaries and not _boundary(text, idx):
+			other = idx + 1
+
+			while True:
+				other = lower.find(c, other)
+
+				if other == -1:
+					break
+
+				if _boundary(text, other) and _fits(pattern, i + 1, lower, other + 1):
+					idx = other
+					break
+
+				other += 1
+
+		ret.append(idx)
+		pos = idx + 1
+
+	return ret
+
+def _fits(pattern, start, lower, pos):
+	for i in xrange(start, len(pattern)):
+		pos = lower.find(pattern[i], pos)
+
+		if pos == -1:
+			return False
+
+		pos += 1
+
+	return True
+
+def _score_positions(text, positions):
+	ret = 0.0
+	prev = -2
+
+	for idx in positions:
+		ret += 1
+
+		if idx == 0:
+			ret += 8
+		elif _boundary(text, idx):
+			ret += 6
+
+		if idx == prev + 1:
+			ret += 4
+		elif prev >= 0:
+			ret -= 0.1 * (idx - prev - 1)
+
+		prev = idx
+
+	return ret - 0.05 * len(text)
+
+def score(pattern, text, lower=None):
+	# Score text for the (lower case) pattern as a subsequence, returns a
+	# tuple (score, positions) or None if the pattern does not match
+	if lower == None:
+		lower = text.lower()
+
+	positions = _positions(pattern, lower, text, False)
+
+	if positions == None:
+		return None
+
+	best = (_score_positions(text, positions), positions)
+	other = _positions(pattern, lower, text, True)
+
+	if other != None and other != positions:
+		s = _score_positions(text, other)
+
+		if s > best[0]:
+			best = (s, other)
+
+	return best
+
+class Item:
+	def __init__(self, text, value):
+		self.text = text
+		self.value = value
+		self.lower = text.lower()
+		self.chars = frozenset(self.lower)
+
+class Index:
+	# Precomputed candidates for fuzzy matching. Matching a pattern which
+	# extends the previously matched one only considers the previous matches
+	def __init__(self, items=[]):
+		self._items = []
+		self._last = None
+
+		for text, value in items:
+			self.add(text, value)
+
+	def __len__(self):
+		return len(self._items)
+
+	def add(self, text, value=None):
+		self._items.append(Item(text, value))
+		self._last = None
+
+	def match(self, pattern, limit=20, boost=None):
+		pattern = pattern.lower()
+		chars = frozenset(pattern)
+
+		if self._last and pattern.startswith(self._last[0]):
+			candidates = self._last[1]
+		else:
+			candidates = self._items
+
+		matched = []
+		ret = []
+
+		for item in candidates:
+			if not chars.issubset(item.chars):
+				continue
+
+			s = score(pattern, item.text, item.lower)
+
+			if s == None:
+				continue
+
+			matched.append(item)
+			value = s[0]
+
+			if boost:
+				value += boost(item)
+
+			ret.append((value, item.text, item.value, s[1]))
+
+		self._last = (pattern, matched)
+
+		# Best score first, ties broken on the shortest text
+		return heapq.nsmallest(limit, ret, key=lambda x: (-x[0], len(x[1]), x[1]))
+
+def match(pattern, texts, limit=20):
+	# One-shot matching of plain strings, best first
+	index = Index([(x, x) for x in texts])
+	return [x[1] for x in index.match(pattern, limit)]
+
+def markup(text, positions):
+	# Escaped text with the matched characters in bold
+	ret = []
+	positions = set(positions)
+
+	for i in xrange(0, len(text)):
+		c = saxutils.escape(text[i])
+
+		if i in positions:
+			ret.append('<b>' + c + '</b>')
+		else:
+			ret.append(c)
+
+	return ''.join(ret)
@@ -0,0 +1,240 @@
+import os
+import sys
+import types
+import cPickle
+import tempfile
+
+import commander.utils as utils
+import exceptions
+
+from accel_group import Accelerator
+
+def mtime(filename):
+	# Package style modules are out of date when any of their files changed
+	if not os.path.isdir(filename):
+		return os.stat(filename).st_mtime
+
+	ret = os.stat(filename).st_mtime
+
+	for root, dirs, files in os.walk(filename):
+		for f in files:
+			if f.endswith('.py'):
+				ret = max(ret, os.stat(os.path.join(root, f)).st_mtime)
+
+	return ret
+
+def _reference(func):
+	# Autocompleters living in an ordinary module (e.g. the ones in
+	# commander.commands.completion) can be used without loading the command
+	modname = getattr(func, '__module__', None)
+	name = getattr(func, '__name__', None)
+
+	if not modname in sys.modules:
+		return None
+
+	mod = sys.modules[modname]
+
+	if utils.is_commander_module(mod) or getattr(mod, name, None) is not func:
+		return None
+
+	return (modname, name)
+
+def _describe_function(func, key):
+	spec = utils.getargspec(func)
+
+	ret = {
+		'key': key,
+		'doc': func.__doc__,
+		'args': list(spec.args),
+		'varargs': spec.varargs,
+		'keywords': spec.keywords,
+		'defaults': spec.defaults and len(spec.defaults),
+		'autocomplete': None,
+		'accelerator': None
+	}
+
+	if hasattr(func, 'autocomplete'):
+		ret['autocomplete'] = dict([(k, _reference(v)) for k, v in func.autocomplete.items()])
+
+	if hasattr(func, 'accelerator'):
+		ret['accelerator'] = (list(func.accelerator.accelerators), dict(func.accelerator.arguments))
+
+	return ret
+
+def describe(mod, key=None):
+	# Mirrors what Module.roots and Module.scan_commands find in the module
+	dic = mod.__dict__
+
+	if '__root__' in dic:
+		root = dic['__root__']
+	else:
+		root = []
+
+	ret = {
+		'key': key,
+		'default': None,
+		'roots': [],
+		'commands': []
+	}
+
+	if '__default__' in dic:
+		ret['default'] = _describe_function(dic['__default__'], '__default__')
+
+	for k in root:
+		if k in dic and type(dic[k]) == types.FunctionType:
+			ret['roots'].append(_describe_function(dic[k], k))
+
+	for k in dic:
+		if k.startswith('_') or k in root:
+			continue
+
+		item = dic[k]
+
+		if type(item) == types.FunctionType:
+			ret['commands'].append(_describe_function(item, k))
+		elif type(item) == types.ModuleType and utils.is_commander_module(item):
+			ret['commands'].append(describe(item, k))
+
+	return ret
+
+class Function(object):
+	# Stands in for a command function of a module which has not been imported
+	# yet. Calling it imports the module and calls the real function
+	def __init__(self, spec, path, loader):
+		self._path = path
+		self._loader = loader
+
+		self.__doc__ = spec['doc']
+		self.__argspec__ = utils.Struct({
+			'args': spec['args'],
+			'varargs': spec['varargs'],
+			'keywords': spec['keywords'],
+			'defaults': spec['defaults'] and (None,) * spec['defaults']
+		})
+
+		if spec['autocomplete'] != None:
+			self.autocomplete = {}
+
+			for k in spec['autocomplete']:
+				self.autocomplete[k] = self._autocompleter(k, spec['autocomplete'][k])
+
+		if spec['accelerator'] != None:
+			self.accelerator = Accelerator(*spec['accelerator'])
+
+	def resolve(self):
+		obj = self._loader()
+
+		if obj == None:
+			raise exceptions.Execute('Could not load command module')
+
+		for k in self._path:
+			obj = obj.__dict__[k]
+
+		return obj
+
+	def _autocompleter(self, arg, ref):
+		def complete(**kwargs):
+			func = None
+
+			if ref and ref[0] in sys.modules:
+				func = getattr(sys.modules[ref[0]], ref[1], None)
+
+			if func == None:
+				func = self.resolve().autocomplete[arg]
+
+			spec = utils.getargspec(func)
+
+			if not spec.keywords:
+				for k in kwargs.keys():
+					if not k in spec.args:
+						del kwargs[k]
+
+			return func(**kwargs)
+
+		return complete
+
+	def __call__(self, *args, **kwargs):
+		return self.resolve()(*args, **kwargs)
+
+class Manifest:
+	VERSION = 1
+
+	def __init__(self, filename):
+		self._filename = filename
+		self._entries = {}
+		self._dirty = False
+
+		self.load()
+
+	def load(self):
+		try:
+			f = file(self._filename, 'rb')
+			data = cPickle.load(f)
+			f.close()
+		except Exception:
+			return
+
+		if isinstance(data, dict) and data.get('version') == Manifest.VERSION:
+			self._entries = data['modules']
+
+	def save(self):
+		if not self._dirty:
+			return
+
+		try:
+			os.makedirs(os.path.dirname(self._filename))
+		except OSError:
+			pass
+
+		# Written to a temporary file first, so the manifest is never half
+		# written when saving fails
+		try:
+			fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self._filename) + '.', dir=os.path.dirname(self._filename))
+		except OSError:
+			return
+
+		try:
+			f = os.fdopen(fd, 'wb')
+
+			try:
+				cPickle.dump({'version': Manifest.VERSION, 'modules': self._entries}, f, cPickle.HIGHEST_PROTOCOL)
+			finally:
+				f.close()
+
+			os.rename(tmp, self._filename)
+			self._dirty = False
+		except (IOError, OSError, cPickle.PicklingError):
+			os.unlink(tmp)
+
+	def lookup(self, filename):
+		if not filename in self._entries:
+			return None
+
+		entry = self._entries[filename]
+
+		try:
+			if entry['mtime'] != mtime(filename):
+				return None
+		except OSError:
+			return None
+
+		return entry['module']
+
+	def update(self, filename, mod):
+		try:
+			entry = {'mtime': mtime(filename), 'module': describe(mod)}
+
+			# Make sure the entry can be stored at all
+			cPickle.dumps(entry, cPickle.HIGHEST_PROTOCOL)
+		except Exception:
+			self.remove(filename)
+			return
+
+		if self._entries.get(filename) != entry:
+			self._entries[filename] = entry
+			self._dirty = True
+
+	def remove(self, filename):
+		if filename in self._entries:
+			del self._entries[filename]
+			self._dirty = True
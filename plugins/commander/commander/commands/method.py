@@ -3,6 +3,7 @@ import types
 import inspect
 import sys
 import commander.utils as utils
+import timing
 
 class Method:
 	def __init__(self, method, name, parent):
@@ -14,6 +15,15 @@ class Method:
 	def __str__(self):
 		return self.name
 
+	def full_name(self):
+		if isinstance(self.parent, Method):
+			return self.parent.full_name() + '.' + self.name
+		else:
+			return self.name
+
+	def timing(self):
+		return timing.timing(self.full_name())
+
 	def autocomplete_func(self):
 		if hasattr(self.method, 'autocomplete'):
 			return getattr(self.method, 'autocomplete')
@@ -41,6 +51,9 @@ class Method:
 	def commands(self):
 		return []
 
+	def command_trie(self):
+		return None
+
 	def cancel(self, view):
 		if self.parent:
 			self.parent.cancel(view, self)
@@ -94,7 +107,15 @@ class Method:
 		for k in kk:
 			kwargs[k] = kk[k]
 
-		return self.method(*args, **kwargs)
+		t = self.timing()
+		t.calls += 1
+
+		timer = timing.Timer(t)
+
+		try:
+			return self.method(*args, **kwargs)
+		finally:
+			timer.stop()
 
 	def __cmp__(self, other):
 		if isinstance(other, Method):
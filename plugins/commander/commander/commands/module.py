@@ -7,14 +7,24 @@ import utils
 import exceptions
 import method
 import rollbackimporter
+import trie
+import manifest
 
 class Module(method.Method):
 	def __init__(self, base, mod, parent=None):
 		method.Method.__init__(self, None, base, parent)
 
 		self._commands = None
+		self._trie = None
 		self._dirname = None
 		self._roots = None
+		self._base = base
+		self._manifest = None
+		self._loader = None
+		self._path = []
+
+		# Roots of the previously loaded module, reused on reload
+		self._stale_roots = {}
 
 		if type(mod) == types.ModuleType:
 			self.mod = mod
@@ -26,7 +36,46 @@ class Module(method.Method):
 		else:
 			self.mod = None
 			self._dirname = mod
-			self._rollback = rollbackimporter.RollbackImporter()
+			self._rollback = rollbackimporter.RollbackImporter(self.filename())
+
+	def filename(self):
+		if not self._dirname:
+			return None
+
+		path = os.path.join(self._dirname, self._base)
+
+		if os.path.isdir(path):
+			return path
+		else:
+			return path + '.py'
+
+	def is_source(self, path):
+		if not self._dirname:
+			return False
+
+		base = os.path.join(self._dirname, self._base)
+		return path == base or path == base + '.py'
+
+	def set_manifest(self, spec, loader, path=[]):
+		# Serve the commands from a cached manifest. The module itself is only
+		# imported (by calling loader) once one of its commands is needed
+		self._manifest = spec
+		self._loader = loader
+		self._path = path
+
+		self._commands = None
+		self._trie = None
+		self._roots = None
+		self._func_props = None
+
+		if spec['default']:
+			self.method = manifest.Function(spec['default'], path + ['__default__'], loader)
+		else:
+			self.method = None
+
+	def _manifest_method(self, spec):
+		func = manifest.Function(spec, self._path + [spec['key']], self._loader)
+		return method.Method(func, spec['key'], self)
 
 	def commands(self):
 		if self._commands == None:
@@ -34,30 +83,64 @@ class Module(method.Method):
 
 		return self._commands
 
+	def command_trie(self):
+		if self._trie == None:
+			cmds = self.commands()
+			self._trie = trie.Trie()
+
+			for cmd in cmds:
+				self._trie.add(cmd.name, cmd)
+
+		return self._trie
+
 	def clear(self):
 		self._commands = None
+		self._trie = None
+
+	def _reuse_root(self, root):
+		# Keep the same object for roots which survive a reload, so they do
+		# not have to be registered again
+		if not root.name in self._stale_roots:
+			return root
+
+		ret = self._stale_roots[root.name]
+
+		ret.method = root.method
+		ret.parent = root.parent
+		ret._func_props = None
+
+		return ret
 
 	def roots(self):
 		if self._roots == None:
-			if not self.mod:
+			if not self.mod and self._manifest:
+				roots = map(self._manifest_method, self._manifest['roots'])
+			elif not self.mod:
 				return []
+			else:
+				dic = self.mod.__dict__
 
-			dic = self.mod.__dict__
+				if '__root__' in dic:
+					root = dic['__root__']
+				else:
+					root = []
 
-			if '__root__' in dic:
-				root = dic['__root__']
-			else:
-				root = []
+				root = filter(lambda x: x in dic and type(dic[x]) == types.FunctionType, root)
+				roots = map(lambda x: method.Method(dic[x], x, self.mod), root)
 
-			root = filter(lambda x: x in dic and type(dic[x]) == types.FunctionType, root)
-			self._roots = map(lambda x: method.Method(dic[x], x, self.mod), root)
+			self._roots = map(self._reuse_root, roots)
+			self._stale_roots = {}
 
 		return self._roots
 
 	def scan_commands(self):
 		self._commands = []
+		self._trie = None
 
 		if self.mod == None:
+			if self._manifest:
+				self.scan_manifest_commands()
+
 			return
 
 		dic = self.mod.__dict__
@@ -81,10 +164,29 @@ class Module(method.Method):
 
 				# Insert root functions into this module
 				for r in mod.roots():
-					bisect.insert(self._commands, r)
+					bisect.insort(self._commands, r)
+
+	def scan_manifest_commands(self):
+		for spec in self._manifest['commands']:
+			if 'commands' in spec:
+				mod = Module(spec['key'], None, self)
+				mod.set_manifest(spec, self._loader, self._path + [spec['key']])
+
+				bisect.insort(self._commands, mod)
+
+				for r in mod.roots():
+					bisect.insort(self._commands, r)
+			else:
+				bisect.insort(self._commands, self._manifest_method(spec))
 
 	def unload(self):
+		if self._roots:
+			self._stale_roots = dict([(x.name, x) for x in self._roots])
+
 		self._commands = None
+		self._trie = None
+		self._roots = None
+		self._manifest = None
 
 		if not self._dirname:
 			return False
@@ -1,3 +1,10 @@
+import glib
+import multiprocessing
+import traceback
+
+import commander.utils as utils
+import exceptions
+
 class Result(object):
 	HIDE = 1
 	DONE = 2
@@ -21,12 +28,15 @@ HIDE = Result(Result.HIDE)
 DONE = Result(Result.DONE)
 
 class Prompt(Result):
-	def __init__(self, prompt, autocomplete={}):
+	def __init__(self, prompt, autocomplete={}, changed=None):
 		Result.__init__(self, Result.PROMPT)
 
 		self.prompt = prompt
 		self.autocomplete = autocomplete
 
+		# Called with the text of the entry each time it changes while prompting
+		self.changed = changed
+
 class Suspend(Result):
 	def __init__(self):
 		Result.__init__(self, Result.SUSPEND)
@@ -39,3 +49,297 @@ class Suspend(Result):
 		for cb in self._callbacks:
 			args = cb[1]
 			cb[0](*args)
+
+	def cancel(self):
+		self.resume()
+
+class _Progress:
+	def __init__(self, conn):
+		self._conn = conn
+		self._last = -1
+
+	def __call__(self, fraction):
+		# Only report whole percentages to keep the pipe quiet
+		percent = int(fraction * 100)
+
+		if percent != self._last:
+			self._last = percent
+			self._conn.send(('progress', fraction))
+
+def _background_worker(conn, func, args):
+	kwargs = {}
+
+	if 'progress' in utils.getargspec(func).args:
+		kwargs['progress'] = _Progress(conn)
+
+	try:
+		conn.send(('done', func(*args, **kwargs)))
+	except Exception, e:
+		conn.send(('error', str(e) or traceback.format_exc()))
+
+	conn.close()
+
+class Background(Suspend):
+	# Runs func(*args) in a worker process and resumes the command once it is
+	# done. The function works on copies of the data (e.g. a snapshot of the
+	# text), its return value is available from get() after resuming. When the
+	# function takes a progress argument, it can report its progress by calling
+	# it with a fraction between 0 and 1.
+	def __init__(self, func, *args):
+		Suspend.__init__(self)
+
+		self.cancelled = False
+		self.progress = None
+
+		self._result = None
+		self._error = None
+		self._done = False
+		self._progress_callbacks = []
+
+		self._conn, child = multiprocessing.Pipe(False)
+
+		self._process = multiprocessing.Process(target=_background_worker, args=(child, func, args))
+		self._process.daemon = True
+		self._process.start()
+
+		child.close()
+
+		conditions = glib.IO_IN | glib.IO_PRI | glib.IO_ERR | glib.IO_HUP
+		self._watch = glib.io_add_watch(self._conn.fileno(), conditions, self.on_worker_io)
+
+	def register_progress(self, cb, *args):
+		self._progress_callbacks.append([cb, args])
+
+	def on_worker_io(self, fd, condition):
+		try:
+			while not self._done and self._conn.poll():
+				kind, value = self._conn.recv()
+
+				if kind == 'progress':
+					self.progress = value
+
+					for cb in self._progress_callbacks:
+						cb[0](*((value,) + cb[1]))
+				elif kind == 'done':
+					self._result = value
+					self._finish()
+				else:
+					self._error = value
+					self._finish()
+		except (EOFError, IOError):
+			condition = condition | glib.IO_HUP
+
+		if not self._done and condition & (glib.IO_ERR | glib.IO_HUP):
+			self._error = 'Background worker stopped unexpectedly'
+			self._finish()
+
+		return not self._done
+
+	def _stop(self):
+		self._done = True
+
+		self._conn.close()
+		self._process.join()
+
+	def _finish(self):
+		# The io watch is removed by returning False from on_worker_io
+		self._stop()
+		self.resume()
+
+	def cancel(self):
+		if self._done:
+			return
+
+		self.cancelled = True
+
+		glib.source_remove(self._watch)
+		self._process.terminate()
+		self._stop()
+
+		self.resume()
+
+	def get(self):
+		if self.cancelled:
+			raise exceptions.Execute('Cancelled')
+
+		if self._error != None:
+			raise exceptions.Execute(self._error)
+
+		return self._result
+
+def _pool_worker(conn, func):
+	while True:
+		try:
+			items = conn.recv()
+		except EOFError:
+			break
+
+		if items == None:
+			break
+
+		for item in items:
+			try:
+				conn.send(('result', func(item)))
+			except Exception, e:
+				conn.send(('error', str(e) or traceback.format_exc()))
+
+		conn.send(('ready', None))
+
+	conn.close()
+
+class _PoolWorker:
+	def __init__(self, func):
+		self.conn, child = multiprocessing.Pipe()
+
+		self.process = multiprocessing.Process(target=_pool_worker, args=(child, func))
+		self.process.daemon = True
+		self.process.start()
+
+		child.close()
+		self.watch = 0
+
+	def stop(self, terminate=False):
+		if self.watch:
+			glib.source_remove(self.watch)
+			self.watch = 0
+
+		if terminate:
+			self.process.terminate()
+		else:
+			try:
+				self.conn.send(None)
+			except IOError:
+				pass
+
+		self.conn.close()
+		self.process.join()
+
+class Pool(Suspend):
+	# Runs func(item) for each of items in a number of worker processes, and
+	# resumes the command once all items are done. Results are passed to the
+	# callbacks registered with register_result as they come in (in no
+	# particular order). Like for Background, func works on copies of the
+	# items. Errors raised by func for single items are collected, get()
+	# returns them after resuming
+	def __init__(self, func, items, processes=None, chunksize=16):
+		Suspend.__init__(self)
+
+		self.cancelled = False
+		self.progress = None
+		self.errors = []
+
+		self._items = list(items)
+		self._next = 0
+		self._done = 0
+		self._chunksize = chunksize
+		self._result_callbacks = []
+		self._progress_callbacks = []
+
+		if processes == None:
+			processes = multiprocessing.cpu_count()
+
+		processes = max(1, min(processes, (len(self._items) + chunksize - 1) / chunksize))
+
+		self._workers = []
+
+		if not self._items:
+			self._idle_id = glib.idle_add(self._finish)
+			return
+
+		self._idle_id = 0
+		conditions = glib.IO_IN | glib.IO_PRI | glib.IO_ERR | glib.IO_HUP
+
+		for i in xrange(processes):
+			worker = _PoolWorker(func)
+			worker.watch = glib.io_add_watch(worker.conn.fileno(), conditions, self.on_worker_io, worker)
+
+			self._workers.append(worker)
+			self._send(worker)
+
+	def register_result(self, cb, *args):
+		self._result_callbacks.append([cb, args])
+
+	def register_progress(self, cb, *args):
+		self._progress_callbacks.append([cb, args])
+
+	def _send(self, worker):
+		items = self._items[self._next:self._next + self._chunksize]
+		self._next += len(items)
+
+		if items:
+			worker.conn.send(items)
+		else:
+			self._stop_worker(worker)
+
+	def _stop_worker(self, worker, terminate=False):
+		worker.stop(terminate)
+		self._workers.remove(worker)
+
+		if not self._workers and not self.cancelled:
+			self._finish()
+
+	def _item_done(self):
+		self._done += 1
+		self.progress = float(self._done) / len(self._items)
+
+		for cb in self._progress_callbacks:
+			cb[0](*((self.progress,) + cb[1]))
+
+	def on_worker_io(self, fd, condition, worker):
+		try:
+			while worker in self._workers and worker.conn.poll():
+				kind, value = worker.conn.recv()
+
+				if kind == 'result':
+					self._item_done()
+
+					for cb in self._result_callbacks:
+						cb[0](*((value,) + cb[1]))
+				elif kind == 'error':
+					self._item_done()
+					self.errors.append(value)
+				else:
+					self._send(worker)
+		except (EOFError, IOError):
+			condition = condition | glib.IO_HUP
+
+		if not worker in self._workers:
+			return False
+
+		if condition & (glib.IO_ERR | glib.IO_HUP):
+			self.errors.append('Worker stopped unexpectedly')
+
+			# The io watch is removed by returning False
+			worker.watch = 0
+			self._stop_worker(worker, True)
+
+			return False
+
+		return True
+
+	def _finish(self):
+		self._idle_id = 0
+		self.resume()
+
+		return False
+
+	def cancel(self):
+		if self.cancelled or (not self._workers and not self._idle_id):
+			return
+
+		self.cancelled = True
+
+		if self._idle_id:
+			glib.source_remove(self._idle_id)
+			self._idle_id = 0
+
+		for worker in list(self._workers):
+			self._stop_worker(worker, True)
+
+		self.resume()
+
+	def get(self):
+		if self.cancelled:
+			raise exceptions.Execute('Cancelled')
+
+		return self.errors
@@ -1,18 +1,45 @@
 import sys
+import os
 import utils
 
 class RollbackImporter:
-	def __init__(self):
+	def __init__(self, path=None):
 		"Creates an instance and installs as the global importer"
 		self._new_modules = []
 		self._original_import = __builtins__['__import__']
 
+		# Any module imported from below path is rolled back as well, so
+		# changes to helper modules of a package are picked up on reload
+		self._path = path
+		self._before = None
+
 	def monitor(self):
+		if self._path:
+			self._before = set(sys.modules.keys())
+
 		__builtins__['__import__'] = self._import
 
+	def _owns(self, mod):
+		filename = getattr(mod, '__file__', None)
+
+		if not filename:
+			return False
+
+		filename = os.path.abspath(filename)
+		return filename == self._path or filename.startswith(os.path.join(self._path, ''))
+
 	def cancel(self):
 		__builtins__['__import__'] = self._original_import
 
+		if self._before == None:
+			return
+
+		for modname in set(sys.modules.keys()) - self._before:
+			if sys.modules[modname] and self._owns(sys.modules[modname]) and not modname in self._new_modules:
+				self._new_modules.append(modname)
+
+		self._before = None
+
 	def _import(self, name, globals=None, locals=None, fromlist=[], level=-1):
 		maybe = not name in sys.modules
 
@@ -0,0 +1,53 @@
+import time
+
+class Timing:
+	def __init__(self, name):
+		self.name = name
+		self.clear()
+
+	def clear(self):
+		# Number of times the command was executed
+		self.calls = 0
+
+		# Wall time spent running the command (excluding waiting for prompts)
+		self.time = 0.0
+		self.max = 0.0
+
+		# Number of times a yielding command was resumed
+		self.resumes = 0
+
+		# Wall time spent waiting for the user to answer prompts
+		self.wait = 0.0
+
+	def add(self, elapsed):
+		self.time += elapsed
+		self.max = max(self.max, elapsed)
+
+	def average(self):
+		if self.calls == 0:
+			return 0.0
+
+		return self.time / self.calls
+
+class Timer:
+	def __init__(self, timing):
+		self.timing = timing
+		self.start = time.time()
+
+	def stop(self):
+		if self.timing:
+			self.timing.add(time.time() - self.start)
+
+_timings = {}
+
+def timing(name):
+	if not name in _timings:
+		_timings[name] = Timing(name)
+
+	return _timings[name]
+
+def timings():
+	return _timings.values()
+
+def clear():
+	_timings.clear()
@@ -0,0 +1,166 @@
+class Node:
+	def __init__(self):
+		self.children = {}
+		self.values = []
+		self._keys = None
+
+	def keys(self):
+		# Sorted child keys, cached until the children change
+		if self._keys == None:
+			self._keys = sorted(self.children)
+
+		return self._keys
+
+	def child(self, c, create=False):
+		if c in self.children:
+			return self.children[c]
+
+		if not create:
+			return None
+
+		node = Node()
+		self.children[c] = node
+		self._keys = None
+
+		return node
+
+	def remove_child(self, c):
+		del self.children[c]
+		self._keys = None
+
+# Prefix tree mapping command names to commands. Besides plain prefix lookups,
+# it matches abbreviations where each dash separated segment of a name is only
+# given by its prefix (e.g. f-r matches find-replace)
+class Trie:
+	def __init__(self):
+		self._root = Node()
+		self._size = 0
+
+	def __len__(self):
+		return self._size
+
+	def add(self, key, value):
+		node = self._root
+
+		for c in key:
+			node = node.child(c, True)
+
+		node.values.append(value)
+		self._size += 1
+
+	def remove(self, key, value):
+		node = self._root
+		path = []
+
+		for c in key:
+			nxt = node.child(c)
+
+			if not nxt:
+				return False
+
+			path.append((node, c))
+			node = nxt
+
+		for i in xrange(0, len(node.values)):
+			if node.values[i] is value:
+				del node.values[i]
+				break
+		else:
+			return False
+
+		self._size -= 1
+
+		# Prune nodes which do not lead to any value anymore
+		while path and not node.values and not node.children:
+			node, c = path.pop()
+			node.remove_child(c)
+
+		return True
+
+	def lookup(self, prefix, node=None):
+		if node == None:
+			node = self._root
+
+		for c in prefix:
+			node = node.child(c)
+
+			if not node:
+				return None
+
+		return node
+
+	def get(self, key):
+		node = self.lookup(key)
+
+		if not node:
+			return []
+
+		return list(node.values)
+
+	def values(self, node=None):
+		if node == None:
+			node = self._root
+
+		ret = []
+		stack = [node]
+
+		# Depth first, visiting children in sorted order, which yields the
+		# values sorted by their key
+		while stack:
+			node = stack.pop()
+			ret.extend(node.values)
+
+			keys = node.keys()
+
+			for i in xrange(len(keys) - 1, -1, -1):
+				stack.append(node.children[keys[i]])
+
+		return ret
+
+	def _segment_ends(self, node, sep):
+		# Nodes directly following the next separator in the subtree of node
+		ret = []
+
+		for c in node.keys():
+			if c == sep:
+				ret.append(node.children[c])
+			else:
+				ret.extend(self._segment_ends(node.children[c], sep))
+
+		return ret
+
+	def _match(self, node, subs, idx, sep, ret):
+		node = self.lookup(subs[idx], node)
+
+		if not node:
+			return
+
+		if idx == len(subs) - 1:
+			ret.extend(self.values(node))
+			return
+
+		for n in self._segment_ends(node, sep):
+			self._match(n, subs, idx + 1, sep, ret)
+
+	def match(self, subs, sep='-'):
+		# Values of which the key segments start with the respective subs,
+		# sorted by key
+		ret = []
+		self._match(self._root, subs, 0, sep, ret)
+
+		return ret
+
+	def complete(self, prefix):
+		# Longest common prefix of all keys starting with prefix
+		node = self.lookup(prefix)
+
+		if not node:
+			return None
+
+		while not node.values and len(node.children) == 1:
+			c = node.keys()[0]
+
+			prefix += c
+			node = node.children[c]
+
+		return prefix
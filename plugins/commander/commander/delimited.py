@@ -0,0 +1,285 @@
+import re
+import bisect
+
+# Number of lines read at a time when tokenizing edited records
+CHUNK_LINES = 200
+
+def detect(line):
+	# Guesses the delimiter of delimited text from its first line
+	counts = [(line.count(x), x) for x in ('\t', ';', ',', '|')]
+	count, delimiter = max(counts)
+
+	if count == 0:
+		return ','
+
+	return delimiter
+
+def value(text, quote='"'):
+	# The value of a field, without its quotes
+	if len(text) > 1 and text.startswith(quote) and text.endswith(quote):
+		return text[1:-1].replace(quote + quote, quote)
+	else:
+		return text
+
+class Tokenizer:
+	# Splits delimited text in records of fields. Fields can be quoted, in
+	# which case they can contain the delimiter, doubled quotes and new lines
+	def __init__(self, delimiter, quote='"'):
+		self.delimiter = delimiter
+		self.quote = quote
+
+		# Blanks around fields are not part of them
+		self.blanks = ''.join([x for x in ' \t' if x != delimiter])
+
+		d = re.escape(delimiter)
+		q = re.escape(quote)
+
+		if self.blanks:
+			b = '[' + re.escape(self.blanks) + ']*'
+		else:
+			b = ''
+
+		# A quote closes a field only when it is not doubled, so a field
+		# ends at the same quote no matter what follows it
+		self._field = re.compile(u'%s((%s(?:[^%s]|%s%s)*%s(?!%s))?[^%s\\r\\n]*)' % (b, q, q, q, q, q, q, d))
+
+	def record(self, text, pos):
+		# Returns the (start, end) spans of the fields of the record at pos,
+		# the end of the record before its line terminator and whether a
+		# field opens a quote which is not closed in text. Such a field is
+		# not quoted, it ends at the end of its line
+		fields = []
+		unclosed = False
+		n = len(text)
+
+		while True:
+			m = self._field.match(text, pos)
+			start, end = m.span(1)
+
+			if m.group(2) == None and text.startswith(self.quote, start):
+				unclosed = True
+
+			while end > start and text[end - 1] in self.blanks:
+				end -= 1
+
+			fields.append((start, end))
+			pos = m.end()
+
+			if pos < n and text[pos] == self.delimiter:
+				pos += 1
+			else:
+				return fields, pos, unclosed
+
+	def records(self, text, complete=True):
+		# Yields (pos, line, size, fields, unclosed) for each record in text:
+		# its offset and line in text, its number of characters including its
+		# line terminator, the spans of its fields relative to its offset and
+		# whether it opens a quote which is never closed. When text is not
+		# complete, the records from one which is not terminated or which
+		# opens a quote that may be closed further on are left out
+		pos = 0
+		line = 0
+		n = len(text)
+
+		while True:
+			fields, end, unclosed = self.record(text, pos)
+
+			if unclosed and not complete:
+				return
+
+			if text.startswith(u'\r\n', end):
+				size = end + 2 - pos
+			elif end < n:
+				size = end + 1 - pos
+			elif complete:
+				size = end - pos
+			else:
+				return
+
+			yield pos, line, size, [(start - pos, stop - pos) for start, stop in fields], unclosed
+
+			if end == n:
+				return
+
+			line += text.count(u'\n', pos, pos + size)
+
+			if text[pos + size - 1] == u'\r':
+				line += 1
+
+			pos += size
+
+class Fields:
+	# Fields of the records of a buffer, kept current while the buffer is
+	# edited. Only records from edited lines are tokenized again, until the
+	# records start on the same lines and in the same quote state as before
+	def __init__(self, buf, delimiter, quote='"'):
+		self.buf = buf
+		self.delimiter = delimiter
+		self.tokenizer = Tokenizer(delimiter, quote)
+
+		# First line, number of characters and field spans of each record,
+		# and whether it starts after a quote which is never closed
+		self.starts = []
+		self.sizes = []
+		self.fields = []
+		self.opened = []
+
+		# Sorted, non-overlapping [first, last] ranges of edited lines
+		self._dirty = []
+		self._edit = None
+
+		self._handlers = [
+			buf.connect('insert-text', self.on_insert_text),
+			buf.connect_after('insert-text', self.on_inserted_text),
+			buf.connect('delete-range', self.on_delete_range),
+			buf.connect_after('delete-range', self.on_deleted_range)
+		]
+
+		self._tokenize(0, 0, 0, buf.get_line_count() - 1)
+
+	def remove(self):
+		for handler in self._handlers:
+			self.buf.disconnect(handler)
+
+		self._handlers = []
+
+	def on_insert_text(self, buf, location, text, length):
+		self._edit = location.get_line()
+
+	def on_inserted_text(self, buf, location, text, length):
+		self._edited(self._edit, 0, location.get_line() - self._edit)
+
+	def on_delete_range(self, buf, start, end):
+		self._edit = (start.get_line(), end.get_line())
+
+	def on_deleted_range(self, buf, start, end):
+		first, last = self._edit
+		self._edited(first, last - first, 0)
+
+	def _edited(self, line, removed, added):
+		# The lines after line up to line + removed were replaced by the lines
+		# up to line + added
+		lo = bisect.bisect_right(self.starts, line)
+		hi = bisect.bisect_right(self.starts, line + removed)
+
+		del self.starts[lo:hi]
+		del self.sizes[lo:hi]
+		del self.fields[lo:hi]
+		del self.opened[lo:hi]
+
+		delta = added - removed
+
+		if delta != 0:
+			for i in xrange(lo, len(self.starts)):
+				self.starts[i] += delta
+
+		def moved(x):
+			if x <= line:
+				return x
+			elif x <= line + removed:
+				return line
+			else:
+				return x + delta
+
+		ranges = [[moved(a), moved(b)] for a, b in self._dirty]
+		ranges.append([line, line + added])
+		ranges.sort()
+
+		self._dirty = []
+
+		for a, b in ranges:
+			if self._dirty and a <= self._dirty[-1][1] + 1:
+				self._dirty[-1][1] = max(self._dirty[-1][1], b)
+			else:
+				self._dirty.append([a, b])
+
+	def _get_text(self, first, last):
+		start = self.buf.get_iter_at_line(first)
+		end = self.buf.get_iter_at_line(last)
+
+		if not end.forward_line():
+			end = self.buf.get_end_iter()
+
+		return start.get_text(end).decode('utf-8'), end.is_end()
+
+	def _tokenize(self, line, lo, hi, last=-1):
+		# Tokenizes the records from line, which replace the records lo to
+		# hi, until past last at the start of a record which did not change.
+		# The record at line must not start after a quote which is never
+		# closed
+		count = self.buf.get_line_count()
+		chunk = CHUNK_LINES
+		opened = False
+
+		starts = []
+		sizes = []
+		fields = []
+		opens = []
+
+		while True:
+			text, complete = self._get_text(line, min(max(line, last) + chunk, count - 1))
+			before = line
+			resync = False
+
+			for pos, offset, size, spans, unclosed in self.tokenizer.records(text, complete):
+				start = before + offset
+
+				if start > last and hi < len(self.starts) and start == self.starts[hi] and opened == self.opened[hi]:
+					resync = True
+					break
+
+				while hi < len(self.starts) and self.starts[hi] <= start:
+					hi += 1
+
+				starts.append(start)
+				sizes.append(size)
+				fields.append(spans)
+				opens.append(opened)
+
+				opened = opened or unclosed
+
+				line = start + text.count(u'\n', pos, pos + size)
+
+				if size > 0 and text[pos + size - 1] == u'\r':
+					line += 1
+
+			if resync:
+				break
+
+			if complete:
+				hi = len(self.starts)
+				break
+
+			# Records longer than a chunk, or quotes closed past it, are read
+			# in larger chunks
+			if line == before:
+				chunk *= 2
+
+		self.starts[lo:hi] = starts
+		self.sizes[lo:hi] = sizes
+		self.fields[lo:hi] = fields
+		self.opened[lo:hi] = opens
+
+	def sync(self):
+		# Tokenizes the edited records again
+		while self._dirty:
+			first, last = self._dirty.pop(0)
+			lo = max(bisect.bisect_right(self.starts, first) - 1, 0)
+
+			# An edit can close a quote left open on an earlier line, so the
+			# records after one are tokenized again from before the quote
+			while lo > 0 and lo < len(self.starts) and self.opened[lo]:
+				lo -= 1
+
+			if lo < len(self.starts):
+				line = min(self.starts[lo], first)
+			else:
+				line = first
+
+			self._tokenize(line, lo, lo, last)
+
+	def between(self, first, last):
+		# The records which start on the lines first to last
+		self.sync()
+
+		return bisect.bisect_left(self.starts, first), bisect.bisect_right(self.starts, last)
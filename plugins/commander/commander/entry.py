@@ -51,6 +51,7 @@ class Entry(gtk.EventBox):
 
 		self._entry.connect('focus-out-event', self.on_entry_focus_out)
 		self._entry.connect('key-press-event', self.on_entry_key_press)
+		self._entry.connect('changed', self.on_entry_changed)
 
 		self.connect_after('size-allocate', self.on_size_allocate)
 		self.connect_after('expose-event', self.on_expose)
@@ -58,6 +59,7 @@ class Entry(gtk.EventBox):
 
 		self._history = History(os.path.expanduser('~/.config/pluma/commander/history'))
 		self._prompt = None
+		self._prompt_changed = None
 
 		self._accel_group = None
 
@@ -70,6 +72,8 @@ class Entry(gtk.EventBox):
 		self._entry.grab_focus()
 		self._wait_timeout = 0
 		self._info_window = None
+		self._completion_refresh = None
+		self._completion_state = None
 
 		self.connect('destroy', self.on_destroy)
 
@@ -172,7 +176,7 @@ class Entry(gtk.EventBox):
 		if evnt.keyval == gtk.keysyms.Escape:
 			if self._info_window:
 				if self._suspended:
-					self._suspended.resume()
+					self._suspended.cancel()
 
 				if self._info_window:
 					self._info_window.destroy()
@@ -189,6 +193,7 @@ class Entry(gtk.EventBox):
 			elif text:
 				self._entry.set_text('')
 			elif self._command_state:
+				self._prompt_changed = None
 				self._command_state.clear()
 				self.prompt()
 			else:
@@ -231,6 +236,10 @@ class Entry(gtk.EventBox):
 		self._history_prefix = None
 		return False
 
+	def on_entry_changed(self, widget):
+		if self._prompt_changed:
+			self._prompt_changed(self._entry.get_text())
+
 	def on_history_move(self, direction, modifier):
 		pos = self._entry.get_position()
 
@@ -282,6 +291,10 @@ class Entry(gtk.EventBox):
 		self.make_info()
 		self._info_window.add_lines(text, use_markup)
 
+	def info_add_link(self, text, callback, data=None, use_markup=False):
+		self.make_info()
+		self._info_window.add_link(text, callback, data, use_markup)
+
 	def info_status(self, text):
 		self.make_info()
 		self._info_window.status(text)
@@ -297,7 +310,7 @@ class Entry(gtk.EventBox):
 
 	def on_wait_cancel(self):
 		if self._suspended:
-			self._suspended.resume()
+			self._suspended.cancel()
 
 		if self._cancel_button:
 			self._cancel_button.destroy()
@@ -307,13 +320,27 @@ class Entry(gtk.EventBox):
 			self._entry.grab_focus()
 			self._entry.set_sensitive(True)
 
+	def _wait_status(self):
+		progress = getattr(self._suspended, 'progress', None)
+
+		if progress == None:
+			return '<i>Waiting to finish...</i>'
+		else:
+			return '<i>Working... %d%%</i>' % (int(progress * 100),)
+
 	def _show_wait_cancel(self):
 		self._cancel_button = self.info_add_action(gtk.STOCK_STOP, self.on_wait_cancel)
-		self.info_status('<i>Waiting to finish...</i>')
+		self.info_status(self._wait_status())
 
 		self._wait_timeout = 0
 		return False
 
+	def on_suspend_progress(self, fraction):
+		# Progress is only shown once the wait status is shown, after the wait
+		# timeout
+		if not self._wait_timeout and self._suspended:
+			self.info_status(self._wait_status())
+
 	def _complete_word_match(self, match):
 		for i in (3, 2, 0):
 			if match.group(i) != None:
@@ -349,6 +376,7 @@ class Entry(gtk.EventBox):
 
 	def run_command(self, cb):
 		self._suspended = None
+		self._prompt_changed = None
 
 		try:
 			ret = cb()
@@ -371,6 +399,9 @@ class Entry(gtk.EventBox):
 			self._suspended = ret
 			ret.register(self.on_suspend_resume)
 
+			if isinstance(ret, commands.result.Background) or isinstance(ret, commands.result.Pool):
+				ret.register_progress(self.on_suspend_progress)
+
 			self._wait_timeout = glib.timeout_add(500, self._show_wait_cancel)
 			self._entry.set_sensitive(False)
 		else:
@@ -379,6 +410,7 @@ class Entry(gtk.EventBox):
 
 			if ret == commands.result.Result.PROMPT:
 				self.prompt(ret.prompt)
+				self._prompt_changed = ret.changed
 			elif (ret == None or ret == commands.result.HIDE) and not self._prompt and (not self._info_window or self._info_window.empty()):
 				self._command_state.clear()
 				self._view.grab_focus()
@@ -409,6 +441,8 @@ class Entry(gtk.EventBox):
 		return True
 
 	def on_complete(self, dummy, modifier):
+		self._completion_state = None
+
 		# First split all the text in words
 		text = self._entry.get_text()
 		pos = self._entry.get_position()
@@ -459,7 +493,7 @@ class Entry(gtk.EventBox):
 
 		if not self._command_state and posidx == 0:
 			# Complete the first command
-			ret = commands.completion.command(words=wordsstr, idx=posidx)
+			ret = commands.completion.fuzzy_command(words=wordsstr, idx=posidx)
 		else:
 			complete = None
 			realidx = posidx
@@ -509,7 +543,8 @@ class Entry(gtk.EventBox):
 				kwargs = {
 					'words': ww,
 					'idx': realidx,
-					'view': self._view
+					'view': self._view,
+					'entry': self
 				}
 
 				if not spec.keywords:
@@ -526,6 +561,8 @@ class Entry(gtk.EventBox):
 				return True
 
 		if not ret or not ret[0]:
+			# Completion can still be refreshed when results come in later
+			self._completion_state = (text, pos)
 			return True
 
 		res = ret[0]
@@ -581,9 +618,31 @@ class Entry(gtk.EventBox):
 
 			self.info_show("\n".join(ret), True)
 
+		self._completion_state = (self._entry.get_text(), self._entry.get_position())
 		return True
 
+	def refresh_completion_callback(self):
+		# Returns a callback for completion functions which finish their work
+		# in the background. Completion is run again when the callback is
+		# called, unless the entry changed in the meantime
+		token = object()
+		self._completion_refresh = token
+
+		def refresh():
+			if self._completion_refresh != token:
+				return
+
+			self._completion_refresh = None
+
+			if self._completion_state == (self._entry.get_text(), self._entry.get_position()):
+				self.on_complete(None, 0)
+
+		return refresh
+
 	def on_destroy(self, widget):
+		self._completion_refresh = None
+		self._prompt_changed = None
+		self._command_state.clear()
 		self._view.set_border_window_size(gtk.TEXT_WINDOW_BOTTOM, 0)
 
 		if self._info_window:
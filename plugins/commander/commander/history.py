@@ -1,77 +1,314 @@
 import os
+import bisect
+import fcntl
+import tempfile
+import glib
 
-class History:
-	def __init__(self, filename):
+class HistoryStore:
+	# Maximum number of lines kept, older lines are dropped
+	max_lines = 1000
+
+	def __init__(self, filename, max_lines=None):
 		self._filename = filename
-		self._history = ['']
-		self._ptr = 0
+
+		if max_lines != None:
+			self.max_lines = max_lines
+
+		self._lines = {}
+		self._seqs = []
+		self._index = {}
+		self._sorted = []
+		self._recent = {}
+		self._next = 0
+
+		self._journal_lines = 0
+		self._compact_id = 0
 
 		self.load()
 
-	def find(self, direction, prefix):
-		ptr = self._ptr + direction
+	def __len__(self):
+		return len(self._seqs)
 
-		while ptr >= 0 and ptr < len(self._history):
-			if self._history[ptr].startswith(prefix):
-				return ptr
+	def line(self, seq):
+		return self._lines.get(seq)
 
-			ptr += direction
+	def _remove(self, seq):
+		line = self._lines[seq]
 
-		return -1
+		del self._lines[seq]
+		del self._index[line]
 
-	def move(self, direction, prefix):
-		next = self.find(direction, prefix)
+		del self._seqs[bisect.bisect_left(self._seqs, seq)]
+		del self._sorted[bisect.bisect_left(self._sorted, line)]
 
-		if next != -1:
-			self._ptr = next
-			return self._history[self._ptr]
-		else:
-			return None
+	def _insert(self, line):
+		# Lines are unique, re-adding a line moves it to the end
+		if line in self._index:
+			self._remove(self._index[line])
 
-	def up(self, prefix=''):
-		return self.move(-1, prefix)
+		seq = self._next
+		self._next += 1
 
-	def down(self, prefix=''):
-		return self.move(1, prefix)
+		self._lines[seq] = line
+		self._index[line] = seq
+		self._seqs.append(seq)
+		bisect.insort(self._sorted, line)
+
+		# Remember when the command was used last
+		self._recent[line.split(None, 1)[0]] = seq
+
+		while len(self._seqs) > self.max_lines:
+			self._remove(self._seqs[0])
+
+		# Commands older than the history have no recency, forget them
+		if len(self._recent) > self.max_lines * 2:
+			for command, used in self._recent.items():
+				if used < self._next - self.max_lines:
+					del self._recent[command]
+
+	def recency(self, command):
+		# 1 for the command used last, dropping to 0 for commands older than
+		# the history remembers
+		if not command in self._recent:
+			return 0
+
+		age = self._next - 1 - self._recent[command]
+		return max(0.0, 1.0 - float(age) / self.max_lines)
 
 	def add(self, line):
-		if line.strip() != '':
-			if self._history[-1] != '':
-				self._history.append(line)
+		if line.strip() == '':
+			return
+
+		self._insert(line)
+		self._append(line)
+
+	def find(self, seq, direction, prefix):
+		# Find the sequence number of the closest line before (direction < 0)
+		# or after (direction > 0) seq starting with prefix. A seq of None is
+		# the line currently being edited, just after the last line
+		if seq == None:
+			seq = self._next
+
+		if not prefix:
+			if direction < 0:
+				idx = bisect.bisect_left(self._seqs, seq) - 1
 			else:
-				self._history[-1] = line
+				idx = bisect.bisect_right(self._seqs, seq)
 
-		if self._history[-1] != '':
-			self._history.append('')
+			if idx >= 0 and idx < len(self._seqs):
+				return self._seqs[idx]
 
-		self._ptr = len(self._history) - 1
+			return None
 
-	def update(self, line):
-		self._history[self._ptr] = line
+		ret = None
+		idx = bisect.bisect_left(self._sorted, prefix)
+
+		while idx < len(self._sorted) and self._sorted[idx].startswith(prefix):
+			other = self._index[self._sorted[idx]]
+			idx += 1
+
+			if direction < 0 and other < seq and (ret == None or other > ret):
+				ret = other
+			elif direction > 0 and other > seq and (ret == None or other < ret):
+				ret = other
+
+		return ret
 
 	def load(self):
 		try:
-			self._history = map(lambda x: x.strip("\n"), file(self._filename, 'r').readlines())
-			self._history.append('')
-			self._ptr = len(self._history) - 1
+			f = file(self._filename, 'r')
+			lines = f.readlines()
+			f.close()
 		except IOError:
-			pass
+			return
 
-	def save(self):
+		for line in lines:
+			line = line.strip("\n")
+
+			if line.strip() != '':
+				self._insert(line)
+
+		self._journal_lines = len(lines)
+		self._schedule_compact()
+
+	def _append(self, line):
 		try:
 			os.makedirs(os.path.dirname(self._filename))
 		except OSError:
 			pass
 
+		# Opened in append mode, so concurrent writers never overwrite each
+		# others lines
 		try:
-			f = file(self._filename, 'w')
+			f = self._open_locked('a')
 
-			if self._history[-1] == '':
-				hist = self._history[:-1]
-			else:
-				hist = self._history
+			try:
+				f.write(line + "\n")
+			finally:
+				f.close()
+		except IOError:
+			return
+
+		self._journal_lines += 1
+		self._schedule_compact()
+
+	def _schedule_compact(self):
+		if self._compact_id or self._journal_lines <= self.max_lines * 2:
+			return
+
+		self._compact_id = glib.idle_add(self.compact, priority=glib.PRIORITY_LOW)
+
+	def _open_locked(self, mode):
+		# Opens the history file locked against other processes. Compacting
+		# replaces the file, so it is opened again when it was replaced while
+		# waiting for the lock
+		while True:
+			f = file(self._filename, mode)
+			fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+			try:
+				if os.stat(self._filename).st_ino == os.fstat(f.fileno()).st_ino:
+					return f
+			except OSError:
+				pass
 
-			f.writelines(map(lambda x: x + "\n", hist))
 			f.close()
+
+	def _compacted(self, lines):
+		# The last max_lines unique lines, in the order they were last added
+		ret = []
+		seen = set()
+
+		for line in reversed(lines):
+			line = line.strip("\n")
+
+			if line.strip() == '' or line in seen:
+				continue
+
+			seen.add(line)
+			ret.append(line + "\n")
+
+			if len(ret) == self.max_lines:
+				break
+
+		ret.reverse()
+		return ret
+
+	def compact(self):
+		self._compact_id = 0
+
+		try:
+			f = self._open_locked('r')
 		except IOError:
-			pass
+			return False
+
+		# The file is read again under the lock, so lines other processes
+		# appended are kept
+		try:
+			try:
+				lines = self._compacted(f.readlines())
+
+				dirname, basename = os.path.split(self._filename)
+				fd, tmpname = tempfile.mkstemp(prefix=basename + '.', dir=dirname)
+
+				try:
+					tmp = os.fdopen(fd, 'w')
+
+					try:
+						tmp.writelines(lines)
+					finally:
+						tmp.close()
+
+					os.rename(tmpname, self._filename)
+				except:
+					os.unlink(tmpname)
+					raise
+			except (IOError, OSError):
+				return False
+		finally:
+			f.close()
+
+		self._journal_lines = len(lines)
+		return False
+
+	def flush(self):
+		if self._compact_id:
+			glib.source_remove(self._compact_id)
+			self.compact()
+
+_stores = {}
+
+def store(filename):
+	# History is shared by all the windows of the process
+	if not filename in _stores:
+		_stores[filename] = HistoryStore(filename)
+
+	return _stores[filename]
+
+def recency(command):
+	ret = 0
+
+	for s in _stores.values():
+		ret = max(ret, s.recency(command))
+
+	return ret
+
+class History:
+	def __init__(self, filename):
+		self._store = store(filename)
+
+		# Pointer into the store, None being the line currently edited
+		self._ptr = None
+		self._current = ''
+		self._edits = {}
+
+	def _line(self, seq):
+		if seq == None:
+			return self._current
+		elif seq in self._edits:
+			return self._edits[seq]
+		else:
+			return self._store.line(seq) or ''
+
+	def find(self, direction, prefix):
+		seq = self._store.find(self._ptr, direction, prefix)
+
+		if seq != None:
+			return seq
+
+		# Moving down from the last line ends up at the line being edited
+		if direction > 0 and self._ptr != None and self._current.startswith(prefix):
+			return None
+
+		return -1
+
+	def move(self, direction, prefix):
+		next = self.find(direction, prefix)
+
+		if next != -1:
+			self._ptr = next
+			return self._line(self._ptr)
+		else:
+			return None
+
+	def up(self, prefix=''):
+		return self.move(-1, prefix)
+
+	def down(self, prefix=''):
+		return self.move(1, prefix)
+
+	def add(self, line):
+		self._store.add(line)
+
+		self._ptr = None
+		self._current = ''
+		self._edits = {}
+
+	def update(self, line):
+		if self._ptr == None:
+			self._current = line
+		else:
+			self._edits[self._ptr] = line
+
+	def save(self):
+		self._store.flush()
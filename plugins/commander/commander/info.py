@@ -1,7 +1,9 @@
 from transparentwindow import TransparentWindow
 import gtk
+import glib
 import math
 import pango
+import bisect
 
 class Info(TransparentWindow):
 	def __init__(self, entry):
@@ -20,6 +22,8 @@ class Info(TransparentWindow):
 		self._text.modify_font(entry._view.style.font_desc)
 		self._text.modify_text(gtk.STATE_NORMAL, entry._entry.style.text[gtk.STATE_NORMAL])
 		self._text.connect('expose-event', self.on_text_expose)
+		self._text.connect('button-press-event', self.on_text_button_press)
+		self._text.connect('motion-notify-event', self.on_text_motion_notify)
 		self._text.set_wrap_mode(gtk.WRAP_WORD_CHAR)
 
 		buf = self._text.get_buffer()
@@ -48,9 +52,21 @@ class Info(TransparentWindow):
 
 		self.connect_after('size-allocate', self.on_size_allocate)
 		self._vw.connect_after('size-allocate', self.on_text_size_allocate)
+		self.connect('destroy', self.on_destroy)
 
 		self.max_lines = 10
 
+		# Only the last lines of the output are kept
+		self.max_scrollback = 1000
+
+		# Lines are added in batches, when idle
+		self._pending = []
+		self._flush_id = 0
+		self._flushing = False
+
+		# Sorted [line, callback, data] of lines which can be clicked
+		self._links = []
+
 		self._attr_map = {
 			pango.ATTR_STYLE: 'style',
 			pango.ATTR_WEIGHT: 'weight',
@@ -66,6 +82,9 @@ class Info(TransparentWindow):
 		}
 
 	def empty(self):
+		if self._pending:
+			return False
+
 		buf = self._text.get_buffer()
 		return buf.get_start_iter().equal(buf.get_end_iter())
 
@@ -117,10 +136,85 @@ class Info(TransparentWindow):
 		return ret
 
 	def add_lines(self, line, use_markup=False):
+		self._pending.append((line, use_markup, None))
+
+		if not self._flush_id:
+			self._flush_id = glib.idle_add(self.on_flush_idle)
+
+	def add_link(self, line, callback, data=None, use_markup=False):
+		self._pending.append((line, use_markup, [callback, data]))
+
+		if not self._flush_id:
+			self._flush_id = glib.idle_add(self.on_flush_idle)
+
+	def on_flush_idle(self):
+		self._flush_id = 0
+		self.flush()
+
+		return False
+
+	def _visible_pending(self):
+		# Lines which would be dropped from the scrollback right away are
+		# never inserted at all
+		num = 0
+		idx = len(self._pending)
+
+		while idx > 0 and num < self.max_scrollback:
+			idx -= 1
+			num += self._pending[idx][0].count("\n") + 1
+
+		return self._pending[idx:]
+
+	def _batches(self, pending):
+		# Consecutive lines of the same kind are inserted in one go
+		ret = []
+
+		for line, use_markup, link in pending:
+			if not ret or ret[-1][1] != use_markup or (ret[-1][2] == None) != (link == None):
+				if link:
+					ret.append(([], use_markup, []))
+				else:
+					ret.append(([], use_markup, None))
+
+			ret[-1][0].append(line)
+
+			if link:
+				ret[-1][2].append(link)
+
+		return ret
+
+	def flush(self):
+		if self._flush_id:
+			glib.source_remove(self._flush_id)
+			self._flush_id = 0
+
+		pending = self._visible_pending()
+		self._pending = []
+
+		if not pending:
+			return
+
+		self._flushing = True
+
+		try:
+			for lines, use_markup, links in self._batches(pending):
+				if links:
+					self.add_links(lines, links)
+
+				self.insert_lines(lines, use_markup)
+
+			self.trim_scrollback()
+		finally:
+			self._flushing = False
+
+		self.contents_changed()
+
+	def insert_lines(self, lines, use_markup=False):
 		buf = self._text.get_buffer()
+		line = "\n".join(lines)
 
 		if not buf.get_start_iter().equal(buf.get_end_iter()):
-			line = "\n" + line
+			buf.insert(buf.get_end_iter(), "\n")
 
 		if not use_markup:
 			buf.insert(buf.get_end_iter(), line)
@@ -129,6 +223,13 @@ class Info(TransparentWindow):
 		try:
 			ret = pango.parse_markup(line)
 		except Exception, e:
+			if len(lines) > 1:
+				# Find out which of the lines is broken
+				for line in lines:
+					self.insert_lines([line], True)
+
+				return
+
 			print 'Could not parse markup:', e
 			buf.insert(buf.get_end_iter(), line)
 			return
@@ -146,8 +247,37 @@ class Info(TransparentWindow):
 			if not piter.next():
 				break
 
+	def add_links(self, lines, links):
+		# Register the links of lines about to be inserted
+		buf = self._text.get_buffer()
+
+		if buf.get_start_iter().equal(buf.get_end_iter()):
+			num = 0
+		else:
+			num = buf.get_line_count()
+
+		for i in xrange(len(lines)):
+			self._links.append([num] + links[i])
+			num += lines[i].count("\n") + 1
+
+	def trim_scrollback(self):
+		buf = self._text.get_buffer()
+		extra = buf.get_line_count() - self.max_scrollback
+
+		if extra > 0:
+			buf.delete(buf.get_start_iter(), buf.get_iter_at_line(extra))
+
+			idx = bisect.bisect_left(self._links, [extra])
+			self._links = [[x[0] - extra] + x[1:] for x in self._links[idx:]]
+
 	def toomany_lines(self):
 		buf = self._text.get_buffer()
+
+		# Every line in the buffer is at least one display line, only short
+		# buffers need to be measured for wrapped lines
+		if buf.get_line_count() > self.max_lines + 1:
+			return True
+
 		piter = buf.get_start_iter()
 		num = 0
 
@@ -160,20 +290,20 @@ class Info(TransparentWindow):
 		return False
 
 	def contents_changed(self):
-		buf = self._text.get_buffer()
+		toomany = self.toomany_lines()
 
-		if self.toomany_lines() and (self._vw.get_policy()[1] != gtk.POLICY_ALWAYS):
+		if toomany and (self._vw.get_policy()[1] != gtk.POLICY_ALWAYS):
 			self._vw.set_policy(gtk.POLICY_NEVER, gtk.POLICY_ALWAYS)
 
 			layout = self._text.create_pango_layout('Some text to measure')
 			extents = layout.get_pixel_extents()
 
 			self._text.set_size_request(-1, extents[1][3] * self.max_lines)
-		elif not self.toomany_lines() and (self._vw.get_policy()[1] == gtk.POLICY_ALWAYS):
+		elif not toomany and (self._vw.get_policy()[1] == gtk.POLICY_ALWAYS):
 			self._vw.set_policy(gtk.POLICY_NEVER, gtk.POLICY_NEVER)
 			self._text.set_size_request(-1, -1)
 
-		if not self.toomany_lines():
+		if not toomany:
 			size = self.get_size()
 			self.resize(size[0], 1)
 
@@ -235,6 +365,12 @@ class Info(TransparentWindow):
 			callback()
 
 	def clear(self):
+		if self._flush_id:
+			glib.source_remove(self._flush_id)
+			self._flush_id = 0
+
+		self._pending = []
+		self._links = []
 		self._text.get_buffer().set_text('')
 
 	def on_text_expose(self, widget, evnt):
@@ -253,6 +389,45 @@ class Info(TransparentWindow):
 		ct.restore()
 		return False
 
+	def _link_at(self, x, y):
+		if not self._links:
+			return None
+
+		x, y = self._text.window_to_buffer_coords(gtk.TEXT_WINDOW_TEXT, int(x), int(y))
+		line = self._text.get_iter_at_location(x, y).get_line()
+
+		idx = bisect.bisect_left(self._links, [line])
+
+		if idx < len(self._links) and self._links[idx][0] == line:
+			return self._links[idx]
+		else:
+			return None
+
+	def on_text_button_press(self, widget, evnt):
+		if evnt.button != 1:
+			return False
+
+		link = self._link_at(evnt.x, evnt.y)
+
+		if not link:
+			return False
+
+		if link[2]:
+			link[1](link[2])
+		else:
+			link[1]()
+
+		return True
+
+	def on_text_motion_notify(self, widget, evnt):
+		if self._link_at(evnt.x, evnt.y):
+			cursor = gtk.gdk.Cursor(gtk.gdk.HAND2)
+		else:
+			cursor = None
+
+		self._text.get_window(gtk.TEXT_WINDOW_TEXT).set_cursor(cursor)
+		return False
+
 	def on_text_realize(self, widget):
 		self._text.get_window(gtk.TEXT_WINDOW_TEXT).set_back_pixmap(None, False)
 
@@ -269,10 +444,17 @@ class Info(TransparentWindow):
 		self.resize(geom[2] - margin * 2, self.allocation.height)
 
 	def on_text_insert_text(self, buf, piter, text, length):
-		self.contents_changed()
+		if not self._flushing:
+			self.contents_changed()
 
 	def on_text_delete_range(self, buf, start, end):
-		self.contents_changed()
+		if not self._flushing:
+			self.contents_changed()
+
+	def on_destroy(self, widget):
+		if self._flush_id:
+			glib.source_remove(self._flush_id)
+			self._flush_id = 0
 
 	def on_size_allocate(self, widget, allocation):
 		vwwnd = self._entry._view.get_window(gtk.TEXT_WINDOW_TEXT)
@@ -0,0 +1,350 @@
+import os
+import stat
+import time
+import fnmatch
+import hashlib
+import cPickle
+import tempfile
+import sre_parse
+import sre_constants
+
+# Directories and files which are never searched, besides hidden directories
+IGNORED_DIRECTORIES = ['CVS', '_darcs']
+IGNORED_FILES = ['*~', '*.pyc', '*.pyo', '*.o', '*.so', '*.a', '*.class']
+
+MAX_FILE_SIZE = 8 * 1024 * 1024
+
+def cache_filename(root):
+	name = hashlib.md5(os.path.abspath(root)).hexdigest()
+	return os.path.join(os.path.expanduser('~/.cache/pluma/commander/trigrams'), name)
+
+def list_files(root, pattern='*'):
+	# Returns (path, mtime, size) of the files below root which can be searched
+	ret = []
+
+	for dirpath, dirnames, filenames in os.walk(root):
+		dirnames[:] = filter(lambda x: not x.startswith('.') and not x in IGNORED_DIRECTORIES, dirnames)
+		dirnames.sort()
+
+		filenames.sort()
+
+		for filename in filenames:
+			if not fnmatch.fnmatch(filename, pattern):
+				continue
+
+			if filter(lambda x: fnmatch.fnmatch(filename, x), IGNORED_FILES):
+				continue
+
+			path = os.path.join(dirpath, filename)
+
+			try:
+				st = os.stat(path)
+			except OSError:
+				continue
+
+			if stat.S_ISREG(st.st_mode) and st.st_size <= MAX_FILE_SIZE:
+				ret.append((path, st.st_mtime, st.st_size))
+
+	return ret
+
+def read(path):
+	# Returns the text of a file and its encoding, or None for binary files
+	f = open(path, 'rb')
+
+	try:
+		text = f.read()
+	finally:
+		f.close()
+
+	if '\0' in text[:8192]:
+		return None, None
+
+	try:
+		return text.decode('utf-8'), 'utf-8'
+	except UnicodeDecodeError:
+		return text.decode('latin-1'), 'latin-1'
+
+def read_text(path):
+	# Returns the text of a file, or None for binary files
+	return read(path)[0]
+
+def trigrams(text):
+	# Trigrams are case insensitive, so they can be used for case insensitive
+	# regular expressions as well
+	text = text.lower()
+	return set([text[i:i + 3] for i in xrange(len(text) - 2)])
+
+def _required_strings(parsed):
+	# Literal strings any match of a parsed regular expression contains
+	ret = []
+	literal = []
+
+	for op, av in parsed:
+		if op == sre_constants.LITERAL:
+			literal.append(unichr(av))
+			continue
+
+		ret.append(u''.join(literal))
+		literal = []
+
+		if op == sre_constants.SUBPATTERN:
+			ret.extend(_required_strings(av[1]))
+		elif (op == sre_constants.MAX_REPEAT or op == sre_constants.MIN_REPEAT) and av[0] > 0:
+			ret.extend(_required_strings(av[2]))
+
+	ret.append(u''.join(literal))
+	return ret
+
+def required_trigrams(regex):
+	if isinstance(regex, str):
+		regex = regex.decode('utf-8')
+
+	try:
+		parsed = sre_parse.parse(regex)
+	except Exception:
+		return set()
+
+	ret = set()
+
+	for s in _required_strings(parsed):
+		ret.update(trigrams(s))
+
+	return ret
+
+class TrigramIndex:
+	VERSION = 1
+
+	def __init__(self, root, filename=None):
+		self.root = os.path.abspath(root)
+
+		if filename == None:
+			filename = cache_filename(self.root)
+
+		self.filename = filename
+		self.clear()
+
+	def clear(self):
+		self.updated = None
+
+		# path -> [id, mtime, size], ids of files which could not be indexed
+		# are negative
+		self._files = {}
+		self._paths = {}
+		self._postings = {}
+		self._next_id = 1
+		self._dead = 0
+
+	def load(self):
+		try:
+			f = open(self.filename, 'rb')
+		except IOError:
+			return False
+
+		try:
+			try:
+				data = cPickle.load(f)
+			except Exception:
+				return False
+		finally:
+			f.close()
+
+		if data.get('version') != self.VERSION or data.get('root') != self.root:
+			return False
+
+		self.updated = data['updated']
+		self._files = data['files']
+		self._postings = data['postings']
+		self._next_id = data['next_id']
+		self._dead = data['dead']
+
+		self._paths = {}
+
+		for path in self._files:
+			self._paths[abs(self._files[path][0])] = path
+
+		return True
+
+	def save(self):
+		dirname = os.path.dirname(self.filename)
+
+		if not os.path.isdir(dirname):
+			os.makedirs(dirname)
+
+		data = {
+			'version': self.VERSION,
+			'root': self.root,
+			'updated': self.updated,
+			'files': self._files,
+			'postings': self._postings,
+			'next_id': self._next_id,
+			'dead': self._dead
+		}
+
+		# Write to a temporary file first, so the index is never half written.
+		# Each writer has its own, other processes may save the index too
+		fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.filename) + '.', dir=dirname)
+
+		try:
+			f = os.fdopen(fd, 'wb')
+
+			try:
+				cPickle.dump(data, f, cPickle.HIGHEST_PROTOCOL)
+			finally:
+				f.close()
+
+			os.rename(tmp, self.filename)
+		except:
+			os.unlink(tmp)
+			raise
+
+	def _remove(self, path):
+		fid = self._files.pop(path)[0]
+		del self._paths[abs(fid)]
+
+		if fid > 0:
+			self._dead += 1
+
+	def _add(self, path, mtime, size):
+		fid = self._next_id
+		self._next_id += 1
+
+		try:
+			text = read_text(path)
+		except (IOError, OSError):
+			text = None
+
+		if text == None:
+			fid = -fid
+		else:
+			for trigram in trigrams(text):
+				self._postings.setdefault(trigram, []).append(fid)
+
+		self._files[path] = [fid, mtime, size]
+		self._paths[abs(fid)] = path
+
+	def _compact(self):
+		# Drop the ids of removed files from the postings
+		for trigram in self._postings.keys():
+			ids = filter(lambda x: x in self._paths, self._postings[trigram])
+
+			if ids:
+				self._postings[trigram] = ids
+			else:
+				del self._postings[trigram]
+
+		self._dead = 0
+
+	def changes(self, files=None):
+		# Returns the (path, mtime, size) of the changed or new files, and the
+		# paths of the removed files
+		if files == None:
+			files = list_files(self.root)
+
+		changed = []
+		seen = set()
+
+		for path, mtime, size in files:
+			seen.add(path)
+			info = self._files.get(path)
+
+			if info == None or info[1] != mtime or info[2] != size:
+				changed.append((path, mtime, size))
+
+		removed = filter(lambda x: not x in seen, self._files)
+		return changed, removed
+
+	def update(self, progress=None):
+		# Brings the index up to date with the files on disk, only changed
+		# files are read again. Returns whether the index changed
+		changed, removed = self.changes()
+		compacted = False
+
+		for path in removed:
+			self._remove(path)
+
+		for i in xrange(len(changed)):
+			path, mtime, size = changed[i]
+
+			if path in self._files:
+				self._remove(path)
+
+			self._add(path, mtime, size)
+
+			if progress:
+				progress(float(i + 1) / len(changed))
+
+		if self._dead > len(self._files):
+			self._compact()
+			compacted = True
+
+		if not changed and not removed and not compacted and self.updated != None:
+			return False
+
+		self.updated = time.time()
+		return True
+
+	def candidates(self, regex, pattern='*'):
+		# Paths of the files which can contain a match of regex, sorted
+		required = required_trigrams(regex)
+
+		if not required:
+			paths = self._files.keys()
+		else:
+			ids = None
+
+			for trigram in sorted(required, key=lambda x: len(self._postings.get(x, []))):
+				posting = self._postings.get(trigram)
+
+				if not posting:
+					return []
+
+				if ids == None:
+					ids = set(posting)
+				else:
+					ids.intersection_update(posting)
+
+				if not ids:
+					return []
+
+			paths = [self._paths[x] for x in ids if x in self._paths]
+
+		paths = filter(lambda x: fnmatch.fnmatch(os.path.basename(x), pattern), paths)
+		paths.sort()
+
+		return paths
+
+	def status(self):
+		changed, removed = self.changes()
+
+		try:
+			size = os.path.getsize(self.filename)
+		except OSError:
+			size = 0
+
+		return {
+			'root': self.root,
+			'files': len(self._files),
+			'trigrams': len(self._postings),
+			'size': size,
+			'updated': self.updated,
+			'changed': len(changed),
+			'removed': len(removed)
+		}
+
+def updated(root, progress=None):
+	# The index of root brought up to date with the files on disk, which is
+	# saved again when it changed and possible
+	index = TrigramIndex(root)
+
+	index.load()
+
+	if index.update(progress):
+		try:
+			index.save()
+		except (IOError, OSError):
+			pass
+
+	return index
+
+def candidates(root, regex, pattern='*', progress=None):
+	return updated(root, progress).candidates(regex, pattern)
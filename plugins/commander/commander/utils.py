@@ -3,6 +3,8 @@ import types
 import inspect
 import sys
 
+import commander.commands.exceptions
+
 class Struct(dict):
 	def __getattr__(self, name):
 		if not name in self:
@@ -29,6 +31,10 @@ def is_commander_module(mod):
 		return mod.endswith('.py') or (os.path.isdir(mod) and os.path.isfile(os.path.join(mod, '__init__.py')))
 
 def getargspec(func):
+	# Stand-ins for functions which are not loaded yet carry their own spec
+	if hasattr(func, '__argspec__'):
+		return func.__argspec__
+
 	ret = inspect.getargspec(func)
 
 	# Before 2.6 this was just a normal tuple, we don't want that
@@ -40,4 +46,42 @@ def getargspec(func):
 			'defaults': ret[3]
 		})
 
-	return ret
\ No newline at end of file
+	return ret
+
+def document_root(view):
+	# Directory files are looked up relative to for the document of view
+	doc = view.get_buffer()
+
+	if not doc.is_untitled():
+		return os.path.dirname(doc.get_location().get_path())
+	else:
+		return os.getcwd()
+
+def search_root(view):
+	# Directory below which files are searched for the document of view. The
+	# home directory and the file system root are not searched as a whole
+	root = document_root(view)
+	real = os.path.realpath(root)
+
+	if real == os.path.realpath(os.path.expanduser('~')) or real == os.path.dirname(real):
+		raise commander.commands.exceptions.Execute('Files are not searched below the home directory or the file system root, save the document in a project directory first')
+
+	return root
+
+def search_match_style(buf):
+	# Tag properties of the search-match style of the buffer's style scheme
+	scheme = buf.get_style_scheme()
+	style = scheme.get_style('search-match')
+
+	if style is None:
+		return {'background': '#FFFF78', 'background_set': True, 'foreground_set': False}
+
+	ret = {}
+
+	if style.props.foreground_set:
+		ret.update({'foreground_set': True, 'foreground': style.props.foreground})
+
+	if style.props.background_set:
+		ret.update({'background_set': True, 'background': style.props.background})
+
+	return ret
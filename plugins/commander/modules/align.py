@@ -2,46 +2,70 @@ import commander.commands as commands
 import commander.commands.completion
 import commander.commands.result
 import commander.commands.exceptions
+import commander.delimited as delimited
 
 import re
+import glib
 
 __commander_module__ = True
 
+# Selections with more lines are aligned by a background worker
+BACKGROUND_LINES = 10000
+
+TableDataName = 'CommanderModuleAlignTable'
+FieldsDataName = 'CommanderModuleAlignFields'
+
+# Key of the multi edit plugin's helper of a view
+MultiEditDataName = 'PlumaMultiEditPluginDocumentHelperKey'
+
+def _width(col, text, tabwidth):
+	# Display column after text, when text starts at display column col
+	if not '\t' in text:
+		return col + len(text)
+
+	# Tab stops only depend on the column within the tab width
+	offset = col % tabwidth
+	return col - offset + len((' ' * offset + text).expandtabs(tabwidth))
+
+def _spans(reg, line):
+	# Spans of each match and its groups
+	return [m.regs for m in reg.finditer(line)]
+
 class Line:
-	def __init__(self, line, reg, tabwidth):
+	def __init__(self, line, spans, group, add_ws_group, tabwidth):
 		self.tabwidth = tabwidth
 		self.line = line
-		self.matches = list(reg.finditer(line))
 
-		if not self.matches:
-			self.newline = str(line)
-		else:
-			self.newline = line[0:self.matches[0].start(0)]
-
-	def matches_len(self):
-		return len(self.matches)
+		# Display widths are only measured by expanding tabs in lines with tabs
+		# in their columns
+		self.tabs = False
 
-	def new_len(self, extra=''):
-		return len((self.newline + extra).expandtabs(self.tabwidth))
+		# Offsets of each match: its start, the start of 'add_ws_group', the
+		# start of 'add_ws_group' after its leading white space, the start of
+		# 'group' and the end of the rest of the line up to the next match
+		self.columns = []
 
-	def match(self, idx):
-		if idx >= self.matches_len():
-			return None
+		# Widths of each match up to 'group' without the white space which is
+		# replaced, and of the rest of the match, in lines without tabs
+		self.widths = []
 
-		return self.matches[idx]
+		# Number of spaces added to align each column
+		self.indents = []
 
-	def append(self, idx, num, group, add_ws_group):
-		m = self.match(idx)
-
-		if m == None:
+		if not spans:
+			self.width = _width(0, line, tabwidth)
 			return
 
-		if len(m.groups()) <= group - 1:
+		# Display width of the new line
+		self.width = _width(0, line[0:spans[0][0][0]], tabwidth)
+		nregs = len(spans[0])
+
+		if nregs <= group:
 			gidx = 0
 		else:
 			gidx = group
 
-		if len(m.groups()) <= add_ws_group - 1:
+		if nregs <= add_ws_group:
 			wsidx = 0
 		else:
 			wsidx = add_ws_group
@@ -49,35 +73,139 @@ class Line:
 		if wsidx > gidx:
 			wsidx = gidx
 
-		# First append leading match
-		wsg = m.group(wsidx)
-		numln = len(wsg) - len(wsg.lstrip())
+		ends = [regs[0][0] for regs in spans[1:]]
+		ends.append(len(line))
 
-		self.newline += self.line[m.start(0):m.start(wsidx)]
+		columns = self.columns
+		widths = self.widths
 
-		# Then do the indent until gidx is aligned with num
-		bridge = self.line[m.start(wsidx) + numln:m.start(gidx)]
+		for regs, end in zip(spans, ends):
+			start = regs[0][0]
+			wsstart, wsend = regs[wsidx]
+			gstart = regs[gidx][0]
 
-		if not '\t' in bridge:
-			bridge = (' ' * (num - self.new_len(bridge))) + bridge
-		else:
-			while self.new_len(bridge) < num:
-				bridge = ' ' + bridge
+			if gstart > wsstart:
+				wsg = line[wsstart:wsend]
+				bstart = min(wsstart + len(wsg) - len(wsg.lstrip()), gstart)
+			else:
+				bstart = gstart
+
+			columns.append((start, wsstart, bstart, gstart, end))
+			widths.append((wsstart - start + gstart - bstart, end - gstart))
+
+		# Tabs before the first match and in the white space which is replaced
+		# do not depend on where columns are aligned
+		if line.find('\t', columns[0][0]) != -1:
+			for start, wsstart, bstart, gstart, end in columns:
+				if '\t' in line[start:wsstart] or '\t' in line[bstart:end]:
+					self.tabs = True
+					break
+
+	def column(self, idx):
+		# The leading part of the match, the part up to 'group' without the
+		# white space at the start of 'add_ws_group', and the rest of the line
+		# up to the next match
+		if idx >= len(self.columns):
+			return None
+
+		start, wsstart, bstart, gstart, end = self.columns[idx]
+		return self.line[start:wsstart], self.line[bstart:gstart], self.line[gstart:end]
+
+	def cells(self):
+		# Widths of the text in between the columns, in lines without tabs. A
+		# column is aligned on the widest cell before it
+		ret = [self.width]
 
-		self.newline += bridge
+		for before, after in self.widths:
+			ret[-1] += before
+			ret.append(after)
 
-		# Then append the rest of the match
-		mnext = self.match(idx + 1)
+		return ret
+
+	def measure(self, idx):
+		# Display column where the column would be aligned
+		if idx >= len(self.columns):
+			return self.width
+
+		if not self.tabs:
+			return self.width + self.widths[idx][0]
+
+		lead, bridge, rest = self.column(idx)
+		return _width(self.width, lead + bridge, self.tabwidth)
+
+	def append(self, idx, num):
+		if idx >= len(self.columns):
+			return
 
-		if mnext == None:
-			endidx = None
+		if not self.tabs:
+			# The leading match, the indent until gidx is aligned with num
+			# and the rest of the match
+			before, after = self.widths[idx]
+			indent = max(num - self.width - before, 0)
+
+			self.width += before + indent + after
 		else:
-			endidx = mnext.start(0)
+			lead, bridge, rest = self.column(idx)
+
+			width = _width(self.width, lead, self.tabwidth)
+			indent = 0
+
+			while _width(width, ' ' * indent + bridge, self.tabwidth) < num:
+				indent += 1
+
+			width = _width(width, ' ' * indent + bridge, self.tabwidth)
+			self.width = _width(width, rest, self.tabwidth)
+
+		self.indents.append(indent)
+
+	def edit(self, minimal=True):
+		# The (start, end, text) replacing the part of the line which changes,
+		# or None when the line does not change. Unless minimal, the part from
+		# the first to the last change is replaced
+		line = self.line
+		changes = []
+
+		for idx in xrange(len(self.indents)):
+			start, wsstart, bstart, gstart, end = self.columns[idx]
+			indent = self.indents[idx]
+
+			if gstart == wsstart:
+				# Only the indent is inserted
+				if indent:
+					changes.append((wsstart, wsstart, u' ' * indent))
+
+				continue
+
+			# The text between the leading match and the rest of the match is
+			# replaced by the indent and the part up to 'group'
+			text = u' ' * indent + line[bstart:gstart] + line[gstart:wsstart]
 
-		self.newline += self.line[m.start(gidx):endidx]
+			if line[wsstart:max(wsstart, gstart)] != text:
+				changes.append((wsstart, max(wsstart, gstart), text))
 
-	def __str__(self):
-		return self.newline
+		if not changes:
+			return None
+
+		start = changes[0][0]
+		end = changes[-1][1]
+
+		parts = []
+		last = start
+
+		for cstart, cend, text in changes:
+			parts.append(line[last:cstart])
+			parts.append(text)
+			last = cend
+
+		# A single insertion is as small as it gets
+		if len(changes) == 1 and start == end:
+			return start, end, parts[1]
+
+		if not minimal:
+			return start, end, u''.join(parts)
+
+		dstart, dend, text = _diff(line[start:end], u''.join(parts))
+		return start + dstart, start + dend, text
 
 def __default__(view):
 	"""Align selected text in columns: align
@@ -85,45 +213,413 @@ def __default__(view):
 Align the selected text in columns separated by white space (spaces and tabs)"""
 	yield regex(view, '\s+')
 
-def _find_max_align(lines, idx, group, add_ws_group):
+def _find_max_align(lines, idx):
 	num = 0
-	spaces = re.compile('^\s*')
 
-	# We will align on 'group', by adding spaces to 'add_ws_group'
+	# Measure where each line would put the column
 	for line in lines:
-		m = line.match(idx)
+		if line.tabs or idx >= len(line.columns):
+			l = line.measure(idx)
+		else:
+			l = line.width + line.widths[idx][0]
 
-		if m != None:
-			if len(m.groups()) <= group - 1:
-				gidx = 0
-			else:
-				gidx = group
+		if l > num:
+			num = l
 
-			if len(m.groups()) <= add_ws_group - 1:
-				wsidx = 0
-			else:
-				wsidx = add_ws_group
+	return num
+
+def _diff(old, new):
+	# The smallest (start, end, text) replacing a part of old gives new, by
+	# bisecting the length of the common prefix and suffix
+	n = min(len(old), len(new))
+
+	lo = 0
+	hi = n
 
-			if wsidx > gidx:
-				wsidx = gidx
+	while lo < hi:
+		mid = (lo + hi + 1) / 2
 
-			wsg = m.group(wsidx)
+		if old[:mid] == new[:mid]:
+			lo = mid
+		else:
+			hi = mid - 1
+
+	start = lo
+	hi = n - start
 
-			numln = len(wsg) - len(wsg.lstrip())
+	lo = 0
 
-			# until the start
-			extra = line.line[m.start(0):m.start(wsidx)]
-			extra += line.line[m.start(wsidx) + numln:m.start(gidx)]
+	while lo < hi:
+		mid = (lo + hi + 1) / 2
 
-			# Measure where to align it
-			l = line.new_len(extra)
+		if old[len(old) - mid:] == new[len(new) - mid:]:
+			lo = mid
 		else:
-			l = line.new_len()
+			hi = mid - 1
 
-		if l > num:
-			num = l
+	return start, len(old) - lo, new[start:len(new) - lo]
 
-	return num
+def _align_lines(newlines, additional_ws, progress=None):
+	# Returns (index, start, end, text) edits of the lines which change
+	num = 0
+
+	for ln in newlines:
+		if len(ln.columns) > num:
+			num = len(ln.columns)
+
+	for i in range(num):
+		al = _find_max_align(newlines, i) + additional_ws
+
+		for line in newlines:
+			if i >= len(line.columns):
+				continue
+
+			if line.tabs:
+				line.append(i, al)
+				continue
+
+			# Like append, without the method calls
+			before, after = line.widths[i]
+			indent = al - line.width - before
+
+			if indent < 0:
+				indent = 0
+
+			line.width += before + indent + after
+			line.indents.append(indent)
+
+		if progress:
+			progress(float(i + 1) / num)
+
+	edits = []
+
+	for i in xrange(len(newlines)):
+		edit = newlines[i].edit(False)
+
+		if edit != None:
+			edits.append((i,) + edit)
+
+	# Lines which are changed one by one are changed as little as possible
+	if edits and not _dense(edits):
+		edits = [(x[0],) + newlines[x[0]].edit() for x in edits]
+
+	return edits
+
+def _align(lines, reg, group, additional_ws, add_ws_group, tabwidth, progress=None):
+	# Returns (line, start, end, text) edits of the lines which change
+	newlines = [Line(line, _spans(reg, line), group, add_ws_group, tabwidth) for line in lines]
+	return _align_lines(newlines, additional_ws, progress)
+
+def _dense(edits):
+	# Whether most lines from the first to the last edited line change
+	return len(edits) * 2 > edits[-1][0] - edits[0][0] + 1
+
+def _apply(buf, first, edits):
+	# Lines only change within themselves, so edits can be made in any order
+	for line, start, end, text in edits:
+		piter = buf.get_iter_at_line(first + line)
+		piter.set_line_offset(start)
+
+		if end > start:
+			enditer = piter.copy()
+			enditer.set_line_offset(end)
+
+			buf.delete(piter, enditer)
+
+		if text:
+			buf.insert(piter, text)
+
+def _replace(buf, first, last, edits):
+	# Replaces the lines first to last by their changed text at once
+	start = buf.get_iter_at_line(first)
+	end = buf.get_iter_at_line(last)
+
+	if not end.ends_line():
+		end.forward_to_line_end()
+
+	# Lines keep their terminators, edits are within the lines
+	lines = start.get_text(end).decode('utf-8').split('\n')
+
+	for line, estart, eend, text in edits:
+		lines[line] = lines[line][:estart] + text + lines[line][eend:]
+
+	buf.delete(start, end)
+	buf.insert(start, u'\n'.join(lines))
+
+def _change(view, first, edits):
+	# Changes the lines in one user action. When most lines change, they are
+	# replaced at once, which is cheaper than changing them one by one
+	if not edits:
+		return
+
+	buf = view.get_buffer()
+
+	lo = edits[0][0]
+	hi = edits[-1][0]
+
+	buf.begin_user_action()
+
+	try:
+		if _dense(edits):
+			_replace(buf, first + lo, first + hi, [(x[0] - lo,) + x[1:] for x in edits])
+		else:
+			_apply(buf, first, edits)
+	finally:
+		buf.end_user_action()
+
+class _Table:
+	# Keeps a range of lines aligned while it is edited. For each column the
+	# widths of its cells are counted, so that a column is only aligned again
+	# when its widest cell changes. Otherwise only the edited lines are padded
+	# again. Lines with tabs in their columns are aligned as a whole
+	def __init__(self, view, start, end, reg, group, additional_ws, add_ws_group):
+		self.view = view
+		self.reg = reg
+		self.group = group
+		self.additional_ws = additional_ws
+		self.add_ws_group = add_ws_group
+
+		buf = view.get_buffer()
+
+		if not start.starts_line():
+			start.set_line_offset(0)
+
+		if not end.ends_line():
+			end.forward_to_line_end()
+
+		self._start = buf.create_mark(None, start, True)
+		self._end = buf.create_mark(None, end, False)
+
+		# Line for each row, None for rows which were edited
+		self.rows = []
+		self._dirty = set()
+		self._rebuild = False
+
+		# For each column, the number of cells of each width
+		self.counts = []
+		self.aligns = []
+		self.tabs = 0
+
+		self._edit = None
+		self._updating = False
+		self._idle_id = 0
+
+		self._handlers = [
+			buf.connect('insert-text', self.on_insert_text),
+			buf.connect_after('insert-text', self.on_inserted_text),
+			buf.connect('delete-range', self.on_delete_range),
+			buf.connect_after('delete-range', self.on_deleted_range)
+		]
+
+		self.update(True)
+
+	def remove(self):
+		buf = self.view.get_buffer()
+
+		for handler in self._handlers:
+			buf.disconnect(handler)
+
+		self._handlers = []
+
+		if self._idle_id:
+			glib.source_remove(self._idle_id)
+			self._idle_id = 0
+
+		buf.delete_mark(self._start)
+		buf.delete_mark(self._end)
+
+	def _first(self):
+		return self.view.get_buffer().get_iter_at_mark(self._start).get_line()
+
+	def _get_line(self, line):
+		start = self.view.get_buffer().get_iter_at_line(line)
+		end = start.copy()
+
+		if not end.ends_line():
+			end.forward_to_line_end()
+
+		return _get_lines(start, end)[0]
+
+	def _add(self, idx, line):
+		if line.tabs:
+			self.tabs += 1
+
+		cells = line.cells()
+
+		while len(self.counts) < len(cells):
+			self.counts.append({})
+
+		for i in xrange(len(cells)):
+			counts = self.counts[i]
+			counts[cells[i]] = counts.get(cells[i], 0) + 1
+
+		self.rows[idx] = line
+
+	def _remove(self, idx):
+		line = self.rows[idx]
+
+		if line == None:
+			return
+
+		if line.tabs:
+			self.tabs -= 1
+
+		cells = line.cells()
+
+		for i in xrange(len(cells)):
+			counts = self.counts[i]
+			counts[cells[i]] -= 1
+
+			if counts[cells[i]] == 0:
+				del counts[cells[i]]
+
+		self.rows[idx] = None
+
+	def on_insert_text(self, buf, location, text, length):
+		self._edit = (self._first(), location.get_line())
+
+	def on_inserted_text(self, buf, location, text, length):
+		first, line = self._edit
+		self._edited(line - first, line - first, location.get_line() - first)
+
+	def on_delete_range(self, buf, start, end):
+		self._edit = (self._first(), start.get_line(), end.get_line())
+
+	def on_deleted_range(self, buf, start, end):
+		first, line, last = self._edit
+		self._edited(line - first, last - first, line - first)
+
+	def _edited(self, first, last, newlast):
+		# Rows first to last were replaced by rows first to newlast
+		if self._updating or last < 0 or first >= len(self.rows):
+			return
+
+		if first < 0 or last >= len(self.rows):
+			# Edits across the borders of the table change it as a whole
+			self._rebuild = True
+		else:
+			for idx in xrange(first, last + 1):
+				self._remove(idx)
+
+			self.rows[first:last + 1] = [None] * (newlast - first + 1)
+
+			# Rows after the edited rows moved
+			dirty = set(xrange(first, newlast + 1))
+
+			for idx in self._dirty:
+				if idx < first:
+					dirty.add(idx)
+				elif idx > last:
+					dirty.add(idx + newlast - last)
+
+			self._dirty = dirty
+
+		if not self._idle_id:
+			self._idle_id = glib.idle_add(self.on_idle)
+
+	def on_idle(self):
+		self._idle_id = 0
+		self.update()
+
+		return False
+
+	def update(self, force=False):
+		buf = self.view.get_buffer()
+		tabwidth = self.view.get_tab_width()
+
+		first = self._first()
+		last = buf.get_iter_at_mark(self._end).get_line()
+
+		if force or self._rebuild or last - first + 1 != len(self.rows):
+			dirty = range(last - first + 1)
+
+			self.rows = [None] * len(dirty)
+			self.counts = []
+			self.tabs = 0
+
+			end = buf.get_iter_at_mark(self._end)
+
+			if not end.ends_line():
+				end.forward_to_line_end()
+
+			lines = _get_lines(buf.get_iter_at_line(first), end)
+		else:
+			dirty = sorted(self._dirty)
+			lines = [self._get_line(first + idx) for idx in dirty]
+
+		self._dirty = set()
+		self._rebuild = False
+
+		for idx, line in zip(dirty, lines):
+			self._add(idx, Line(line, _spans(self.reg, line), self.group, self.add_ws_group, tabwidth))
+
+		aligns = [max(counts.keys() or [0]) for counts in self.counts]
+
+		if self.tabs:
+			edits = _align([line.line for line in self.rows], self.reg, self.group, self.additional_ws, self.add_ws_group, tabwidth)
+		else:
+			# Columns which are aligned differently are padded again in all
+			# rows, other columns only in the edited rows
+			changed = [i for i in xrange(len(aligns)) if i >= len(self.aligns) or aligns[i] != self.aligns[i]]
+
+			if changed:
+				dirty = set(dirty)
+				pad = [idx for idx in xrange(len(self.rows)) if idx in dirty or len(self.rows[idx].columns) > changed[0]]
+			else:
+				pad = dirty
+
+			edits = []
+
+			for idx in pad:
+				line = self.rows[idx]
+				cells = line.cells()
+
+				line.indents = [aligns[i] + self.additional_ws - cells[i] for i in xrange(len(line.columns))]
+				edit = line.edit()
+
+				if edit != None:
+					edits.append((idx,) + edit)
+
+		self.aligns = aligns
+
+		if not edits:
+			return
+
+		self._updating = True
+		buf.begin_user_action()
+
+		try:
+			_apply(buf, first, edits)
+		finally:
+			buf.end_user_action()
+			self._updating = False
+
+		# Padded rows keep their cells, but not their offsets
+		for edit in edits:
+			idx = edit[0]
+			line = self._get_line(first + idx)
+
+			self._remove(idx)
+			self._add(idx, Line(line, _spans(self.reg, line), self.group, self.add_ws_group, tabwidth))
+
+def _set_table(view, table):
+	buf = view.get_buffer()
+	old = buf.get_data(TableDataName)
+
+	if old:
+		old.remove()
+
+	buf.set_data(TableDataName, table)
+
+def _get_lines(start, end):
+	# Lines are split like the buffer does, without line terminators
+	lines = start.get_text(end).decode('utf-8').split('\n')
+
+	for i in xrange(len(lines)):
+		if lines[i].endswith('\r'):
+			lines[i] = lines[i][:-1]
+
+	return lines
 
 def _regex(view, reg, group, additional_ws, add_ws_group, flags=0):
 	buf = view.get_buffer()
@@ -176,31 +672,28 @@ def _regex(view, reg, group, additional_ws, add_ws_group, flags=0):
 	if not end.ends_line():
 		end.forward_to_line_end()
 
-	lines = start.get_text(end).splitlines()
-	newlines = []
-	num = 0
+	lines = _get_lines(start, end)
 	tabwidth = view.get_tab_width()
+	startmark = buf.create_mark(None, start, True)
 
-	for line in lines:
-		ln = Line(line, reg, tabwidth)
-		newlines.append(ln)
-
-		if len(ln.matches) > num:
-			num = len(ln.matches)
-
-	for i in range(num):
-		al = _find_max_align(newlines, i, group, add_ws_group)
+	try:
+		if len(lines) > BACKGROUND_LINES:
+			# Keep the text as it is while it is being aligned
+			view.set_editable(False)
+			job = commander.commands.result.Background(_align, lines, reg, group, additional_ws, add_ws_group, tabwidth)
 
-		for line in newlines:
-			line.append(i, al + additional_ws, group, add_ws_group)
+			try:
+				yield job
+			finally:
+				view.set_editable(True)
 
-	# Replace lines
-	aligned = '\n'.join([str(x) for x in newlines])
+			edits = job.get()
+		else:
+			edits = _align(lines, reg, group, additional_ws, add_ws_group, tabwidth)
 
-	buf.begin_user_action()
-	buf.delete(bounds[0], bounds[1])
-	buf.insert(bounds[1], aligned)
-	buf.end_user_action()
+		_change(view, buf.get_iter_at_mark(startmark).get_line(), edits)
+	finally:
+		buf.delete_mark(startmark)
 
 	yield commander.commands.result.DONE
 
@@ -229,3 +722,399 @@ be used to add additional whitespace to the column separation.
 The regular expression will be matched in case-insensitive mode"""
 
 	yield _regex(view, reg, group, additional_ws, add_ws_group, re.IGNORECASE)
+
+def table(view, reg='(?<=\\S)(\\s+)(\\S)', group=2, additional_ws=1, add_ws_group=1):
+	"""Align selected lines as a table: align.table [&lt;regex&gt;] [&lt;group&gt;] [&lt;ws&gt;]
+
+Align the selected lines in columns like align.regex does, and keep them
+aligned while they are edited. By default, columns are separated by white space
+after the first non white space character of each line, which is replaced to
+align the columns. Use align.table-clear to stop keeping the lines aligned."""
+
+	buf = view.get_buffer()
+	bounds = buf.get_selection_bounds()
+
+	if not bounds or (bounds[1].get_line() - bounds[0].get_line() == 0):
+		raise commander.commands.exceptions.Execute('You need to select a number of lines to align')
+
+	try:
+		reg = re.compile(reg)
+	except Exception, e:
+		raise commander.commands.exceptions.Execute('Failed to compile regular expression: %s' % (e,))
+
+	try:
+		group = int(group)
+		additional_ws = int(additional_ws)
+		add_ws_group = int(add_ws_group)
+	except ValueError:
+		raise commander.commands.exceptions.Execute('Groups and white space should be numbers')
+
+	if add_ws_group < 0:
+		add_ws_group = group
+
+	# The lines of a previous table are not followed while aligning
+	_set_table(view, None)
+	_set_table(view, _Table(view, bounds[0], bounds[1], reg, group, additional_ws, add_ws_group))
+
+	return commander.commands.result.DONE
+
+def table_clear(view):
+	"""Stop aligning table: align.table-clear
+
+Stop keeping the lines aligned by align.table aligned while they are edited."""
+
+	_set_table(view, None)
+	return commander.commands.result.DONE
+
+def _get_fields(view, delimiter=None):
+	# The fields of the document are tokenized once, and kept current while
+	# it is edited
+	buf = view.get_buffer()
+	fields = buf.get_data(FieldsDataName)
+
+	if delimiter != None:
+		# Delimiters like \t can be given escaped
+		delimiter = delimiter.decode('string_escape').decode('utf-8')
+
+		if len(delimiter) != 1:
+			raise commander.commands.exceptions.Execute('The delimiter should be a single character')
+	elif fields:
+		return fields
+	else:
+		start = buf.get_start_iter()
+		end = start.copy()
+
+		if not end.ends_line():
+			end.forward_to_line_end()
+
+		delimiter = delimited.detect(start.get_text(end).decode('utf-8'))
+
+	if fields and fields.delimiter == delimiter:
+		return fields
+
+	if fields:
+		fields.remove()
+
+	fields = delimited.Fields(buf, delimiter)
+	buf.set_data(FieldsDataName, fields)
+
+	return fields
+
+def _records(view, fields, header=False):
+	# The records on the selected lines, or all records. Without a selection
+	# the first record is left out as a header when header is set
+	buf = view.get_buffer()
+	bounds = buf.get_selection_bounds()
+
+	if bounds:
+		first = bounds[0].get_line()
+		last = bounds[1].get_line()
+
+		if last > first and bounds[1].starts_line():
+			last -= 1
+
+		return fields.between(first, last)
+
+	lo, hi = fields.between(0, buf.get_line_count() - 1)
+
+	if header:
+		lo = min(lo + 1, hi)
+
+	return lo, hi
+
+def _record_offsets(fields, lo, hi):
+	# Offsets of the records lo to hi, relative to the first
+	ret = []
+	offset = 0
+
+	for i in xrange(lo, hi):
+		ret.append(offset)
+		offset += fields.sizes[i]
+
+	return ret, offset
+
+def _record_text(buf, fields, lo, hi):
+	start = buf.get_iter_at_line(fields.starts[lo])
+	offsets, size = _record_offsets(fields, lo, hi)
+
+	end = buf.get_iter_at_offset(start.get_offset() + size)
+	return start, start.get_text(end).decode('utf-8'), offsets
+
+def _get_column(column):
+	try:
+		column = int(column)
+	except ValueError:
+		column = 0
+
+	if column < 1:
+		raise commander.commands.exceptions.Execute('Columns are numbered from 1')
+
+	return column - 1
+
+def _values(fields, text, offsets, lo, column):
+	# The values in column of the records lo to lo + len(offsets), None for
+	# records without the column
+	ret = []
+
+	for i in xrange(len(offsets)):
+		spans = fields.fields[lo + i]
+
+		if column < len(spans):
+			start, end = spans[column]
+			ret.append(delimited.value(text[offsets[i] + start:offsets[i] + end]))
+		else:
+			ret.append(None)
+
+	return ret
+
+def _numbers(values):
+	# Numeric values, and the number of values which are not numeric
+	ret = []
+	skipped = 0
+
+	for value in values:
+		if not value:
+			continue
+
+		try:
+			ret.append(float(value))
+		except ValueError:
+			skipped += 1
+
+	return ret, skipped
+
+def _terminator(text):
+	if text.endswith(u'\r\n'):
+		return u'\r\n'
+	elif text.endswith(u'\n') or text.endswith(u'\r'):
+		return text[-1]
+	else:
+		return u''
+
+def csv(view, delimiter=None):
+	"""Align delimited text in columns: align.csv [&lt;delimiter&gt;]
+
+Align the selected records of delimited text, or all records when nothing is
+selected, by padding each field with spaces after its delimiter. Quoted fields
+can contain the delimiter. Records spanning more than one line are not
+aligned. When no delimiter is given, it is guessed from the first line."""
+
+	fields = _get_fields(view, delimiter)
+	lo, hi = _records(view, fields)
+
+	if lo == hi:
+		raise commander.commands.exceptions.Execute('There are no records to align')
+
+	buf = view.get_buffer()
+	start, text, offsets = _record_text(buf, fields, lo, hi)
+	tabwidth = view.get_tab_width()
+
+	rows = []
+	newlines = []
+
+	for i in xrange(lo, hi):
+		offset = offsets[i - lo]
+		line = text[offset:offset + fields.sizes[i]]
+		line = line[:len(line) - len(_terminator(line))]
+
+		if u'\n' in line or u'\r' in line:
+			continue
+
+		# The delimiter and the blanks around it separate the fields. The
+		# blanks after the delimiter are replaced to align the fields
+		spans = fields.fields[i]
+		separators = []
+
+		for j in xrange(1, len(spans)):
+			pos = line.index(fields.delimiter, spans[j - 1][1]) + 1
+			separators.append(((spans[j - 1][1], spans[j][0]), (pos, spans[j][0]), (spans[j][0], spans[j][0])))
+
+		rows.append(fields.starts[i])
+		newlines.append(Line(line, separators, 2, 1, tabwidth))
+
+	# Tabs already separate fields
+	if fields.delimiter == u'\t':
+		additional_ws = 0
+	else:
+		additional_ws = 1
+
+	edits = [(rows[x[0]],) + x[1:] for x in _align_lines(newlines, additional_ws)]
+
+	_change(view, 0, edits)
+	return commander.commands.result.DONE
+
+def column_select(view, entry, column, delimiter=None):
+	"""Select a column of delimited text: align.column-select &lt;column&gt; [&lt;delimiter&gt;]
+
+Add a multi edit point at the start of the field in &lt;column&gt; of each of the
+selected records, or of all records when nothing is selected. This needs the
+multi edit plugin."""
+
+	add_edit_points = getattr(view.get_data(MultiEditDataName), 'add_edit_points', None)
+
+	if add_edit_points == None:
+		entry.info_show('<i>Selecting columns needs the multi edit plugin</i>', True)
+		return commander.commands.result.DONE
+
+	column = _get_column(column)
+	fields = _get_fields(view, delimiter)
+	lo, hi = _records(view, fields)
+
+	if lo == hi:
+		raise commander.commands.exceptions.Execute('There are no records to select')
+
+	buf = view.get_buffer()
+	start = buf.get_iter_at_line(fields.starts[lo]).get_offset()
+	offsets, size = _record_offsets(fields, lo, hi)
+
+	points = []
+
+	for i in xrange(lo, hi):
+		spans = fields.fields[i]
+
+		if column < len(spans):
+			points.append(start + offsets[i - lo] + spans[column][0])
+
+	add_edit_points([buf.get_iter_at_offset(x) for x in points])
+
+	return commander.commands.result.DONE
+
+def column_sort(view, column, delimiter=None):
+	"""Sort delimited text by a column: align.column-sort &lt;column&gt; [&lt;delimiter&gt;]
+
+Sort the selected records of delimited text by the values in &lt;column&gt;, or
+all records but the first when nothing is selected. When all values in the
+column are numbers they are sorted numerically."""
+
+	column = _get_column(column)
+	fields = _get_fields(view, delimiter)
+	lo, hi = _records(view, fields, True)
+
+	if hi - lo < 2:
+		raise commander.commands.exceptions.Execute('There are no records to sort')
+
+	buf = view.get_buffer()
+	start, text, offsets = _record_text(buf, fields, lo, hi)
+
+	values = _values(fields, text, offsets, lo, column)
+	numbers, skipped = _numbers(values)
+
+	records = []
+	terminators = []
+
+	for i in xrange(len(offsets)):
+		record = text[offsets[i]:offsets[i] + fields.sizes[lo + i]]
+		terminator = _terminator(record)
+
+		records.append(record[:len(record) - len(terminator)])
+		terminators.append(terminator)
+
+	# Records without the column are sorted last
+	if skipped == 0:
+		keys = [value and (0, float(value)) or (1, 0) for value in values]
+	else:
+		keys = [value != None and (0, value) or (1, u'') for value in values]
+
+	order = range(len(records))
+	order.sort(key=lambda x: keys[x])
+
+	newtext = u''.join([records[order[i]] + terminators[i] for i in xrange(len(order))])
+
+	if newtext != text:
+		end = buf.get_iter_at_offset(start.get_offset() + len(text))
+
+		buf.begin_user_action()
+		buf.delete(start, end)
+		buf.insert(start, newtext)
+		buf.end_user_action()
+
+	return commander.commands.result.DONE
+
+def _sum(view, entry, column, delimiter, average):
+	column = _get_column(column)
+	fields = _get_fields(view, delimiter)
+	lo, hi = _records(view, fields)
+
+	if lo == hi:
+		raise commander.commands.exceptions.Execute('There are no records')
+
+	start, text, offsets = _record_text(view.get_buffer(), fields, lo, hi)
+	numbers, skipped = _numbers(_values(fields, text, offsets, lo, column))
+
+	if not numbers:
+		entry.info_show('<i>No numbers in column %d</i>' % (column + 1,), True)
+		return commander.commands.result.DONE
+
+	if average:
+		ret = '<b>Average</b> of column %d: <b>%.12g</b>' % (column + 1, sum(numbers) / len(numbers))
+	else:
+		ret = '<b>Sum</b> of column %d: <b>%.12g</b>' % (column + 1, sum(numbers))
+
+	ret += '\n<i>%d numbers' % (len(numbers),)
+
+	if skipped:
+		ret += ', %d skipped' % (skipped,)
+
+	entry.info_show(ret + '</i>', True)
+	return commander.commands.result.DONE
+
+def column_sum(view, entry, column, delimiter=None):
+	"""Sum a column of delimited text: align.column-sum &lt;column&gt; [&lt;delimiter&gt;]
+
+Show the sum of the numbers in &lt;column&gt; of the selected records of delimited
+text, or of all records when nothing is selected."""
+
+	return _sum(view, entry, column, delimiter, False)
+
+def column_average(view, entry, column, delimiter=None):
+	"""Average a column of delimited text: align.column-average &lt;column&gt; [&lt;delimiter&gt;]
+
+Show the average of the numbers in &lt;column&gt; of the selected records of
+delimited text, or of all records when nothing is selected."""
+
+	return _sum(view, entry, column, delimiter, True)
+
+def column_delete(view, column, delimiter=None):
+	"""Delete a column of delimited text: align.column-delete &lt;column&gt; [&lt;delimiter&gt;]
+
+Delete the field in &lt;column&gt; of each of the selected records of delimited
+text, or of all records when nothing is selected, together with its
+delimiter."""
+
+	column = _get_column(column)
+	fields = _get_fields(view, delimiter)
+	lo, hi = _records(view, fields)
+
+	if lo == hi:
+		raise commander.commands.exceptions.Execute('There are no records')
+
+	buf = view.get_buffer()
+	start = buf.get_iter_at_line(fields.starts[lo]).get_offset()
+	offsets, size = _record_offsets(fields, lo, hi)
+
+	deletes = []
+
+	for i in xrange(lo, hi):
+		spans = fields.fields[i]
+		offset = start + offsets[i - lo]
+
+		if column >= len(spans):
+			continue
+
+		if len(spans) == 1:
+			deletes.append((offset + spans[0][0], offset + spans[0][1]))
+		elif column > 0:
+			deletes.append((offset + spans[column - 1][1], offset + spans[column][1]))
+		else:
+			deletes.append((offset + spans[0][0], offset + spans[1][0]))
+
+	# From the bottom up, so the offsets of the other fields do not change
+	buf.begin_user_action()
+
+	for dstart, dend in reversed(deletes):
+		if dend > dstart:
+			buf.delete(buf.get_iter_at_offset(dstart), buf.get_iter_at_offset(dend))
+
+	buf.end_user_action()
+
+	return commander.commands.result.DONE
@@ -12,6 +12,8 @@ import commander.commands as commands
 import commander.commands.completion
 import commander.commands.result
 import commander.commands.exceptions
+import commander.commands.method
+import commander.commands.module
 
 __commander_module__ = True
 
@@ -152,11 +154,23 @@ def _resume_command(view, mod, parts):
 
 	return _resume_command(view, mod.__dict__[func], parts[1:])
 
-@commands.autocomplete(name=commander.commands.completion.command)
+@commands.autocomplete(name=commander.commands.completion.fuzzy_command)
 def command(view, name):
 	"""Edit commander command: edit.command &lt;command&gt;"""
 	parts = name.split('.')
 
+	# Commands of modules which were not used yet are not imported yet
+	res = commander.commands.completion.command([name], 0)
+
+	if res:
+		mod = res[0][0]
+
+		while isinstance(mod.parent, commander.commands.method.Method):
+			mod = mod.parent
+
+		if isinstance(mod, commander.commands.module.Module):
+			commands.Commands().load_module(mod)
+
 	for mod in sys.modules:
 		if commands.is_commander_module(sys.modules[mod]) and (mod == parts[0] or _mod_has_alias(sys.modules[mod], parts[0])):
 			if mod == parts[0]:
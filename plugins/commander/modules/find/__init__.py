@@ -1,9 +1,12 @@
 import commander.commands as commands
+import commander.utils as utils
 import pluma
 import re
 import regex
 from xml.sax import saxutils
 import finder
+import files
+import rename
 
 __commander_module__ = True
 __root__ = ['/', 'find_i', '//', 'r/', 'r//']
@@ -27,6 +30,27 @@ class TextFinder(finder.Finder):
 		else:
 			return False
 
+	def _findre(self):
+		flags = re.UNICODE
+
+		if not self.flags & pluma.SEARCH_CASE_SENSITIVE:
+			flags |= re.IGNORECASE
+
+		return re.compile(re.escape(self.get_find().decode('utf-8')), flags)
+
+	def find_all(self, text):
+		if self.flags & pluma.SEARCH_ENTIRE_WORD:
+			return None
+
+		replacestr = self.replacestr.decode('utf-8')
+		return [(m.start(), m.end(), replacestr) for m in self._findre().finditer(text)]
+
+	def find_offsets(self, text):
+		if self.flags & pluma.SEARCH_ENTIRE_WORD:
+			return None
+
+		return [m.span() for m in self._findre().finditer(text)]
+
 def __default__(entry, argstr):
 	"""Find in document: find &lt;text&gt;
 
@@ -41,6 +65,13 @@ Quickly find phrases in the document (case insensitive)"""
 	fd = TextFinder(entry, 0)
 	yield fd.find(argstr)
 
+def previous(entry, argstr):
+	"""Find previous in document: find.previous &lt;text&gt;
+
+Quickly find phrases in the document, searching backwards from the cursor"""
+	fd = TextFinder(entry, pluma.SEARCH_CASE_SENSITIVE)
+	yield fd.find(argstr, True)
+
 def replace(entry, findstr, replstr=None):
 	"""Find/replace in document: find.replace &lt;find&gt; [&lt;replace&gt;]
 
@@ -69,6 +100,52 @@ Quickly find and replace all phrases in the document (case insensitive)"""
 	fd = TextFinder(entry,0)
 	yield fd.replace(findstr, True, replstr)
 
+def replace_files(view, entry, window, findre, replstr, glob='*'):
+	"""Find/replace regex in files: find.replace-files &lt;regex&gt; &lt;replace&gt; [&lt;glob&gt;]
+
+Replace the matches of a regular expression in all open documents, and in the
+files (matching &lt;glob&gt;) below the directory of the current document, or the
+working directory for new documents. The home directory and the file system
+root are not searched. The changes are previewed first, and only made when
+confirmed. Either all documents and files are changed, or none. Open documents
+can be undone in one step."""
+	yield files.replace(view, entry, window, findre, replstr, glob, re.UNICODE | re.MULTILINE | re.DOTALL)
+
+def _rename(entry, docs, argstr, root):
+	renames = rename.RenameMap(rename.read_pairs(argstr, root))
+
+	num = 0
+	changed = 0
+
+	for doc in docs:
+		ret = renames.apply(doc)
+
+		if ret:
+			num += ret
+			changed += 1
+
+	if num == 0:
+		entry.info_show('<i>No identifiers found</i>', True)
+	else:
+		entry.info_show('<i>Renamed %d identifiers in %d documents</i>' % (num, changed), True)
+
+	return commands.result.DONE
+
+def rename_map(view, entry, argstr):
+	"""Rename identifiers in document: find.rename-map &lt;file or old=new pairs&gt;
+
+Rename a number of identifiers at once, in all their variants (snake_case,
+TitleCase, UPPER_CASE), keeping the case of each occurrence. The pairs of old
+and new names (given as snake_case or TitleCase) can be given as old=new
+separated by spaces or commas, or in a file with a pair per line."""
+	return _rename(entry, [view.get_buffer()], argstr, utils.document_root(view))
+
+def rename_map_documents(view, entry, window, argstr):
+	"""Rename identifiers in all documents: find.rename-map-documents &lt;file or old=new pairs&gt;
+
+Like find.rename-map, but renames the identifiers in all open documents."""
+	return _rename(entry, window.get_documents(), argstr, utils.document_root(view))
+
 locals()['/'] = __default__
 locals()['find_i'] = _find_insensitive
 locals()['//'] = replace
@@ -0,0 +1,318 @@
+import os
+import re
+import stat
+import tempfile
+import gio
+import pluma
+
+from xml.sax import saxutils
+
+import commander.commands as commands
+import commander.commands.result
+import commander.commands.exceptions
+import commander.trigramindex as trigramindex
+import commander.utils as utils
+import finder
+
+# Number of changed lines shown in the preview of each file
+MAX_PREVIEW_LINES = 5
+MAX_LINE_LENGTH = 200
+
+def snapshot(doc):
+	return doc.get_text(doc.get_start_iter(), doc.get_end_iter()).decode('utf-8')
+
+def _stamp(path):
+	st = os.stat(path)
+	return st.st_mtime, st.st_size
+
+def _preview(text, edits):
+	# Returns (line, old, new) for the first lines changed by edits
+	ret = []
+	i = 0
+
+	while i < len(edits) and len(ret) < MAX_PREVIEW_LINES:
+		start = text.rfind(u'\n', 0, edits[i][0]) + 1
+		end = text.find(u'\n', edits[i][0])
+
+		if end == -1:
+			end = len(text)
+
+		parts = []
+		last = start
+
+		while i < len(edits) and edits[i][0] <= end:
+			mstart, mend, repl = edits[i]
+
+			parts.append(text[last:mstart])
+			parts.append(repl)
+
+			last = mend
+			i += 1
+
+		parts.append(text[last:max(last, end)])
+
+		new = u''.join(parts).replace(u'\n', u'\\n')
+		ret.append((text.count(u'\n', 0, start) + 1, text[start:end][:MAX_LINE_LENGTH], new[:MAX_LINE_LENGTH]))
+
+	return ret
+
+def _apply(text, edits):
+	parts = []
+	last = 0
+
+	for mstart, mend, repl in edits:
+		parts.append(text[last:mstart])
+		parts.append(repl)
+		last = mend
+
+	parts.append(text[last:])
+	return u''.join(parts)
+
+class Replace:
+	# Finds and replaces the matches of a regular expression in the text of an
+	# open document or a file, in a pool worker. Items are previewed first,
+	# files are written to a temporary file next to them when applying
+	def __init__(self, regex, replacestr, flags):
+		self.regex = regex
+		self.replacestr = replacestr
+		self.flags = flags
+
+		self._reg = None
+
+	def edits(self, text):
+		if self._reg is None:
+			self._reg = re.compile(self.regex, self.flags)
+
+		return [(m.start(), m.end(), finder.expand(m, self.replacestr)) for m in self._reg.finditer(text)]
+
+	def preview(self, item):
+		idx, path, text = item
+		stamp = None
+
+		if text is None:
+			stamp = _stamp(path)
+			text = trigramindex.read_text(path)
+
+			# Skip binary files
+			if text is None:
+				return idx, [], None, stamp
+
+		edits = self.edits(text)
+
+		# Open documents are changed in the main process
+		if path is None:
+			return idx, _preview(text, edits), edits, stamp
+		else:
+			return idx, _preview(text, edits), len(edits), stamp
+
+	def write(self, item):
+		# The temporary file is created by the main process, which removes it
+		# when it is not used
+		idx, path, stamp, tmp = item
+
+		if _stamp(path) != stamp:
+			raise IOError('%s was changed after the preview' % (path,))
+
+		text, encoding = trigramindex.read(path)
+		data = _apply(text, self.edits(text)).encode(encoding)
+
+		f = open(tmp, 'wb')
+
+		try:
+			f.write(data)
+		finally:
+			f.close()
+
+		os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+		return idx, tmp
+
+class Results:
+	def __init__(self, entry, window, items):
+		self.entry = entry
+		self.window = window
+		self.items = items
+
+		self.files = 0
+		self.matches = 0
+
+		# idx -> (edits, None) of changed documents, (number of edits, stamp)
+		# of changed files
+		self.changes = {}
+
+	def on_result(self, result):
+		idx, preview, edits, stamp = result
+
+		if not preview:
+			return
+
+		if stamp is None:
+			num = len(edits)
+		else:
+			num = edits
+
+		self.changes[idx] = (edits, stamp)
+		self.files += 1
+		self.matches += num
+
+		name = saxutils.escape(self.items[idx][0])
+		header = u'<b>%s</b>: %d %s' % (name, num, num == 1 and 'match' or 'matches')
+
+		self.entry.info_add_link(header.encode('utf-8'), self.on_activate, (idx, preview[0][0]), True)
+
+		for lineno, old, new in preview:
+			lines = [u'<tt>-%5d</tt>  %s' % (lineno, saxutils.escape(old)),
+			         u'<tt>+%5d</tt>  %s' % (lineno, saxutils.escape(new))]
+
+			for line in lines:
+				self.entry.info_add_link(line.encode('utf-8'), self.on_activate, (idx, lineno), True)
+
+	def on_activate(self, data):
+		idx, lineno = data
+		name, path, doc = self.items[idx]
+
+		if doc:
+			tab = pluma.tab_get_from_document(doc)
+			self.window.set_active_tab(tab)
+
+			doc.goto_line(lineno - 1)
+			tab.get_view().scroll_to_cursor()
+		else:
+			pluma.commands.load_uri(self.window, gio.File(path).get_uri(), None, lineno)
+
+def _remove(paths):
+	for path in paths:
+		try:
+			os.unlink(path)
+		except OSError:
+			pass
+
+def replace(view, entry, window, regex, replacestr, glob, flags):
+	regex = regex.decode('utf-8')
+	replacestr = replacestr.decode('utf-8')
+
+	try:
+		re.compile(regex, flags)
+	except Exception, e:
+		raise commands.exceptions.Execute('Invalid regular expression: ' + str(e))
+
+	top = utils.search_root(view)
+	replacer = Replace(regex, replacestr, flags)
+
+	# Open documents are changed in their current state
+	items = []
+	texts = []
+	snapshots = {}
+	opened = set()
+
+	for doc in window.get_documents():
+		if not doc.is_untitled() and doc.is_local():
+			opened.add(doc.get_location().get_path())
+
+		snapshots[len(items)] = snapshot(doc)
+
+		items.append((doc.get_short_name_for_display(), None, doc))
+		texts.append((len(texts), None, snapshots[len(texts)]))
+
+	# Only files containing the trigrams required by the regex are read
+	listing = commands.result.Background(trigramindex.candidates, top, regex, glob)
+	yield listing
+
+	for path in listing.get():
+		if not path in opened:
+			items.append((os.path.relpath(path, top), path, None))
+			texts.append((len(texts), path, None))
+
+	results = Results(entry, window, items)
+
+	pool = commands.result.Pool(replacer.preview, texts)
+	pool.register_result(results.on_result)
+
+	yield pool
+
+	errors = pool.get()
+
+	if errors:
+		entry.info_show('<i>%d files could not be read</i>' % (len(errors),), True)
+
+	if results.matches == 0:
+		entry.info_show('<i>No matches found</i>', True)
+		yield commands.result.DONE
+
+	answer, words, modifier = (yield commands.result.Prompt('Replace %d matches in %d files? [Y/n]' % (results.matches, results.files)))
+
+	if not answer.strip().lower() in ['y', 'ye', 'yes', '']:
+		yield commands.result.HIDE
+
+	# Nothing is changed when any of the documents or files cannot be
+	# changed: documents are checked, files are written to temporary files
+	# which only replace the files when all could be written
+	for idx in results.changes:
+		doc = items[idx][2]
+
+		if doc and snapshot(doc) != snapshots[idx]:
+			raise commands.exceptions.Execute('%s was changed after the preview' % (items[idx][0],))
+
+	# Temporary files are created before they are written, so those which
+	# are not renamed can be removed however the writing stops
+	temporary = set()
+	written = []
+
+	try:
+		writes = []
+
+		for idx in results.changes:
+			path = items[idx][1]
+
+			if not path:
+				continue
+
+			dirname, basename = os.path.split(path)
+			fd, tmp = tempfile.mkstemp(prefix='.' + basename + '.', dir=dirname)
+
+			os.close(fd)
+			temporary.add(tmp)
+
+			writes.append((idx, path, results.changes[idx][1], tmp))
+
+		pool = commands.result.Pool(replacer.write, writes)
+		pool.register_result(written.append)
+
+		yield pool
+
+		errors = pool.get()
+
+		if errors:
+			entry.info_show('<i>No files were changed:</i>', True)
+
+			for error in errors:
+				entry.info_show(saxutils.escape(error), True)
+
+			yield commands.result.DONE
+
+		for idx, tmp in written:
+			os.rename(tmp, items[idx][1])
+			temporary.remove(tmp)
+	finally:
+		_remove(temporary)
+
+	for idx in results.changes:
+		doc = items[idx][2]
+
+		if not doc:
+			continue
+
+		doc.begin_user_action()
+
+		for mstart, mend, repl in reversed(results.changes[idx][0]):
+			piter = doc.get_iter_at_offset(mstart)
+
+			if mend > mstart:
+				doc.delete(piter, doc.get_iter_at_offset(mend))
+
+			if repl:
+				doc.insert(piter, repl)
+
+		doc.end_user_action()
+
+	entry.info_show('<i>Replaced %d matches in %d files</i>' % (results.matches, results.files), True)
+	yield commands.result.DONE
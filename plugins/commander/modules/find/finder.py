@@ -2,6 +2,74 @@ from xml.sax import saxutils
 import commander.commands as commands
 import commander.utils as utils
 import gtk
+import matches
+import highlight
+import re
+
+_groupre = re.compile('(\\\\)?\\$([0-9]+|{(([0-9]+):([^}]+))})')
+
+def _transform(text, trans):
+	if not trans:
+		return text
+
+	transforms = {
+		'u': lambda x: "%s%s" % (x[0].upper(), x[1:]),
+		'U': lambda x: x.upper(),
+		'l': lambda x: "%s%s" % (x[0].lower(), x[1:]),
+		'L': lambda x: x.lower(),
+		't': lambda x: x.title()
+	}
+
+	for i in trans.split(','):
+		if i in transforms:
+			text = transforms[i](text)
+
+	return text
+
+def _expand_group(matchit, group):
+	if group.group(3):
+		num = int(group.group(4))
+	else:
+		num = int(group.group(2))
+
+	if group.group(1):
+		return group.group(2)
+	elif num < len(matchit.groups()) + 1:
+		return _transform(matchit.group(num), group.group(5))
+	else:
+		return group.group(0)
+
+def expand(matchit, replacestr):
+	# The replacement of a match, $n or ${n:transforms} in replacestr are
+	# replaced by the (transformed) groups of the match
+	return _groupre.sub(lambda x: _expand_group(matchit, x), replacestr)
+
+def split_semantic(s):
+	# Can be specified in _ separated syntax, or in TitleCase (or camelCase)
+	if '_' in s:
+		return s.lower().split('_')
+	else:
+		return [m.group(0).lower() for m in re.finditer('[A-Z]+([^A-Z]+)?|[^A-Z]+', s)]
+
+def copy_case(orig, repl):
+	lo = len(orig)
+	lr = len(repl)
+
+	ret = ''
+
+	for i in range(min(lr, lo)):
+		if orig[i].isupper():
+			ret += repl[i].upper()
+		else:
+			ret += repl[i].lower()
+
+	if lr > lo:
+		if orig.isupper():
+			ret += repl[lo:].upper()
+		else:
+			ret += repl[lo:].lower()
+
+	return ret
 
 class Finder:
 	FIND_STARTMARK = 'pluma-commander-find-startmark'
@@ -27,7 +95,10 @@ class Finder:
 		]
 
 		self.from_start = False
+		self.from_end = False
 		self.search_start_mark = None
+		self.matches = None
+		self.highlight = None
 
 	def unescape(self, s):
 		for esc in self.unescapes:
@@ -38,6 +109,41 @@ class Finder:
 	def do_find(self, bounds):
 		return None
 
+	def find_all(self, text):
+		# Finds all matches in text at once, returning their (start, end,
+		# replacement). Returns None when matches can only be found one by one
+		return None
+
+	def find_offsets(self, text):
+		# Finds all matches in text at once, returning their (start, end).
+		# Returns None when matches can only be found one by one
+		return None
+
+	def scan(self, start, end):
+		# Returns the (start, end) offsets of all matches between two iters
+		offset = start.get_offset()
+		ret = self.find_offsets(start.get_text(end).decode('utf-8'))
+
+		if ret != None:
+			return [(offset + mstart, offset + mend) for mstart, mend in ret]
+
+		ret = []
+		bounds = [start.copy(), end]
+
+		while True:
+			found = self.do_find(bounds)
+
+			if not found:
+				break
+
+			ret.append((found[0].get_offset(), found[1].get_offset()))
+			bounds[0] = found[1].copy()
+
+			if found[0].equal(found[1]) and not bounds[0].forward_char():
+				break
+
+		return ret
+
 	def get_replace(self, text):
 		return self.replacestr
 
@@ -65,7 +171,27 @@ class Finder:
 		if loc.y + loc.height < visible.y or loc.y > visible.y + visible.height:
 			self.view.scroll_to_iter(startiter, 0.2, True, 0, 0.5)
 
+	def _select_match(self, idx, select):
+		buf = self.view.get_buffer()
+
+		buf.move_mark(self.find_result.start, buf.get_iter_at_offset(self.matches.starts[idx]))
+		buf.move_mark(self.find_result.end, buf.get_iter_at_offset(self.matches.ends[idx]))
+
+		if select:
+			self.select_last_result()
+
+		return True
+
+	def _result_offsets(self):
+		buf = self.view.get_buffer()
+
+		return (buf.get_iter_at_mark(self.find_result.start).get_offset(),
+		        buf.get_iter_at_mark(self.find_result.end).get_offset())
+
 	def find_next(self, select=False):
+		if self.matches:
+			return self._find_next_match(select)
+
 		buf = self.view.get_buffer()
 
 		# Search from the end of the last result to the end of the search boundary
@@ -106,6 +232,80 @@ class Finder:
 
 			return True
 
+	def _find_next_match(self, select):
+		buf = self.view.get_buffer()
+		start, end = self._result_offsets()
+
+		idx = self.matches.next(start, end)
+		upper = buf.get_iter_at_mark(self.search_boundaries.end).get_offset()
+
+		if idx != None and self.matches.ends[idx] <= upper:
+			return self._select_match(idx, select)
+
+		# Wrap around to the start, and stop at the start of the search
+		if self.search_start_mark:
+			startiter = buf.get_iter_at_mark(self.search_start_mark)
+		else:
+			startiter = None
+
+		startbound = buf.get_iter_at_mark(self.search_boundaries.start)
+
+		if self.from_start or not startiter or startiter.equal(startbound):
+			return False
+
+		self.from_start = True
+		self.search_boundaries.end = self.search_start_mark
+
+		idx = self.matches.next(-1, -1)
+
+		if idx != None and self.matches.ends[idx] <= startiter.get_offset():
+			return self._select_match(idx, select)
+		else:
+			return False
+
+	def find_previous(self, select=False):
+		buf = self.view.get_buffer()
+		start, end = self._result_offsets()
+
+		idx = self.matches.previous(start, end)
+		lower = buf.get_iter_at_mark(self.search_boundaries.start).get_offset()
+
+		if idx != None and self.matches.starts[idx] >= lower:
+			return self._select_match(idx, select)
+
+		# Wrap around to the end, and stop at the start of the search
+		if self.search_start_mark:
+			startiter = buf.get_iter_at_mark(self.search_start_mark)
+		else:
+			startiter = None
+
+		endbound = buf.get_iter_at_mark(self.search_boundaries.end)
+
+		if self.from_end or not startiter or startiter.equal(endbound):
+			return False
+
+		self.from_end = True
+		self.search_boundaries.start = self.search_start_mark
+
+		idx = self.matches.previous(buf.get_char_count() + 1, buf.get_char_count() + 1)
+
+		if idx != None and self.matches.starts[idx] >= startiter.get_offset():
+			return self._select_match(idx, select)
+		else:
+			return False
+
+	def match_position(self):
+		# Position of the current result among all matches, as ' (i of N)'
+		if not self.matches:
+			return ''
+
+		idx = self.matches.index(*self._result_offsets())
+
+		if idx == None:
+			return ' (%d matches)' % (len(self.matches),)
+		else:
+			return ' (%d of %d)' % (idx + 1, len(self.matches))
+
 	def _create_or_move(self, markname, piter, left_gravity):
 		buf = self.view.get_buffer()
 		mark = buf.get_mark(markname)
@@ -117,7 +317,19 @@ class Finder:
 
 		return mark
 
-	def find_first(self, doend=True, select=False):
+	def _build_matches(self):
+		buf = self.view.get_buffer()
+
+		if self.highlight:
+			self.highlight.remove()
+
+		if self.matches:
+			self.matches.remove()
+
+		self.matches = matches.Matches(self, buf.get_mark(Finder.FIND_STARTMARK), buf.get_mark(Finder.FIND_ENDMARK))
+		self.highlight = highlight.Highlight(self.view, self.matches)
+
+	def find_first(self, doend=True, select=False, backwards=False, table=True):
 		words = []
 		buf = self.view.get_buffer()
 
@@ -158,8 +370,18 @@ class Finder:
 		self.find_result.start = self._create_or_move(Finder.FIND_RESULT_STARTMARK, piter, True)
 		self.find_result.end = self._create_or_move(Finder.FIND_RESULT_ENDMARK, piter, False)
 
-		if not self.find_next(select=select):
-			if doend:
+		if table:
+			self._build_matches()
+
+		if backwards:
+			found = self.find_previous(select=select)
+		else:
+			found = self.find_next(select=select)
+
+		if not found:
+			if doend and backwards:
+				self.entry.info_show('<i>Search hit start of the document</i>', True)
+			elif doend:
 				self.entry.info_show('<i>Search hit end of the document</i>', True)
 
 			yield commands.result.DONE
@@ -175,24 +397,51 @@ class Finder:
 		if self.search_start_mark:
 			buf.delete_mark(self.search_start_mark)
 
-	def find(self, findstr):
+		if self.highlight:
+			self.highlight.remove()
+			self.highlight = None
+
+		if self.matches:
+			self.matches.remove()
+			self.matches = None
+
+	def find(self, findstr, backwards=False):
 		if findstr:
 			self.set_find(findstr)
 
 		buf = self.view.get_buffer()
 
+		if backwards:
+			prompt = 'Search previous'
+		else:
+			prompt = 'Search next'
+
+		previous = backwards
+
 		try:
-			if (yield self.find_first(select=True)):
+			if (yield self.find_first(select=True, backwards=backwards)):
 				while True:
-					argstr, words, modifier = (yield commands.result.Prompt('Search next [<i>%s</i>]:' % (saxutils.escape(self.findstr),)))
+					argstr, words, modifier = (yield commands.result.Prompt('%s [<i>%s</i>]%s:' % (prompt, saxutils.escape(self.findstr), self.match_position())))
 
-					if argstr:
+					if argstr and self.unescape(argstr) != self.findstr:
 						self.set_find(argstr)
+						self._build_matches()
+
+					# Shift searches in the other direction
+					previous = (backwards != bool(modifier & gtk.gdk.SHIFT_MASK))
 
-					if not self.find_next(select=True):
+					if previous:
+						found = self.find_previous(select=True)
+					else:
+						found = self.find_next(select=True)
+
+					if not found:
 						break
 
-				self.entry.info_show('<i>Search hit end of the document</i>', True)
+				if previous:
+					self.entry.info_show('<i>Search hit start of the document</i>', True)
+				else:
+					self.entry.info_show('<i>Search hit end of the document</i>', True)
 		except GeneratorExit, e:
 			self.cancel()
 			raise e
@@ -219,6 +468,32 @@ class Finder:
 		else:
 			return self.replacestr
 
+	def replace_all(self):
+		# Replace all matches within the search boundaries in one go, from the
+		# end backwards so the offsets of earlier matches stay valid
+		buf = self.view.get_buffer()
+
+		start = buf.get_iter_at_mark(buf.get_mark(Finder.FIND_STARTMARK))
+		end = buf.get_iter_at_mark(buf.get_mark(Finder.FIND_ENDMARK))
+
+		matches = self.find_all(start.get_text(end).decode('utf-8'))
+
+		if matches == None:
+			return False
+
+		offset = start.get_offset()
+
+		for mstart, mend, repl in reversed(matches):
+			piter = buf.get_iter_at_offset(offset + mstart)
+
+			if mend > mstart:
+				buf.delete(piter, buf.get_iter_at_offset(offset + mend))
+
+			if repl:
+				buf.insert(piter, repl)
+
+		return True
+
 	def replace(self, findstr, replaceall=False, replacestr=None):
 		if findstr:
 			self.set_find(findstr)
@@ -232,7 +507,7 @@ class Finder:
 		if replaceall:
 			startmark = buf.create_mark(None, buf.get_iter_at_mark(buf.get_insert()), False)
 
-		ret = (yield self.find_first(select=not replaceall))
+		ret = (yield self.find_first(select=not replaceall, table=not replaceall))
 
 		if not ret:
 			yield commands.result.DONE
@@ -260,9 +535,11 @@ class Finder:
 			buf.begin_user_action()
 
 		try:
-			while True:
+			done = replaceall and self.replace_all()
+
+			while not done:
 				if not replaceall:
-					rep, words, modifier = (yield commands.result.Prompt('Replace next [%s]:' % (saxutils.escape(self.get_current_replace()),)))
+					rep, words, modifier = (yield commands.result.Prompt('Replace next [%s]%s:' % (saxutils.escape(self.get_current_replace()), self.match_position())))
 
 					if rep:
 						self.set_replace(rep)
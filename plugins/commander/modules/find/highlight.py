@@ -0,0 +1,116 @@
+import glib
+import commander.utils as utils
+
+TagName = 'CommanderModuleFindHighlightTag'
+
+# Number of lines above and below the visible area which are highlighted too
+MARGIN = 50
+
+def _get_tag(buf):
+	tag = buf.get_tag_table().lookup(TagName)
+
+	if tag is None:
+		tag = buf.create_tag(TagName, **utils.search_match_style(buf))
+
+	return tag
+
+class Highlight:
+	# Highlights the matches of a match table in the visible part of the view
+	# only. The highlighted lines follow the view when it is scrolled or the
+	# buffer is edited
+	def __init__(self, view, matches):
+		self.view = view
+		self.matches = matches
+
+		buf = view.get_buffer()
+
+		self.tag = _get_tag(buf)
+		self._start = buf.create_mark(None, buf.get_start_iter(), True)
+		self._end = buf.create_mark(None, buf.get_start_iter(), False)
+		self._idle_id = 0
+
+		self._view_handlers = [
+			view.connect('expose-event', self.on_expose)
+		]
+
+		self._buffer_handlers = [
+			buf.connect_after('insert-text', self.on_edited),
+			buf.connect_after('delete-range', self.on_edited)
+		]
+
+		self.update()
+
+	def remove(self):
+		buf = self.view.get_buffer()
+
+		for handler in self._view_handlers:
+			self.view.disconnect(handler)
+
+		for handler in self._buffer_handlers:
+			buf.disconnect(handler)
+
+		self._view_handlers = []
+		self._buffer_handlers = []
+
+		if self._idle_id:
+			glib.source_remove(self._idle_id)
+			self._idle_id = 0
+
+		buf.remove_tag(self.tag, buf.get_iter_at_mark(self._start), buf.get_iter_at_mark(self._end))
+
+		buf.delete_mark(self._start)
+		buf.delete_mark(self._end)
+
+	def _visible_lines(self):
+		rect = self.view.get_visible_rect()
+
+		first = self.view.get_line_at_y(rect.y)[0].get_line()
+		last = self.view.get_line_at_y(rect.y + rect.height)[0].get_line()
+
+		return first, last
+
+	def on_expose(self, view, event):
+		buf = view.get_buffer()
+		first, last = self._visible_lines()
+
+		# Only update when scrolled beyond the highlighted lines
+		if first < buf.get_iter_at_mark(self._start).get_line() or \
+		   last > buf.get_iter_at_mark(self._end).get_line():
+			self.queue_update()
+
+		return False
+
+	def on_edited(self, buf, *args):
+		self.queue_update()
+
+	def queue_update(self):
+		if not self._idle_id:
+			self._idle_id = glib.idle_add(self.on_idle)
+
+	def on_idle(self):
+		self._idle_id = 0
+		self.update()
+
+		return False
+
+	def update(self):
+		buf = self.view.get_buffer()
+		first, last = self._visible_lines()
+
+		start = buf.get_iter_at_line(max(0, first - MARGIN))
+		end = buf.get_iter_at_line(last + MARGIN)
+
+		if not end.ends_line():
+			end.forward_to_line_end()
+
+		buf.remove_tag(self.tag, buf.get_iter_at_mark(self._start), buf.get_iter_at_mark(self._end))
+
+		buf.move_mark(self._start, start)
+		buf.move_mark(self._end, end)
+
+		lo, hi = self.matches.between(start.get_offset(), end.get_offset())
+
+		for idx in xrange(lo, hi):
+			buf.apply_tag(self.tag,
+			              buf.get_iter_at_offset(self.matches.starts[idx]),
+			              buf.get_iter_at_offset(self.matches.ends[idx]))
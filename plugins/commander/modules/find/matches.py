@@ -0,0 +1,191 @@
+import bisect
+
+class Matches:
+	# Sorted table of the (start, end) offsets of all matches within the search
+	# boundaries. The table is built once per search and kept valid while the
+	# buffer is edited: matches after an edit are moved, matches touched by an
+	# edit are dropped and their lines are searched again on the next lookup
+	def __init__(self, finder, startmark, endmark):
+		self.finder = finder
+		self.buf = finder.view.get_buffer()
+
+		self.startmark = startmark
+		self.endmark = endmark
+
+		self.starts = []
+		self.ends = []
+
+		# Sorted, non-overlapping [start, end] ranges of offsets to search again
+		self._dirty = []
+
+		start = self.buf.get_iter_at_mark(startmark)
+		end = self.buf.get_iter_at_mark(endmark)
+
+		for mstart, mend in finder.scan(start, end):
+			self.starts.append(mstart)
+			self.ends.append(mend)
+
+		self._handlers = [
+			self.buf.connect('insert-text', self.on_insert_text),
+			self.buf.connect('delete-range', self.on_delete_range)
+		]
+
+	def remove(self):
+		for handler in self._handlers:
+			self.buf.disconnect(handler)
+
+		self._handlers = []
+
+	def __len__(self):
+		self.sync()
+		return len(self.starts)
+
+	def on_insert_text(self, buf, location, text, length):
+		self._edited(location.get_offset(), location.get_offset(), len(text[:length].decode('utf-8')))
+
+	def on_delete_range(self, buf, start, end):
+		start, end = start.get_offset(), end.get_offset()
+
+		if start > end:
+			start, end = end, start
+
+		self._edited(start, end, start - end)
+
+	def _edited(self, start, end, delta):
+		# The text from start to end (old offsets) was replaced by text which
+		# is delta characters longer
+		def moved(x):
+			if x <= start:
+				return x
+			elif x <= end:
+				return start
+			else:
+				return x + delta
+
+		newend = max(start, end + delta)
+		lo = bisect.bisect_left(self.ends, start)
+		hi = bisect.bisect_right(self.starts, end)
+
+		ranges = [[moved(a), moved(b)] for a, b in self._dirty]
+		ranges.append([start, newend])
+
+		# Drop the matches overlapping or touching the edit
+		if lo < hi:
+			ranges.append([moved(self.starts[lo]), moved(self.ends[hi - 1])])
+
+			del self.starts[lo:hi]
+			del self.ends[lo:hi]
+
+		if delta:
+			self.starts[lo:] = [x + delta for x in self.starts[lo:]]
+			self.ends[lo:] = [x + delta for x in self.ends[lo:]]
+
+		ranges.sort()
+		self._dirty = []
+
+		for a, b in ranges:
+			if self._dirty and a <= self._dirty[-1][1]:
+				self._dirty[-1][1] = max(self._dirty[-1][1], b)
+			else:
+				self._dirty.append([a, b])
+
+	def _line_bounds(self, a, b):
+		start = self.buf.get_iter_at_offset(a)
+		start.set_line_offset(0)
+
+		end = self.buf.get_iter_at_offset(b)
+
+		if not end.ends_line():
+			end.forward_to_line_end()
+
+		return start.get_offset(), end.get_offset()
+
+	def sync(self):
+		# Search the lines of the edits again
+		if not self._dirty:
+			return
+
+		lower = self.buf.get_iter_at_mark(self.startmark).get_offset()
+		upper = self.buf.get_iter_at_mark(self.endmark).get_offset()
+
+		windows = []
+
+		for a, b in self._dirty:
+			a, b = self._line_bounds(a, b)
+
+			if windows and a <= windows[-1][1]:
+				windows[-1][1] = max(windows[-1][1], b)
+			else:
+				windows.append([a, b])
+
+		self._dirty = []
+
+		for a, b in windows:
+			a = max(a, lower)
+			b = min(b, upper)
+
+			# Do not split matches spanning the start or end of the window
+			lo = bisect.bisect_left(self.starts, a)
+
+			if lo > 0 and self.ends[lo - 1] > a:
+				a = self.ends[lo - 1]
+
+			hi = bisect.bisect_right(self.starts, b)
+
+			if hi > lo and self.starts[hi - 1] < b < self.ends[hi - 1]:
+				b = self.starts[hi - 1]
+				hi -= 1
+
+			if a > b:
+				continue
+
+			found = self.finder.scan(self.buf.get_iter_at_offset(a), self.buf.get_iter_at_offset(b))
+
+			self.starts[lo:hi] = [x[0] for x in found]
+			self.ends[lo:hi] = [x[1] for x in found]
+
+	def between(self, start, end):
+		# Range of indices of the matches overlapping start to end
+		self.sync()
+
+		return (bisect.bisect_left(self.ends, start),
+		        bisect.bisect_right(self.starts, end))
+
+	def index(self, start, end):
+		# Index of the match from start to end, or None
+		self.sync()
+		idx = bisect.bisect_left(self.starts, start)
+
+		while idx < len(self.starts) and self.starts[idx] == start:
+			if self.ends[idx] == end:
+				return idx
+
+			idx += 1
+
+		return None
+
+	def next(self, start, end):
+		# Index of the first match after the one from start to end, or None
+		self.sync()
+		idx = bisect.bisect_left(self.starts, end)
+
+		if idx < len(self.starts) and self.starts[idx] == start and self.ends[idx] == end:
+			idx += 1
+
+		if idx < len(self.starts):
+			return idx
+		else:
+			return None
+
+	def previous(self, start, end):
+		# Index of the last match before the one from start to end, or None
+		self.sync()
+		idx = bisect.bisect_right(self.ends, start) - 1
+
+		if idx >= 0 and self.starts[idx] == start and self.ends[idx] == end:
+			idx -= 1
+
+		if idx >= 0:
+			return idx
+		else:
+			return None
@@ -7,25 +7,30 @@ import re
 __commander_module__ = True
 __root__ = ['regex_i']
 
+def _unicode(s):
+	if isinstance(s, str):
+		return s.decode('utf-8')
+	else:
+		return s
+
 class RegexFinder(finder.Finder):
 	def __init__(self, entry, flags = 0):
 		finder.Finder.__init__(self, entry)
 
 		self.flags = re.UNICODE | re.MULTILINE | re.DOTALL | flags
-		self.groupre = re.compile('(\\\\)?\\$([0-9]+|{(([0-9]+):([^}]+))})')
 
 	def set_find(self, findstr):
 		finder.Finder.set_find(self, findstr)
 
 		try:
-			self.findre = re.compile(findstr, self.flags)
+			self.findre = re.compile(_unicode(findstr), self.flags)
 		except Exception, e:
 			raise commands.exceptions.Execute('Invalid regular expression: ' + str(e))
 
 	def do_find(self, bounds):
 		buf = self.view.get_buffer()
 
-		text = bounds[0].get_text(bounds[1])
+		text = bounds[0].get_text(bounds[1]).decode('utf-8')
 		ret = self.findre.search(text)
 
 		if ret:
@@ -39,87 +44,49 @@ class RegexFinder(finder.Finder):
 		else:
 			return False
 
-	def _transform(self, text, trans):
-		if not trans:
-			return text
-
-		transforms = {
-			'u': lambda x: "%s%s" % (x[0].upper(), x[1:]),
-			'U': lambda x: x.upper(),
-			'l': lambda x: "%s%s" % (x[0].lower(), x[1:]),
-			'L': lambda x: x.lower(),
-			't': lambda x: x.title()
-		}
-
-		for i in trans.split(','):
-			if i in transforms:
-				text = transforms[i](text)
-
-		return text
-
-	def _do_re_replace_group(self, matchit, group):
-		if group.group(3):
-			num = int(group.group(4))
-		else:
-			num = int(group.group(2))
-
-		if group.group(1):
-			return group.group(2)
-		elif num < len(matchit.groups()) + 1:
-			return self._transform(matchit.group(num), group.group(5))
-		else:
-			return group.group(0)
-
 	def _do_re_replace(self, matchit):
-		return self.groupre.sub(lambda x: self._do_re_replace_group(matchit, x), self.replacestr)
+		return finder.expand(matchit, _unicode(self.replacestr))
 
 	def get_replace(self, text):
 		try:
-			return self.findre.sub(self._do_re_replace, text)
+			return self.findre.sub(self._do_re_replace, _unicode(text))
+		except Exception, e:
+			raise commands.exceptions.Execute('Invalid replacement: ' + str(e))
+
+	def replacement(self, matchit):
+		try:
+			return self._do_re_replace(matchit)
 		except Exception, e:
 			raise commands.exceptions.Execute('Invalid replacement: ' + str(e))
 
+	def find_all(self, text):
+		return [(m.start(), m.end(), self.replacement(m)) for m in self.findre.finditer(text)]
+
+	def find_offsets(self, text):
+		return [m.span() for m in self.findre.finditer(text)]
+
 class SemanticFinder(RegexFinder):
 	def __init__(self, entry):
 		RegexFinder.__init__(self, entry, re.IGNORECASE)
 
 	def split_semantic(self, s):
-		# Can be specified in _ separated syntax, or in TitleCase
-		if '_' in s:
-			return s.lower().split('_')
-		else:
-			return [m.group(0).lower() for m in re.finditer('[A-Z]+([^A-Z]+)?', s)]
+		return finder.split_semantic(s)
 
 	def set_find(self, findstr):
 		self.findparts = self.split_semantic(findstr)
 		RegexFinder.set_find(self, '(' + ')(_?)('.join(map(lambda x: re.escape(x), self.findparts)) + ')')
 
 	def set_replace(self, replstr):
-		self.replaceparts = self.split_semantic(replstr)
+		self.replaceparts = self.split_semantic(_unicode(replstr))
 		RegexFinder.set_replace(self, replstr)
 
 	def copy_case(self, orig, repl):
-		lo = len(orig)
-		lr = len(repl)
-
-		ret = ''
-
-		for i in range(min(lr, lo)):
-			if orig[i].isupper():
-				ret += repl[i].upper()
-			else:
-				ret += repl[i].lower()
-
-		if lr > lo:
-			if orig.isupper():
-				ret += repl[lo:].upper()
-			else:
-				ret += repl[lo:].lower()
-
-		return ret
+		return finder.copy_case(orig, repl)
 
 	def get_replace(self, text):
-		m = self.findre.match(text)
+		return self.replacement(self.findre.match(_unicode(text)))
+
+	def replacement(self, m):
 		groups = m.groups()
 
 		ret = []
@@ -153,6 +120,14 @@ expression syntax is that of python regular expressions. Matching dicards case."
 	fd = RegexFinder(entry, re.IGNORECASE)
 	yield fd.find(argstr)
 
+def previous(entry, argstr):
+	"""Find previous regex in document: find.regex.previous &lt;regex&gt;
+
+Find text in the document that matches a given regular expression, searching
+backwards from the cursor."""
+	fd = RegexFinder(entry)
+	yield fd.find(argstr, True)
+
 def replace(entry, findre, replstr=None):
 	"""Find/replace regex in document: find.replace &lt;find&gt; [&lt;replace&gt;]
 
@@ -0,0 +1,187 @@
+import os
+import re
+
+import commander.commands as commands
+import commander.commands.exceptions
+import finder
+
+_re_separators = re.compile('[\\s,=:"\']+')
+_re_identifier = re.compile('^\\w+$', re.UNICODE)
+
+def read_pairs(argstr, root):
+	# Pairs of old and new names, from a file or given inline as old=new. In
+	# files, pairs can also be given as old new, one per line
+	path = os.path.join(root, os.path.expanduser(argstr))
+
+	if argstr and os.path.isfile(path):
+		f = open(path, 'r')
+
+		try:
+			text = f.read().decode('utf-8')
+		finally:
+			f.close()
+
+		lines = [line.split('#')[0] for line in text.splitlines()]
+	else:
+		lines = [argstr.decode('utf-8')]
+
+	names = []
+
+	for line in lines:
+		names.extend(filter(lambda x: x, _re_separators.split(line)))
+
+	if not names or len(names) % 2 != 0:
+		raise commands.exceptions.Execute('Expected pairs of old and new names')
+
+	for name in names:
+		if not _re_identifier.match(name):
+			raise commands.exceptions.Execute('Invalid identifier: ' + name.encode('utf-8'))
+
+	return zip(names[::2], names[1::2])
+
+# Names only match whole identifiers, or the parts of an identifier split
+# by _ or a change to upper case
+_start_boundary = '(?:(?<![^\\W_])|(?<=[a-z0-9])(?=[A-Z]))'
+_end_boundary = '(?:(?![^\\W_])|(?<=[a-z0-9])(?=[A-Z]))'
+
+def _char_pattern(c):
+	# Names match in any case
+	if c.lower() != c.upper():
+		return '[' + re.escape(c.lower()) + re.escape(c.upper()) + ']'
+	else:
+		return re.escape(c)
+
+def _trie_pattern(names):
+	# Regular expression matching any of names, as a trie of their characters
+	# so the regular expression engine does not try each name in turn. Longer
+	# names are tried first. A None in a name matches an optional _
+	trie = {}
+
+	for name in names:
+		node = trie
+
+		for c in name:
+			node = node.setdefault(c, {})
+
+		node[''] = {}
+
+	def pattern(node):
+		alternatives = []
+
+		for c in sorted(node.keys()):
+			if c == '':
+				continue
+
+			if c is None:
+				alternatives.append('_?' + pattern(node[c]))
+			else:
+				alternatives.append(_char_pattern(c) + pattern(node[c]))
+
+		if '' in node:
+			alternatives.append('')
+
+		if len(alternatives) == 1:
+			return alternatives[0]
+		else:
+			return '(?:' + '|'.join(alternatives) + ')'
+
+	return pattern(trie)
+
+class RenameMap:
+	# Renames a number of identifiers at once, in their snake_case, TitleCase
+	# and UPPER_CASE variants. All old names are combined in one regular
+	# expression, which matches the longest name at a position. Occurrences
+	# keep their case pattern
+	def __init__(self, pairs):
+		# Old name without separators (lower case) -> (old parts, new parts)
+		self.renames = {}
+
+		for old, new in pairs:
+			oldparts = finder.split_semantic(old)
+			newparts = finder.split_semantic(new)
+			key = u''.join(oldparts)
+
+			# Occurrences of names which only differ in their separators cannot
+			# be told apart
+			if key in self.renames and self.renames[key] != (oldparts, newparts):
+				raise commands.exceptions.Execute('Conflicting renames for ' + old.encode('utf-8'))
+
+			self.renames[key] = (oldparts, newparts)
+
+		names = []
+
+		for oldparts, newparts in self.renames.values():
+			name = list(oldparts[0])
+
+			for part in oldparts[1:]:
+				name.append(None)
+				name.extend(part)
+
+			names.append(name)
+
+		self.regex = re.compile(_start_boundary + _trie_pattern(names) + _end_boundary, re.UNICODE)
+
+	def _join(self, text, parts, newparts):
+		# Case pattern for new parts beyond the old parts: snake_case words are
+		# appended with _, TitleCase words are capitalized
+		if '_' in text or text.islower() or text.isupper():
+			if parts[-1].isupper():
+				return [u'_' + x.upper() for x in newparts]
+			else:
+				return [u'_' + x.lower() for x in newparts]
+		else:
+			return [x.capitalize() for x in newparts]
+
+	def replacement(self, m):
+		text = m.group(0)
+		oldparts, newparts = self.renames[text.replace(u'_', u'').lower()]
+
+		# Split the occurrence in the old parts and their separators
+		parts = []
+		separators = []
+		pos = 0
+
+		for part in oldparts:
+			parts.append(text[pos:pos + len(part)])
+			pos += len(part)
+
+			if text[pos:pos + 1] == u'_':
+				separators.append(u'_')
+				pos += 1
+			else:
+				separators.append(u'')
+
+		ret = []
+
+		for i in range(min(len(parts), len(newparts))):
+			if i > 0:
+				ret.append(separators[i - 1])
+
+			ret.append(finder.copy_case(parts[i], newparts[i]))
+
+		if len(newparts) > len(parts):
+			ret.extend(self._join(text, parts, newparts[len(parts):]))
+
+		return u''.join(ret)
+
+	def edits(self, text):
+		return [(m.start(), m.end(), self.replacement(m)) for m in self.regex.finditer(text)]
+
+	def apply(self, doc):
+		# Renames all occurrences in a document in one user action, returns
+		# the number of renamed occurrences
+		text = doc.get_text(doc.get_start_iter(), doc.get_end_iter()).decode('utf-8')
+		edits = filter(lambda x: text[x[0]:x[1]] != x[2], self.edits(text))
+
+		if not edits:
+			return 0
+
+		doc.begin_user_action()
+
+		for mstart, mend, repl in reversed(edits):
+			piter = doc.get_iter_at_offset(mstart)
+			doc.delete(piter, doc.get_iter_at_offset(mend))
+			doc.insert(piter, repl)
+
+		doc.end_user_action()
+		return len(edits)
@@ -1,64 +1,108 @@
 import commander.commands as commands
+import commander.commands.result
+
+import re
+import glib
 
 __commander_module__ = True
 
-def remove_trailing_spaces(view, all=False):
-	"""Remove trailing spaces: format.remove-trailing-spaces [&lt;all&gt;]
+# White space at the end of a line, before its line terminator
+_re_trailing_spaces = re.compile(u'[^\\S\\r\\n]+(?=\\r|\\n|\\Z)', re.UNICODE)
 
-Remove trailing spaces in the selection. If there is no selection, trailing
-spaces are removed from the whole document. When the optional argument
-&lt;all&gt; is specified, trailing spaces will be removed from all
-the open documents."""
+def _remove_trailing_spaces(buf):
+	# Finds the trailing spaces of the selected lines, or of all lines, in one
+	# pass over their text and removes them from the bottom up in one user
+	# action. Returns the number of lines changed
+	bounds = buf.get_selection_bounds()
 
-	if all:
-		buffers = view.get_toplevel().get_documents()
-	else:
-		buffers = [view.get_buffer()]
+	if not bounds:
+		bounds = buf.get_bounds()
 
-	for buf in buffers:
-		bounds = buf.get_selection_bounds()
+	start, end = bounds
+	start.set_line_offset(0)
 
-		if not bounds:
-			bounds = buf.get_bounds()
+	if not end.ends_line():
+		end.forward_to_line_end()
 
-		buf.begin_user_action()
+	offset = start.get_offset()
+	spans = [m.span() for m in _re_trailing_spaces.finditer(start.get_text(end).decode('utf-8'))]
 
-		try:
-			# For each line, remove trailing spaces
-			if not bounds[1].ends_line():
-				bounds[1].forward_to_line_end()
+	if not spans:
+		return 0
 
-			until = buf.create_mark(None, bounds[1], False)
-			start = bounds[0]
-			start.set_line_offset(0)
+	buf.begin_user_action()
 
-			while start.compare(buf.get_iter_at_mark(until)) < 0:
-				end = start.copy()
-				end.forward_to_line_end()
-				last = end.copy()
+	for mstart, mend in reversed(spans):
+		buf.delete(buf.get_iter_at_offset(offset + mstart), buf.get_iter_at_offset(offset + mend))
 
-				if end.equal(buf.get_end_iter()):
-					end.backward_char()
+	buf.end_user_action()
+	return len(spans)
 
-				while end.get_char().isspace() and end.compare(start) > 0:
-					end.backward_char()
+class _IdleDocuments(commands.result.Suspend):
+	# Removes trailing spaces from a document at a time in idle callbacks, and
+	# resumes the command when done
+	def __init__(self, buffers):
+		commands.result.Suspend.__init__(self)
 
-				if not end.ends_line():
-					if not end.get_char().isspace():
-						end.forward_char()
+		self.buffers = buffers
+		self.lines = 0
+		self.changed = 0
 
-					buf.delete(end, last)
+		self._next = 0
+		self._idle_id = glib.idle_add(self.on_idle)
 
-				start = end.copy()
-				start.forward_line()
+	def on_idle(self):
+		if self._next < len(self.buffers):
+			lines = _remove_trailing_spaces(self.buffers[self._next])
+			self._next += 1
 
-		except Exception, e:
-			print e
+			if lines:
+				self.lines += lines
+				self.changed += 1
 
-		buf.delete_mark(until)
-		buf.end_user_action()
+		if self._next < len(self.buffers):
+			return True
 
-	return commands.result.HIDE
+		self._idle_id = 0
+		self.resume()
+
+		return False
+
+	def cancel(self):
+		if self._idle_id:
+			glib.source_remove(self._idle_id)
+			self._idle_id = 0
+
+		commands.result.Suspend.cancel(self)
+
+def remove_trailing_spaces(view, entry, all=False):
+	"""Remove trailing spaces: format.remove-trailing-spaces [&lt;all&gt;]
+
+Remove trailing spaces in the selection. If there is no selection, trailing
+spaces are removed from the whole document. When the optional argument
+&lt;all&gt; is specified, trailing spaces will be removed from all
+the open documents."""
+
+	if all:
+		# Documents are cleaned one at a time, so that many documents do not
+		# block the main loop
+		documents = _IdleDocuments(view.get_toplevel().get_documents())
+		yield documents
+
+		lines = documents.lines
+		changed = documents.changed
+	else:
+		lines = _remove_trailing_spaces(view.get_buffer())
+		changed = 1
+
+	if lines == 0:
+		entry.info_show('<i>No trailing spaces found</i>', True)
+	elif all:
+		entry.info_show('<b>%d</b> lines changed in <b>%d</b> documents' % (lines, changed), True)
+	else:
+		entry.info_show('<b>%d</b> lines changed' % (lines,), True)
+
+	yield commands.result.DONE
 
 def _transform(view, how, all):
 	if all:
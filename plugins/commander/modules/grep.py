@@ -24,13 +24,35 @@ import commander.commands.completion
 import commander.commands.result
 import commander.commands.exceptions
 
+import os
 import re
+import bisect
+import time
+import glib
+import gio
+import pluma
+
+import commander.trigramindex as trigramindex
+import commander.utils as utils
+
+from xml.sax import saxutils
 
 __commander_module__ = True
 HideTagName = 'CommanderModuleGrepHideTag'
 ZoomOutTagName = 'CommanderModuleGrepZoomOutTag'
 HighlightTagName = 'CommanderModuleGrepHighlightTag'
 
+FilterDataName = 'CommanderModuleGrepFilter'
+
+# Number of characters (grep.live) or lines (edited lines) grepped at once,
+# and the time spent grepping in each idle callback
+CHUNK_SIZE = 256 * 1024
+CHUNK_LINES = 4096
+IDLE_TIME = 0.02
+
+MAX_FILE_MATCHES = 1000
+MAX_LINE_LENGTH = 200
+
 def _get_tag(buf, name, callback=None, **args):
     table = buf.get_tag_table()
     tag = table.lookup(name)
@@ -49,25 +71,8 @@ def _get_invisible_tag(buf):
 def _get_zoomout_tag(buf):
     return _get_tag(buf, ZoomOutTagName, size_points=4)
 
-def _create_highlight_tag(buf):
-    scheme = buf.get_style_scheme()
-    style = scheme.get_style('search-match')
-
-    if style is None:
-        return {'background': '#FFFF78', 'background_set': True, 'foreground_set': False}
-
-    ret = {}
-
-    if style.props.foreground_set:
-        ret.update({'foreground_set': True, 'foreground': style.props.foreground})
-
-    if style.props.background_set:
-        ret.update({'background_set': True, 'background': style.props.background})
-
-    return ret
-
 def _get_highlight_tag(buf):
-    return _get_tag(buf, HighlightTagName, _create_highlight_tag)
+    return _get_tag(buf, HighlightTagName, utils.search_match_style)
 
 def _grep_action_hide(view, start, end):
     # Apply tag that makes line invisible
@@ -94,65 +99,447 @@ def _grep_action_zoomout(view, start, end):
 
     buf.apply_tag(tag, start, end)
 
-def _highlight(view, start, end, matches):
-    buf = view.get_buffer()
-    tag = _get_highlight_tag(buf)
+_re_newline = re.compile(u'\r\n|[\r\n\u2029]')
+
+class _Lines:
+    # Offsets at which the lines of a text start, like the lines of a
+    # gtk.TextBuffer
+    def __init__(self, text):
+        self.starts = [0]
+        self.starts.extend([m.end() for m in _re_newline.finditer(text)])
+        self.size = len(text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_at(self, offset, lo=0):
+        return bisect.bisect_right(self.starts, offset, lo) - 1
+
+    def start(self, line):
+        return self.starts[line]
+
+    def end(self, line):
+        if line + 1 < len(self.starts):
+            return self.starts[line + 1]
+        else:
+            return self.size
+
+def _compile(regex):
+    if isinstance(regex, str):
+        regex = regex.decode('utf-8')
+
+    try:
+        return re.compile(regex, re.MULTILINE)
+    except Exception, e:
+        raise commands.exceptions.Execute('Invalid regular expression: ' + str(e))
+
+def _snapshot(buf):
+    return buf.get_text(buf.get_start_iter(), buf.get_end_iter()).decode('utf-8')
+
+def _finditer(reg, text, lines, first=0, last=None):
+    # Run the regex once over the text of the lines first to last, yielding
+    # each match and its line. Like grepping line by line, matches do not
+    # continue on the next line
+    if last is None:
+        last = len(lines) - 1
+
+    pos = lines.start(first)
+    endpos = lines.end(last)
+    line = first
+
+    while pos <= endpos:
+        m = reg.search(text, pos, endpos)
+
+        if not m:
+            return
+
+        # An empty match at the end belongs to the next line
+        if m.start() == endpos and last + 1 < len(lines):
+            return
+
+        line = lines.line_at(m.start(), line)
+        lineend = lines.end(line)
+
+        if m.end() > lineend:
+            # Match again within the line only
+            m = reg.search(text, m.start(), lineend)
+
+            if not m:
+                pos = lineend
+                continue
+
+            line = lines.line_at(m.start(), line)
+
+        yield line, m
+
+        if m.start() == m.end():
+            pos = m.end() + 1
+        else:
+            pos = m.end()
+
+def _matches(reg, text, lines, first=0, last=None):
+    # Collect the (sorted) lines containing a match, and the offset ranges of
+    # the matches
+    matched = []
+    ranges = []
+
+    for line, m in _finditer(reg, text, lines, first, last):
+        start = m.start()
+        end = m.end()
+
+        if not matched or matched[-1] != line:
+            matched.append(line)
+
+        if start == end:
+            continue
+
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+
+    return matched, ranges
+
+def _runs(lines, matched, first=0, last=None):
+    # Generate the maximal ranges of consecutive matching and non-matching
+    # lines between first and last as (start, end, matches)
+    if last is None:
+        last = len(lines) - 1
+
+    line = first
+    i = 0
+
+    while i < len(matched):
+        start = matched[i]
+
+        while i + 1 < len(matched) and matched[i + 1] == matched[i] + 1:
+            i += 1
+
+        if start > line:
+            yield lines.start(line), lines.start(start), False
 
-    for match in matches:
-        st = start.copy()
-        ed = start.copy()
+        yield lines.start(start), lines.end(matched[i]), True
 
-        st.forward_chars(match.start(0))
-        ed.forward_chars(match.end(0))
+        line = matched[i] + 1
+        i += 1
 
-        buf.apply_tag(tag, st, ed)
+    if line <= last:
+        yield lines.start(line), lines.end(last), False
 
-def _unhighlight(view, start, end, matches):
+def _apply(view, lines, matched, ranges, match_action, non_match_action, first=0, last=None, offset=0):
+    # Apply the actions to the lines first to last of a text starting at
+    # offset in the buffer
     buf = view.get_buffer()
     tag = _get_highlight_tag(buf)
+    at = lambda x: buf.get_iter_at_offset(offset + x)
 
-    for match in matches:
-        st = start.copy()
-        ed = start.copy()
-
-        st.forward_chars(match.start(0))
-        ed.forward_chars(match.end(0))
+    for start, end, matches in _runs(lines, matched, first, last):
+        if matches:
+            match_action(view, at(start), at(end))
+        else:
+            buf.remove_tag(tag, at(start), at(end))
+            non_match_action(view, at(start), at(end))
 
-        buf.remove_tag(tag, st, ed)
+    for start, end in ranges:
+        buf.apply_tag(tag, at(start), at(end))
 
 def _grep(view, regex, match_action, non_match_action):
+    reg = _compile(regex)
+
+    text = _snapshot(view.get_buffer())
+    lines = _Lines(text)
+
+    matched, ranges = _matches(reg, text, lines)
+    _apply(view, lines, matched, ranges, match_action, non_match_action)
+
+    _set_filter(view, _Filter(view, reg, match_action, non_match_action))
+
+class _Filter:
+    # Keeps the result of a grep current while the buffer is edited. Edited
+    # lines are collected as ranges of dirty lines, which are grepped again
+    # in an idle callback
+    def __init__(self, view, reg, match_action, non_match_action):
+        self.view = view
+        self.reg = reg
+        self.match_action = match_action
+        self.non_match_action = non_match_action
+
+        # Sorted, non-overlapping [first, last] ranges of lines
+        self._dirty = []
+        self._idle_id = 0
+        self._edit = None
+
+        buf = view.get_buffer()
+
+        self._handlers = [
+            buf.connect('insert-text', self.on_insert_text),
+            buf.connect_after('insert-text', self.on_inserted_text),
+            buf.connect('delete-range', self.on_delete_range),
+            buf.connect_after('delete-range', self.on_deleted_range)
+        ]
+
+    def remove(self):
+        buf = self.view.get_buffer()
+
+        for handler in self._handlers:
+            buf.disconnect(handler)
+
+        self._handlers = []
+        self._dirty = []
+
+        if self._idle_id:
+            glib.source_remove(self._idle_id)
+            self._idle_id = 0
+
+    def on_insert_text(self, buf, location, text, length):
+        self._edit = location.get_line()
+
+    def on_inserted_text(self, buf, location, text, length):
+        self._edited(self._edit, location.get_line() - self._edit, location.get_line())
+
+    def on_delete_range(self, buf, start, end):
+        self._edit = (start.get_line(), end.get_line())
+
+    def on_deleted_range(self, buf, start, end):
+        first, last = self._edit
+        self._edited(first, first - last, first)
+
+    def _edited(self, line, delta, last):
+        # Lines after line moved by delta lines, line to last need grepping
+        def moved(x):
+            if x <= line:
+                return x
+            elif x <= line - delta:
+                return line
+            else:
+                return x + delta
+
+        ranges = [[moved(a), moved(b)] for a, b in self._dirty]
+        ranges.append([line, last])
+        ranges.sort()
+
+        self._dirty = []
+
+        for a, b in ranges:
+            if self._dirty and a <= self._dirty[-1][1] + 1:
+                self._dirty[-1][1] = max(self._dirty[-1][1], b)
+            else:
+                self._dirty.append([a, b])
+
+        if not self._idle_id:
+            self._idle_id = glib.idle_add(self.on_idle)
+
+    def _grep_chunk(self):
+        buf = self.view.get_buffer()
+        span = self._dirty[0]
+
+        first = min(span[0], buf.get_line_count() - 1)
+        last = min(span[1], buf.get_line_count() - 1, first + CHUNK_LINES - 1)
+
+        if last >= min(span[1], buf.get_line_count() - 1):
+            self._dirty.pop(0)
+        else:
+            span[0] = last + 1
+
+        start = buf.get_iter_at_line(first)
+        end = buf.get_iter_at_line(last)
+        end.forward_line()
+
+        text = start.get_text(end).decode('utf-8')
+        lines = _Lines(text)
+        last -= first
+
+        matched, ranges = _matches(self.reg, text, lines, 0, last)
+
+        buf.remove_tag(_get_highlight_tag(buf), start, end)
+        _apply(self.view, lines, matched, ranges, self.match_action, self.non_match_action, 0, last, start.get_offset())
+
+    def on_idle(self):
+        deadline = time.time() + IDLE_TIME
+
+        while self._dirty:
+            self._grep_chunk()
+
+            if time.time() >= deadline:
+                return bool(self._dirty)
+
+        self._idle_id = 0
+        return False
+
+def _set_filter(view, filt):
     buf = view.get_buffer()
-    start = buf.get_start_iter()
+    old = buf.get_data(FilterDataName)
 
-    try:
-        reg = re.compile(regex)
-    except Exception, e:
-        raise commands.exceptions.Execute('Invalid regular expression: ' + str(e))
+    if old:
+        old.remove()
+
+    buf.set_data(FilterDataName, filt)
+
+def _is_literal(pattern):
+    for c in pattern:
+        if c in '.^$*+?{}[]\\|()':
+            return False
+
+    return True
+
+def _narrows(old, new):
+    # Whether every line matching new also matches old
+    return _is_literal(old) and _is_literal(new) and old in new
+
+class _LiveGrep:
+    # Greps a snapshot of the document in idle chunks while the pattern is
+    # being typed. A new pattern cancels the chunks still to be done. When the
+    # new pattern narrows a pattern for which all lines were grepped, only the
+    # lines matching that pattern are grepped again
+    def __init__(self, view):
+        self.view = view
+        self.text = _snapshot(view.get_buffer())
+        self.lines = _Lines(self.text)
+
+        self.pattern = ''
+        self.finished = False
+
+        # A pattern and its matching lines, such that all other lines are
+        # hidden (None for all lines)
+        self._base = ''
+        self._base_matched = None
+
+        self._reg = None
+        self._spans = []
+        self._matched = []
+        self._idle_id = 0
+
+    def _spans_of(self, matched):
+        if matched is None:
+            return [[0, len(self.lines) - 1]]
+
+        spans = []
+
+        for line in matched:
+            if spans and spans[-1][1] == line - 1:
+                spans[-1][1] = line
+            else:
+                spans.append([line, line])
+
+        return spans
 
-    while True:
-        end = start.copy()
+    def update(self, pattern):
+        pattern = pattern.strip()
 
-        if not end.forward_line():
-            end.forward_to_line_end()
+        if pattern == self.pattern:
+            return
 
-        text = start.get_text(end)
-        piter = list(reg.finditer(text))
+        try:
+            reg = _compile(pattern)
+        except commands.exceptions.Execute:
+            # Keep the current filter while the pattern is being completed
+            return
 
-        if not piter:
-            _unhighlight(view, start, end, piter)
-            non_match_action(view, start, end)
+        self._stop()
+
+        if self._reg and not self._spans:
+            self._base = self.pattern
+            self._base_matched = self._matched
+
+        self.pattern = pattern
+        self._reg = reg
+        self._matched = []
+
+        if not pattern:
+            self._show_all()
+            return
+
+        if not _narrows(self._base, pattern):
+            self._base = ''
+            self._base_matched = None
+
+        self._spans = self._spans_of(self._base_matched)
+        self._idle_id = glib.idle_add(self.on_idle)
+
+    def _show_all(self):
+        buf = self.view.get_buffer()
+        start, end = buf.get_bounds()
+
+        buf.remove_tag(_get_highlight_tag(buf), start, end)
+        _grep_action_show(self.view, start, end)
+
+        self._reg = None
+        self._spans = []
+        self._base = ''
+        self._base_matched = None
+
+    def _next_chunk(self):
+        span = self._spans[0]
+        first = span[0]
+
+        last = self.lines.line_at(self.lines.start(first) + CHUNK_SIZE, first)
+
+        if last >= span[1]:
+            last = span[1]
+            self._spans.pop(0)
+        else:
+            span[0] = last + 1
+
+        return first, last
+
+    def _grep_chunk(self):
+        first, last = self._next_chunk()
+        matched, ranges = _matches(self._reg, self.text, self.lines, first, last)
+
+        buf = self.view.get_buffer()
+        buf.remove_tag(_get_highlight_tag(buf),
+                       buf.get_iter_at_offset(self.lines.start(first)),
+                       buf.get_iter_at_offset(self.lines.end(last)))
+
+        _apply(self.view, self.lines, matched, ranges, _grep_action_show, _grep_action_hide, first, last)
+
+        self._matched.extend(matched)
+
+    def on_idle(self):
+        deadline = time.time() + IDLE_TIME
+
+        while self._spans:
+            self._grep_chunk()
+
+            if time.time() >= deadline:
+                return bool(self._spans)
+
+        self._idle_id = 0
+        return False
+
+    def _stop(self):
+        if self._idle_id:
+            glib.source_remove(self._idle_id)
+            self._idle_id = 0
+
+    def finish(self, pattern):
+        _compile(pattern)
+        self.update(pattern)
+        self._stop()
+
+        while self._spans:
+            self._grep_chunk()
+
+        self.finished = True
+
+        if self._reg:
+            _set_filter(self.view, _Filter(self.view, self._reg, _grep_action_show, _grep_action_hide))
         else:
-            _highlight(view, start, end, piter)
-            match_action(view, start, end)
+            _set_filter(self.view, None)
 
-        if not start.forward_line():
-            break
+    def cancel(self):
+        self._stop()
+
+        if not self.finished:
+            self._show_all()
+            _set_filter(self.view, None)
 
 def __default__(view, argstr):
     """Hide non-matching lines in document: grep &lt;regex&gt;
 
 Matches a regular expression on each line and hides all text that does not
-match. For the revere (hiding matches) use grep.hide"""
+match. For the revere (hiding matches) use grep.hide. Lines are matched again
+when they are edited, until grep.clear is used"""
     yield _grep(view, argstr, _grep_action_show, _grep_action_hide)
 
 def hide(view, argstr):
@@ -176,15 +563,266 @@ Matches a regular expression on each line and minifies all matching lines
 with respect to the non-matching lines. For the reverse, use grep.zoomin"""
     yield _grep(view, argstr, _grep_action_zoomout, _grep_action_zoomin)
 
+def live(view):
+    """Hide non-matching lines while typing: grep.live
+
+Prompts for a regular expression and hides all lines that do not match it
+while the expression is being typed. Press enter to keep the result, or
+escape to show all lines again."""
+    state = _LiveGrep(view)
+
+    try:
+        pattern, words, modifier = (yield commands.result.Prompt('Grep:', changed=state.update))
+        state.finish(pattern)
+    finally:
+        state.cancel()
+
+    yield commands.result.DONE
+
+def _count(reg, text):
+    # Count the matches of reg, and the lines containing them
+    matches = 0
+    lines = 0
+    last = -1
+
+    for line, m in _finditer(reg, text, _Lines(text)):
+        matches += 1
+
+        if line != last:
+            lines += 1
+            last = line
+
+    return matches, lines
+
+def count(view, entry, argstr):
+    """Count matches in document: grep.count &lt;regex&gt;
+
+Counts the matches of a regular expression, and the number of lines
+containing them, without changing the document."""
+    reg = _compile(argstr)
+    matches, lines = _count(reg, _snapshot(view.get_buffer()))
+
+    entry.info_show('<b>%d</b> matches on <b>%d</b> lines' % (matches, lines), True)
+    return commands.result.DONE
+
+def _histogram(reg, text):
+    # Count the values of the first group of reg (or the whole match)
+    ret = {}
+    group = reg.groups > 0 and 1 or 0
+
+    for line, m in _finditer(reg, text, _Lines(text)):
+        value = m.group(group)
+        ret[value] = ret.get(value, 0) + 1
+
+    return ret
+
+def histogram(view, entry, regex, top=10):
+    """Histogram of matched values: grep.histogram &lt;regex&gt; [&lt;top&gt;]
+
+Counts how often each value of the first group of a regular expression (or
+the whole match when there are no groups) occurs in the document, and shows
+the &lt;top&gt; most frequent values, without changing the document."""
+    reg = _compile(regex)
+
+    try:
+        top = int(top)
+    except ValueError:
+        raise commands.exceptions.Execute('Invalid number: ' + str(top))
+
+    counts = _histogram(reg, _snapshot(view.get_buffer()))
+
+    if not counts:
+        entry.info_show('<i>No matches found</i>', True)
+        return commands.result.DONE
+
+    values = counts.items()
+    values.sort(key=lambda x: (-x[1], x[0]))
+
+    total = sum(counts.itervalues())
+    width = len(str(values[0][1]))
+    ret = []
+
+    for value, num in values[:top]:
+        if value is None:
+            value = '<i>(no value)</i>'
+        else:
+            value = saxutils.escape(value.encode('utf-8'))
+
+        ret.append('<tt>%*d %5.1f%%</tt>  %s' % (width, num, num * 100.0 / total, value))
+
+    ret.append('<i>%d matches, %d distinct values</i>' % (total, len(counts)))
+
+    entry.info_show("\n".join(ret), True)
+    return commands.result.DONE
+
+def _index_status(root):
+    index = trigramindex.TrigramIndex(root)
+    index.load()
+
+    return index.status()
+
+class _FileGrep:
+    # Greps the text of an open document, or a file, in a pool worker
+    def __init__(self, regex):
+        self.regex = regex
+        self._reg = None
+
+    def __call__(self, item):
+        idx, path, text = item
+
+        if text is None:
+            text = trigramindex.read_text(path)
+
+            # Skip binary files
+            if text is None:
+                return idx, []
+
+        if self._reg is None:
+            self._reg = _compile(self.regex)
+
+        lines = _Lines(text)
+        matched, ranges = _matches(self._reg, text, lines)
+        ret = []
+
+        for line in matched[:MAX_FILE_MATCHES]:
+            s = text[lines.start(line):lines.end(line)].rstrip(u'\r\n\u2029')
+            ret.append((line + 1, s[:MAX_LINE_LENGTH]))
+
+        return idx, ret
+
+class _FilesResults:
+    def __init__(self, entry, window, items):
+        self.entry = entry
+        self.window = window
+        self.items = items
+
+        self.files = 0
+        self.matches = 0
+
+    def on_result(self, result):
+        idx, matches = result
+
+        if not matches:
+            return
+
+        name = saxutils.escape(self.items[idx][0])
+
+        self.files += 1
+        self.matches += len(matches)
+
+        for lineno, text in matches:
+            line = u'<b>%s</b>:%d: %s' % (name, lineno, saxutils.escape(text))
+            self.entry.info_add_link(line.encode('utf-8'), self.on_activate, (idx, lineno), True)
+
+    def on_activate(self, data):
+        idx, lineno = data
+        name, path, doc = self.items[idx]
+
+        if doc:
+            tab = pluma.tab_get_from_document(doc)
+            self.window.set_active_tab(tab)
+
+            doc.goto_line(lineno - 1)
+            tab.get_view().scroll_to_cursor()
+        else:
+            pluma.commands.load_uri(self.window, gio.File(path).get_uri(), None, lineno)
+
+def files(view, entry, window, regex, glob='*'):
+    """Grep in files: grep.files &lt;regex&gt; [&lt;glob&gt;]
+
+Lists the lines matching a regular expression in all open documents, and in
+the files (matching &lt;glob&gt;) below the directory of the current document, or
+the working directory for new documents. The home directory and the file
+system root are not searched. Click on a line to open it. Hidden directories,
+binary and large files are skipped. Files are only read when they can contain
+a match, according to an index of the trigrams in the files which is kept in
+~/.cache (see grep.index-status)."""
+    _compile(regex)
+    root = utils.search_root(view)
+
+    # Open documents are grepped in their current state
+    items = []
+    texts = []
+    opened = set()
+
+    for doc in window.get_documents():
+        if not doc.is_untitled() and doc.is_local():
+            opened.add(doc.get_location().get_path())
+
+        items.append((doc.get_short_name_for_display(), None, doc))
+        texts.append((len(texts), None, _snapshot(doc)))
+
+    # Only files containing the trigrams required by the regex are grepped
+    listing = commands.result.Background(trigramindex.candidates, root, regex, glob)
+    yield listing
+
+    for path in listing.get():
+        if not path in opened:
+            items.append((os.path.relpath(path, root), path, None))
+            texts.append((len(texts), path, None))
+
+    results = _FilesResults(entry, window, items)
+
+    pool = commands.result.Pool(_FileGrep(regex), texts)
+    pool.register_result(results.on_result)
+
+    yield pool
+
+    errors = pool.get()
+
+    if results.matches == 0:
+        entry.info_show('<i>No matches found</i>', True)
+    else:
+        entry.info_show('<i>%d matches in %d files</i>' % (results.matches, results.files), True)
+
+    if errors:
+        entry.info_show('<i>%d files could not be read</i>' % (len(errors),), True)
+
+    yield commands.result.DONE
+
+def _ago(t):
+    seconds = int(time.time() - t)
+
+    for unit, size in (('day', 86400), ('hour', 3600), ('minute', 60)):
+        if seconds >= size:
+            num = seconds / size
+            return '%d %s%s ago' % (num, unit, num != 1 and 's' or '')
+
+    return '%d seconds ago' % (seconds,)
+
+def index_status(view, entry):
+    """Show the state of the grep.files index: grep.index-status
+
+Shows the size and freshness of the trigram index grep.files uses for the
+directory of the current document."""
+    status = commands.result.Background(_index_status, utils.search_root(view))
+    yield status
+
+    st = status.get()
+
+    if st['updated'] is None:
+        entry.info_show('<i>No index for</i> %s' % (saxutils.escape(st['root']),), True)
+    else:
+        entry.info_show('<b>Index:</b> %s' % (saxutils.escape(st['root']),), True)
+        entry.info_show('<b>Files:</b> %d (%d changed, %d removed since the last update)' % (st['files'], st['changed'], st['removed']), True)
+        entry.info_show('<b>Trigrams:</b> %d' % (st['trigrams'],), True)
+        entry.info_show('<b>Size:</b> %.1f MB' % (st['size'] / (1024.0 * 1024.0),), True)
+        entry.info_show('<b>Updated:</b> %s' % (_ago(st['updated']),), True)
+
+    yield commands.result.DONE
+
 def clear(view):
     """Clear all grep commands: grep.clear
 
-Clear the actions done by all grep commands."""
+Clear the actions done by all grep commands, and stop matching edited
+lines."""
+    _set_filter(view, None)
+
     buf = view.get_buffer()
+    start, end = buf.get_bounds()
 
-    buf.remove_tag(_get_highlight_tag(buf), buf.get_start_iter(), buf.get_end_iter())
-    buf.remove_tag(_get_invisible_tag(buf), buf.get_start_iter(), buf.get_end_iter())
-    buf.remove_tag(_get_zoomout_tag(buf), buf.get_start_iter(), buf.get_end_iter())
+    for tag in (_get_highlight_tag(buf), _get_invisible_tag(buf), _get_zoomout_tag(buf)):
+        buf.remove_tag(tag, start, end)
 
 locals()['show'] = __default__
 locals()['zoom'] = zoomin
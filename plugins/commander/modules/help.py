@@ -39,7 +39,7 @@ def _doc_text(command, func):
 
 	return doc
 
-@commands.autocomplete(command=commander.commands.completion.command)
+@commands.autocomplete(command=commander.commands.completion.fuzzy_command)
 def __default__(entry, command='help'):
 	"""Show help on commands: help &lt;command&gt;
 
@@ -73,7 +73,7 @@ Move the cursor per regex (use negative num to move backwards)"""
 		start = buf.get_iter_at_mark(buf.get_insert())
 
 		if num < 0:
-			start.backward_char(len(text) - found.start(0))
+			start.backward_chars(len(text) - found.start(0))
 		else:
 			start.forward_chars(found.start(0))
 
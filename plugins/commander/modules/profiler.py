@@ -0,0 +1,130 @@
+import commander.commands as commands
+import commander.commands.completion
+import commander.commands.exceptions
+import commander.commands.result
+import commander.commands.timing
+
+import cProfile
+import pstats
+import os
+import sys
+import types
+
+from xml.sax import saxutils
+
+__commander_module__ = True
+__root__ = ['profile', 'stats']
+
+# Number of functions shown by profile
+HOTSPOTS = 15
+
+def _profiled(gen, profiler, toplevel=False):
+	# Runs each step of a yielding command under the profiler, including the
+	# steps of the commands it yields itself
+	action = [gen.next]
+
+	while True:
+		try:
+			ret = profiler.runcall(*action)
+		except StopIteration:
+			break
+
+		if type(ret) == types.GeneratorType:
+			ret = _profiled(ret, profiler)
+
+		try:
+			value = yield ret
+		except GeneratorExit:
+			gen.close()
+			raise
+		except Exception:
+			action = [gen.throw] + list(sys.exc_info()[:2])
+		else:
+			if value:
+				action = [gen.send, value]
+			else:
+				action = [gen.next]
+
+	# Make sure the profile command itself is resumed when done
+	if toplevel:
+		yield commands.result.DONE
+
+def _location(func):
+	filename, line, name = func
+
+	if filename == '~':
+		return name
+
+	return '%s (%s:%d)' % (name, os.path.basename(filename), line)
+
+def _hotspots(profiler):
+	stats = pstats.Stats(profiler)
+	items = stats.stats.items()
+
+	# Sort on internal time
+	items.sort(key=lambda x: x[1][2], reverse=True)
+
+	ret = ['<b>%9s %9s %8s  %s</b>' % ('tottime', 'cumtime', 'ncalls', 'function')]
+
+	for func, (cc, nc, tt, ct, callers) in items[:HOTSPOTS]:
+		ret.append('%9.4f %9.4f %8d  %s' % (tt, ct, nc, saxutils.escape(_location(func))))
+
+	ret.append('<i>%d calls in %.4f seconds</i>' % (stats.total_calls, stats.total_tt))
+	return "\n".join(ret)
+
+@commands.autocomplete(command=commander.commands.completion.fuzzy_command)
+def profile(entry, argstr, command, *args):
+	"""Profile a command: profile &lt;command&gt; [&lt;arguments&gt;]
+
+Run a command under the python profiler and show the functions it spent most
+of its time in. Commands which prompt are profiled until they finish."""
+	cmd = commander.commands.completion.single_command([command], 0)
+
+	if not cmd:
+		raise commander.commands.exceptions.Execute('Could not find command: ' + command)
+
+	parts = argstr.split(None, 1)
+
+	if len(parts) > 1:
+		cmdargstr = parts[1]
+	else:
+		cmdargstr = ''
+
+	profiler = cProfile.Profile()
+	ret = profiler.runcall(cmd.execute, cmdargstr, list(args), entry, 0)
+
+	if type(ret) == types.GeneratorType:
+		yield _profiled(ret, profiler, True)
+
+	entry.info_show(_hotspots(profiler), True)
+	yield commands.result.DONE
+
+def stats(entry):
+	"""Show command timings: stats
+
+Show how much time the commands executed in this session took. Time spent
+waiting for prompts to be answered is shown separately."""
+	timings = filter(lambda x: x.calls > 0, commander.commands.timing.timings())
+
+	if not timings:
+		entry.info_show('<i>No commands executed yet</i>', True)
+		return commands.result.DONE
+
+	timings.sort(key=lambda x: x.time, reverse=True)
+
+	ret = ['<b>%9s %9s %9s %6s %7s %9s  %s</b>' % ('total', 'average', 'max', 'calls', 'resumes', 'waiting', 'command')]
+
+	for t in timings:
+		ret.append('%9.4f %9.4f %9.4f %6d %7d %9.4f  %s' % (t.time, t.average(), t.max, t.calls, t.resumes, t.wait, saxutils.escape(t.name)))
+
+	entry.info_show("\n".join(ret), True)
+	return commands.result.DONE
+
+def clear():
+	"""Clear command timings: profiler.clear
+
+Forget the timings shown by stats"""
+	commander.commands.timing.clear()
+	return commands.result.HIDE
+
+__default__ = profile
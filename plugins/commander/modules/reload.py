@@ -7,7 +7,7 @@ import commander.commands.module
 
 __commander_module__ = True
 
-@commander.commands.autocomplete(command=commander.commands.completion.command)
+@commander.commands.autocomplete(command=commander.commands.completion.fuzzy_command)
 def __default__(command):
 	"""Force reload of a module: reload &lt;module&gt;
 
@@ -34,12 +34,14 @@ class Process:
 			stdout.close()
 
 	def update(self):
-		parts = self._buffer.split("\n")
+		# Show all complete lines at once, keep the last partial line
+		idx = self._buffer.rfind("\n")
 
-		for p in parts[:-1]:
-			self.entry.info_show(p)
+		if idx == -1:
+			return
 
-		self._buffer = parts[-1]
+		self.entry.info_show(self._buffer[:idx])
+		self._buffer = self._buffer[idx + 1:]
 
 	def collect_output(self, fd, condition):
 		if condition & (glib.IO_IN | glib.IO_PRI):
@@ -299,6 +299,14 @@ class DocumentHelper(Signals):
 
         buf.end_user_action()
 
+    def add_edit_points(self, iters):
+        # Lets other plugins add edit points, entering multi edit mode
+        if not self.enabled():
+            self.enable_multi_edit()
+
+        for piter in iters:
+            self._add_edit_point(piter)
+
     def _add_edit_point(self, piter):
         # Check if there is already an edit point here
         marks = piter.get_marks()